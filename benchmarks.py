@@ -0,0 +1,381 @@
+from instrument_market_classes import MarketConditions, OptionBook, OptionClass
+from binomial_lattice import BinomialTree, get_binomial_tree
+from pricing_model_menagerie import Binomial, BINOMIAL_ACCELERATIONS, PRICING_BACKENDS, binomial_terminal_distribution
+from pricing_model_class import PricingModel
+from comparisons import ModelAndParams, model_label, compare_pricing_models, compare_distributions
+from jit_kernels import compile_jit_kernels
+from helper_functions import choose, relu, black_scholes_formula, black_scholes_formula_vectorized
+from math import exp, sqrt
+import numpy as np
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+
+# The original O(N^2) binomial pricer (a choose() call per terminal node), kept as a reference
+def choose_sum_binomial_price(spot, strike, up_tick, down_tick, num_intervals, time_to_expiry, interest_rate, option_type):
+    interest = exp(interest_rate*time_to_expiry/num_intervals)
+    martingale_prob = (interest - down_tick)/(up_tick - down_tick)
+    running_sum = 0
+    for i in range(num_intervals+1):
+        Sfinal = spot*(up_tick**i)*(down_tick**(num_intervals-i))
+        probability = (martingale_prob**i)*((1-martingale_prob)**(num_intervals-i))
+        if option_type == "call":
+            running_sum += choose(i,num_intervals)*relu(Sfinal - strike)*probability
+        else:
+            running_sum += choose(i,num_intervals)*relu(strike - Sfinal)*probability
+    return exp(-interest_rate*time_to_expiry)*running_sum
+
+
+def time_call(function, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start)/repeats, result
+
+
+def benchmark_binomial(
+        conditions: MarketConditions,
+        volatility: float,
+        time_to_expiry: float,
+        num_intervals_list=(100, 300, 1000, 3000, 10000),
+        num_strikes=100
+    ) -> list:
+    strikes = np.linspace(conditions.min_strike_of_interest, conditions.max_strike_of_interest, num_strikes)
+    is_call = np.ones(num_strikes, dtype=bool)
+    rows = []
+    for n in num_intervals_list:
+        up_tick = exp(volatility*sqrt(time_to_expiry/n))
+        down_tick = 1/up_tick
+        model = Binomial(up_tick=up_tick, down_tick=down_tick, num_intervals=n)
+        tree_args = (conditions.spot, up_tick, down_tick, n, time_to_expiry, conditions.interest_rate)
+
+        # Timings are per option, for a single strike (the original path) and for the whole strike vector
+        choose_sum_time, choose_sum_price = time_call(lambda: choose_sum_binomial_price(
+            conditions.spot, conditions.spot, up_tick, down_tick, n, time_to_expiry, conditions.interest_rate, "call"))
+        binomial_terminal_distribution.cache_clear()
+        closed_form_time, closed_form_prices = time_call(lambda: model.binomial_batch_pricing_function(
+            conditions=conditions, strikes=strikes, times_to_expiry=time_to_expiry, is_call=is_call))
+        tree_build_time, tree = time_call(lambda: BinomialTree(*tree_args))
+        rollback_time, rollback_prices = time_call(lambda: tree.price(strikes=strikes, is_call=is_call))
+        get_binomial_tree(*tree_args)
+        cached_tree_time, _ = time_call(lambda: get_binomial_tree(*tree_args), repeats=100)
+
+        rows.append({
+            'num_intervals': n,
+            'choose_sum_seconds': choose_sum_time,
+            'choose_sum_atm_price': choose_sum_price,
+            'closed_form_seconds_per_option': closed_form_time/num_strikes,
+            'rollback_seconds_per_option': rollback_time/num_strikes,
+            'tree_build_seconds': tree_build_time,
+            'cached_tree_lookup_seconds': cached_tree_time,
+            'max_rollback_vs_closed_form_error': float(np.max(np.abs(rollback_prices - closed_form_prices))),
+        })
+    return rows
+
+
+# Maximal errors (against Black-Scholes) and timings of the binomial model with each convergence acceleration
+def benchmark_binomial_acceleration(
+        conditions: MarketConditions,
+        volatility: float,
+        time_to_expiry: float,
+        num_intervals_list=(25, 50, 100, 200, 1000),
+        num_strikes=100
+    ) -> list:
+    strikes = np.linspace(conditions.min_strike_of_interest, conditions.max_strike_of_interest, num_strikes)
+    strikes, is_call = np.concatenate((strikes, strikes)), np.repeat([True, False], num_strikes)
+    rows = []
+    for n in num_intervals_list:
+        up_tick = exp(volatility*sqrt(time_to_expiry/n))
+        for acceleration in BINOMIAL_ACCELERATIONS:
+            # Plain trees are not extrapolated (see Binomial)
+            for richardson in (False, True) if acceleration is not None else (False,):
+                model = Binomial(up_tick=up_tick, down_tick=1/up_tick, num_intervals=n, acceleration=acceleration, richardson=richardson)
+                clear_binomial_caches()
+                seconds, errors = time_call(lambda: model.binomial_pricing_errors(
+                    conditions=conditions, strikes=strikes, times_to_expiry=time_to_expiry, is_call=is_call))
+                rows.append({
+                    'num_intervals': n,
+                    'acceleration': str(acceleration),
+                    'richardson': richardson,
+                    'max_error': float(np.max(np.abs(errors))),
+                    'seconds_per_option': seconds/strikes.size,
+                })
+    return rows
+
+
+# Batch sizes of the suite, from a single option to a million
+BATCH_SIZES = (1, 10, 100, 1000, 10**4, 10**5, 10**6)
+# Largest European and American batches priced by the binomial model at each number of intervals
+# (American options are rolled back through the whole tree, which is slow for the largest trees)
+BINOMIAL_MAX_BATCH_SIZES = {100: (10**6, 1000), 1000: (10**6, 100), 10000: (10**4, 1)}
+
+SUITE_CONDITIONS = MarketConditions(spot=100, interest_rate=0.01)
+SUITE_MODELS = [
+    ModelAndParams("Black-Scholes", {'volatility': 0.4}),
+    ModelAndParams("Quadratic volatility smile", {'atm_vol': 0.4, 'skew': -0.1, 'curvature': 0.05}),
+    ModelAndParams("Hyperbolic volatility smile", {'atm_vol': 0.4, 'skew': 0.05, 'left_asymp': 0.15, 'right_asymp': 0.1}),
+]
+
+
+# Times repeated calls of a function (after a warm-up call), for at least min_seconds and at least
+# min_repeats calls, then measures the peak memory allocated during one more call. The setup function,
+# if any, runs before every call and is not timed (e.g. to clear caches).
+def measure(name: str, function, batch_size: int, setup=None, min_seconds=0.2, min_repeats=3, max_repeats=10**5) -> dict:
+    if setup is not None:
+        setup()
+    function()
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < max_repeats and (len(latencies) < min_repeats or time.perf_counter() - start < min_seconds):
+        if setup is not None:
+            setup()
+        call_start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - call_start)
+    latencies = np.array(latencies)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'name': name,
+        'batch_size': batch_size,
+        'repeats': len(latencies),
+        'mean_seconds': float(latencies.mean()),
+        'p50_seconds': float(np.percentile(latencies, 50)),
+        'p90_seconds': float(np.percentile(latencies, 90)),
+        'p99_seconds': float(np.percentile(latencies, 99)),
+        'options_per_second': batch_size/float(np.percentile(latencies, 50)),
+        'peak_memory_bytes': int(peak_memory),
+    }
+
+
+# Random book of the given size, with strikes across the conditions' range of interest, monthly expiries
+# up to a year and both option types
+def suite_book(conditions: MarketConditions, batch_size: int, seed=0) -> OptionBook:
+    generator = np.random.default_rng(seed)
+    strikes = generator.uniform(conditions.min_strike_of_interest, conditions.max_strike_of_interest, batch_size)
+    times_to_expiry = generator.integers(1, 13, batch_size)/12
+    option_types = np.where(generator.random(batch_size) < 0.5, "call", "put")
+    return OptionBook(strikes=strikes, times_to_expiry=times_to_expiry, option_types=option_types)
+
+
+def clear_binomial_caches():
+    binomial_terminal_distribution.cache_clear()
+    get_binomial_tree.cache_clear()
+
+
+# Runs the whole suite and returns one row per (benchmark, batch size). Binomial trees and distributions
+# are rebuilt for every call, so that the timings do not just measure cache lookups.
+def run_benchmarks(max_batch_size=10**6, min_seconds=0.2) -> list:
+    conditions = SUITE_CONDITIONS
+    option = OptionClass(strike=105, time_to_expiry=0.25, option_type="call")
+    batch_sizes = [size for size in BATCH_SIZES if size <= max_batch_size]
+    books = {size: suite_book(conditions=conditions, batch_size=size) for size in batch_sizes}
+    rows = []
+
+    rows.append(measure("black_scholes_formula", lambda: black_scholes_formula(
+        spot=conditions.spot, strike=105, volatility=0.4, time_to_expiry=0.25, interest_rate=conditions.interest_rate),
+        batch_size=1, min_seconds=min_seconds))
+    for size in batch_sizes:
+        book = books[size]
+        rows.append(measure("black_scholes_formula_vectorized", lambda: black_scholes_formula_vectorized(
+            spot=conditions.spot, strike=book.strikes, volatility=0.4, time_to_expiry=book.times_to_expiry, 
+            interest_rate=conditions.interest_rate, is_call=book.is_call), 
+            batch_size=size, min_seconds=min_seconds))
+
+    for mod_params in SUITE_MODELS:
+        model = PricingModel(model_name=mod_params.model_name, params=mod_params.params, conditions=conditions)
+        rows.append(measure(f"{mod_params.model_name} scalar", lambda: model.model_pricing_function(option=option),
+            batch_size=1, min_seconds=min_seconds))
+        for size in batch_sizes:
+            rows.append(measure(f"{mod_params.model_name} batch", lambda: model.model_batch_pricing_function(book=books[size]),
+                batch_size=size, min_seconds=min_seconds))
+
+    for num_intervals, max_binomial_batch_sizes in BINOMIAL_MAX_BATCH_SIZES.items():
+        up_tick = exp(0.4*sqrt(1/num_intervals))
+        for american, max_binomial_batch_size in zip((False, True), max_binomial_batch_sizes):
+            model = PricingModel(model_name="Binomial", params={
+                'up_tick': up_tick, 'down_tick': 1/up_tick, 'num_intervals': num_intervals, 'american': american}, 
+                conditions=conditions)
+            name = f"Binomial (n={num_intervals}{', american' if american else ''})"
+            rows.append(measure(f"{name} scalar", lambda: model.model_pricing_function(option=option),
+                batch_size=1, setup=clear_binomial_caches, min_seconds=min_seconds))
+            for size in batch_sizes:
+                if size > max_binomial_batch_size:
+                    continue
+                rows.append(measure(f"{name} batch", lambda: model.model_batch_pricing_function(book=books[size]),
+                    batch_size=size, setup=clear_binomial_caches, min_seconds=min_seconds))
+
+    model = PricingModel(model_name="Hyperbolic volatility smile", params=SUITE_MODELS[2].params, conditions=conditions)
+    rows.append(measure("butterfly_price", lambda: model.butterfly_price(option=option, radius=1), 
+        batch_size=1, min_seconds=min_seconds))
+    for method in ("analytic", "finite_difference"):
+        rows.append(measure(f"probability_distribution_plot ({method})", lambda: model.probability_distribution_plot(
+            time_to_expiry=0.25, num_samples=1000, plot=False, method=method), 
+            batch_size=1000, min_seconds=min_seconds))
+
+    comparison_models = SUITE_MODELS + [ModelAndParams("Binomial", {
+        'up_tick': exp(0.4*sqrt(0.25/1000)), 'down_tick': exp(-0.4*sqrt(0.25/1000)), 'num_intervals': 1000})]
+    for name, compare in (("compare_pricing_models", compare_pricing_models), ("compare_distributions", compare_distributions)):
+        rows.append(measure(name, lambda: compare(
+            models_list=comparison_models, time_to_expiry=0.25, conditions=conditions, num_samples=100, plot=False),
+            batch_size=100*len(comparison_models), setup=clear_binomial_caches, min_seconds=min_seconds))
+    return rows
+
+
+# Models whose single-option pricing is compared between the backends
+SCALAR_BACKEND_MODELS = SUITE_MODELS + [
+    ModelAndParams("Binomial", {'up_tick': exp(0.4*sqrt(1/200)), 'down_tick': exp(-0.4*sqrt(1/200)), 'num_intervals': 200}),
+    ModelAndParams("Binomial", {'up_tick': exp(0.4*sqrt(1/200)), 'down_tick': exp(-0.4*sqrt(1/200)), 'num_intervals': 200, 'american': True}),
+    ModelAndParams("Volatility surface", {
+        'expiries': (0.25, 0.5, 1.0), 'atm_vol': (0.45, 0.42, 0.4), 'skew': (-0.1, -0.08, -0.05), 'curvature': (0.05, 0.05, 0.04)}),
+]
+
+
+# Parity and single-option latency of the "python" and "jit" backends. The parity check runs the models'
+# JIT kernels on a random book even where numba is missing (they are then plain Python functions), and
+# reports their largest price difference from the pure Python kernels. Latencies are p50 per call, with
+# the JIT kernels compiled (or loaded from the disk cache) beforehand.
+def benchmark_scalar_backends(num_options=200, min_seconds=0.2) -> list:
+    conditions = SUITE_CONDITIONS
+    book = suite_book(conditions=conditions, batch_size=num_options)
+    option = OptionClass(strike=105, time_to_expiry=0.25, option_type="call")
+    compile_jit_kernels()
+    rows = []
+    for mod_params in SCALAR_BACKEND_MODELS:
+        models = {
+            backend: PricingModel(model_name=mod_params.model_name, params=mod_params.params, conditions=conditions, backend=backend)
+            for backend in PRICING_BACKENDS
+        }
+        jit_pricing_function = models["python"].model.jit_kernels()['pricing_function']
+        max_difference = max(
+            abs(jit_pricing_function(option=book_option, conditions=conditions) 
+                - models["python"].pricing_function(option=book_option, conditions=conditions))
+            for book_option in book
+        )
+        latencies = {
+            backend: measure(f"{mod_params.model_name} scalar ({backend})", lambda: model.model_pricing_function(option=option),
+                batch_size=1, setup=clear_binomial_caches, min_seconds=min_seconds)['p50_seconds']
+            for backend, model in models.items()
+        }
+        rows.append({
+            'name': model_label(mod_params) + (", american" if mod_params.params.get('american') else ""),
+            'backend': models["jit"].backend,
+            'max_difference': float(max_difference),
+            'python_seconds': latencies["python"],
+            'jit_seconds': latencies["jit"],
+            'speedup': latencies["python"]/latencies["jit"],
+        })
+    return rows
+
+
+def print_scalar_backends_table(parity_tolerance=1e-9) -> bool:
+    rows = benchmark_scalar_backends()
+    for row in rows:
+        print(f"{row['name']:<70} backend={row['backend']:<6} max_difference={row['max_difference']:.3g} "
+              f"python={row['python_seconds']*1e6:.3g}us jit={row['jit_seconds']*1e6:.3g}us speedup=x{row['speedup']:.3g}")
+    return all(row['max_difference'] <= parity_tolerance for row in rows)
+
+
+def save_results(rows: list, path: str):
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': rows,
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+def load_results(path: str) -> list:
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+# Benchmarks whose median latency or peak memory grew by more than the tolerance (as a fraction) over
+# the baseline; benchmarks missing from either run are ignored
+def compare_to_baseline(rows: list, baseline_rows: list, tolerance=0.2) -> list:
+    baseline = {(row['name'], row['batch_size']): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        key = (row['name'], row['batch_size'])
+        if key not in baseline:
+            continue
+        for metric in ('p50_seconds', 'peak_memory_bytes'):
+            old, new = baseline[key][metric], row[metric]
+            if new > old*(1 + tolerance):
+                regressions.append({
+                    'name': row['name'], 
+                    'batch_size': row['batch_size'], 
+                    'metric': metric, 
+                    'baseline': old, 
+                    'current': new, 
+                    'ratio': new/old if old > 0 else float("inf"),
+                })
+    return regressions
+
+
+def print_binomial_table():
+    rows = benchmark_binomial(
+        conditions=MarketConditions(spot=100, interest_rate=0.01),
+        volatility=0.4,
+        time_to_expiry=2/12)
+    for row in rows:
+        print(", ".join(f"{key}={value:.4g}" for key, value in row.items()))
+    rows = benchmark_binomial_acceleration(
+        conditions=MarketConditions(spot=100, interest_rate=0.01),
+        volatility=0.4,
+        time_to_expiry=2/12)
+    for row in rows:
+        print(", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}" for key, value in row.items()))
+
+
+# Runs the suite, optionally saving the results as JSON and comparing them to a saved baseline; the exit
+# status is 1 if any regression was found. With --binomial, prints the binomial pricer comparison instead,
+# and with --scalar the parity and latencies of the scalar backends (with exit status 1 if they disagree).
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the pricing models")
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--baseline", help="JSON file of earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    parser.add_argument("--max-batch-size", type=int, default=10**6)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimal timing duration per benchmark")
+    parser.add_argument("--binomial", action="store_true", help="compare the binomial pricers and accelerations against each other")
+    parser.add_argument("--scalar", action="store_true", help="compare the python and jit backends for single options")
+    args = parser.parse_args()
+    if args.scalar:
+        if not print_scalar_backends_table():
+            sys.exit(1)
+        return
+    if args.binomial:
+        print_binomial_table()
+        return
+
+    rows = run_benchmarks(max_batch_size=args.max_batch_size, min_seconds=args.min_seconds)
+    for row in rows:
+        print(f"{row['name']:<55} n={row['batch_size']:<8} p50={row['p50_seconds']:.3g}s "
+              f"p99={row['p99_seconds']:.3g}s {row['options_per_second']:.3g} options/s "
+              f"peak={row['peak_memory_bytes']/2**20:.3g}MB")
+    if args.output is not None:
+        save_results(rows=rows, path=args.output)
+    if args.baseline is not None:
+        regressions = compare_to_baseline(rows=rows, baseline_rows=load_results(args.baseline), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']} n={regression['batch_size']} {regression['metric']}: "
+                  f"{regression['baseline']:.3g} -> {regression['current']:.3g} (x{regression['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from helper_functions import black_scholes_formula_vectorized
+from functools import lru_cache
+from math import exp, log, sqrt
+import numpy as np
+
+
+# Recombining binomial tree, built once and reused for any number of strikes and option types.
+# Node spots are spot*down_tick^i*(up_tick/down_tick)^j for j up-ticks after i steps;
+# they are generated one time slice at a time, so the tree itself only stores O(N) numbers.
+class BinomialTree:
+    def __init__(
+            self, 
+            spot: float, 
+            up_tick: float, 
+            down_tick: float, 
+            num_intervals: int, 
+            time_to_expiry: float, 
+            interest_rate: float
+        ) -> None:
+        assert 0 < down_tick < up_tick, "Invalid parameters"
+        assert num_intervals > 0, "Number of intervals must be positive"
+        self.spot = spot
+        self.up_tick = up_tick
+        self.down_tick = down_tick
+        self.num_intervals = num_intervals
+        self.time_to_expiry = time_to_expiry
+        self.interest_rate = interest_rate
+
+        time_interval = time_to_expiry/num_intervals
+        interest = exp(interest_rate*time_interval)
+        assert down_tick < interest and interest < up_tick, "There is no probability eliminating arbitrage"
+        self.martingale_prob = (interest - down_tick)/(up_tick - down_tick)
+        # Volatility of the log-spot encoded by the ticks
+        self.volatility = (log(up_tick) - log(down_tick))/(2*sqrt(time_interval))
+        # One-step discount factor, and the discounted up/down transition weights
+        self.step_discount = 1/interest
+        self.discounted_up_prob = self.martingale_prob/interest
+        self.discounted_down_prob = (1 - self.martingale_prob)/interest
+
+        num_ups = np.arange(num_intervals+1)
+        self.up_down_ratio_powers = np.exp(num_ups*(log(up_tick) - log(down_tick)))
+        self.down_tick_powers = np.exp(num_ups*log(down_tick))
+        for array in (self.up_down_ratio_powers, self.down_tick_powers):
+            array.setflags(write=False)
+
+    def node_spots(self, step: int) -> np.ndarray:
+        return self.spot*self.down_tick_powers[step]*self.up_down_ratio_powers[:step+1]
+
+    # Prices all (strike, option type) pairs by backward induction through the tree.
+    # A single (num_options, N+1) value buffer is rolled back in place, with one scratch buffer of the same shape.
+    # With smoothed=True, the values one step before expiry are the Black-Scholes prices over the last
+    # interval (at the volatility of the tree) instead of the rolled back payoffs (the BBS method).
+    def price(self, strikes, is_call, american=False, smoothed=False) -> np.ndarray:
+        strikes, is_call = np.broadcast_arrays(np.asarray(strikes, dtype=float), is_call)
+        return self._roll_back(strikes, is_call, american, smoothed=smoothed)[0].reshape(strikes.shape)
+
+    # Price, delta, gamma and theta read off the first two time slices of the tree
+    # (theta is per year, with the drift of the middle node at step 2 removed via delta and gamma)
+    def greeks(self, strikes, is_call, american=False) -> dict:
+        assert self.num_intervals >= 2, "Lattice Greeks need at least two intervals"
+        strikes, is_call = np.broadcast_arrays(np.asarray(strikes, dtype=float), is_call)
+        values = self._roll_back(strikes, is_call, american, keep_steps=(1, 2))
+        step_one_spots, step_two_spots = self.node_spots(1), self.node_spots(2)
+        delta = (values[1][:, 1] - values[1][:, 0])/(step_one_spots[1] - step_one_spots[0])
+        upper_delta = (values[2][:, 2] - values[2][:, 1])/(step_two_spots[2] - step_two_spots[1])
+        lower_delta = (values[2][:, 1] - values[2][:, 0])/(step_two_spots[1] - step_two_spots[0])
+        gamma = (upper_delta - lower_delta)/(0.5*(step_two_spots[2] - step_two_spots[0]))
+        middle_spot_move = step_two_spots[1] - self.spot
+        theta = (
+            values[2][:, 1] - values[0] - delta*middle_spot_move - 0.5*gamma*middle_spot_move*middle_spot_move
+        )/(2*self.time_to_expiry/self.num_intervals)
+        return {
+            'price': values[0].reshape(strikes.shape),
+            'delta': delta.reshape(strikes.shape),
+            'gamma': gamma.reshape(strikes.shape),
+            'theta': theta.reshape(strikes.shape),
+        }
+
+    # Rolls back to the root, returning the values at time slice 0 and copies of those at `keep_steps`
+    def _roll_back(self, strikes, is_call, american, keep_steps=(), smoothed=False) -> dict:
+        strikes = strikes.reshape(-1, 1)
+        sign = np.where(is_call, 1.0, -1.0).reshape(-1, 1)
+        num_intervals = self.num_intervals
+
+        values = np.empty((strikes.shape[0], num_intervals+1))
+        scratch = np.empty_like(values)
+        kept_values = {}
+        first_step = num_intervals - 1
+        if smoothed:
+            values[:, :num_intervals] = black_scholes_formula_vectorized(
+                spot=self.node_spots(num_intervals-1), 
+                strike=strikes, 
+                volatility=self.volatility, 
+                time_to_expiry=self.time_to_expiry/num_intervals, 
+                interest_rate=self.interest_rate, 
+                is_call=sign > 0)
+            if american:
+                self._intrinsic_values(num_intervals-1, strikes, sign, out=scratch[:, :num_intervals])
+                np.maximum(values[:, :num_intervals], scratch[:, :num_intervals], out=values[:, :num_intervals])
+            if num_intervals-1 in keep_steps:
+                kept_values[num_intervals-1] = values[:, :num_intervals].copy()
+            first_step = num_intervals - 2
+        else:
+            self._intrinsic_values(num_intervals, strikes, sign, out=values)
+        for step in range(first_step, -1, -1):
+            current = values[:, :step+1]
+            current_scratch = scratch[:, :step+1]
+            np.multiply(values[:, 1:step+2], self.discounted_up_prob, out=current_scratch)
+            np.multiply(current, self.discounted_down_prob, out=current)
+            np.add(current, current_scratch, out=current)
+            if american:
+                self._intrinsic_values(step, strikes, sign, out=current_scratch)
+                np.maximum(current, current_scratch, out=current)
+            if step in keep_steps:
+                kept_values[step] = current.copy()
+        kept_values[0] = values[:, 0]
+        return kept_values
+
+    def _intrinsic_values(self, step: int, strikes: np.ndarray, sign: np.ndarray, out: np.ndarray) -> np.ndarray:
+        np.subtract(self.node_spots(step), strikes, out=out)
+        np.multiply(out, sign, out=out)
+        return np.maximum(out, 0.0, out=out)
+
+
+# Trees are cached on all the inputs that determine them, so repeated pricing calls
+# (e.g. across pricing plots and model comparisons) reuse them instead of rebuilding
+@lru_cache(maxsize=64)
+def get_binomial_tree(
+        spot: float, 
+        up_tick: float, 
+        down_tick: float, 
+        num_intervals: int, 
+        time_to_expiry: float, 
+        interest_rate: float
+    ) -> BinomialTree:
+    return BinomialTree(
+        spot=spot, 
+        up_tick=up_tick, 
+        down_tick=down_tick, 
+        num_intervals=num_intervals, 
+        time_to_expiry=time_to_expiry, 
+        interest_rate=interest_rate)
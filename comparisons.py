@@ -2,6 +2,10 @@ from instrument_market_classes import MarketConditions
 from typing import List
 from matplotlib import pyplot as plt
 from pricing_model_class import PricingModel
+from pricing_cache import PricingCache
+from result_store import ResultStore
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 
 class ModelAndParams:
@@ -10,47 +14,100 @@ class ModelAndParams:
         self.params = params
 
 
+def model_label(mod_params: ModelAndParams) -> str:
+    if mod_params.model_name == "Binomial":
+        return f"Binomial (n={mod_params.params['num_intervals']})"
+    return mod_params.model_name
+
+
+# Evaluates one model of a comparison; kept at module level so that it can run in worker processes
+def evaluate_model(task) -> dict:
+    mod_params, quantity, time_to_expiry, conditions, num_samples, cache, store = task
+    current_model = PricingModel(
+        model_name=mod_params.model_name, 
+        params=mod_params.params, 
+        conditions= conditions,
+        cache=cache
+    )
+    if quantity == "prices":
+        output = current_model.pricing_plot(
+            time_to_expiry=time_to_expiry,
+            time_value_only=True,
+            plot=False,
+            num_samples=num_samples,
+            store=store
+        )
+    else:
+        output = current_model.probability_distribution_plot(
+            time_to_expiry=time_to_expiry, 
+            num_samples=num_samples,
+            plot=False,
+            store=store)
+    result = {'label': model_label(mod_params), 'info_string': current_model.info_string(time_to_expiry=time_to_expiry)}
+    result.update({key: np.asarray(values) for key, values in output.items()})
+    return result
+
+
+# Evaluates every model of the list, optionally fanned out over a process pool, without plotting.
+# Returns one dictionary per model, in the order of the list, with its label, info string and the
+# arrays 'strikes' and either 'call_prices' and 'put_prices' (time values) or 'probs'.
+# A cache is only used when the models are evaluated in this process (it is held in memory, and the worker
+# processes are not given it); a result store (being on disk) is shared by the worker processes too.
+def run_comparison(
+        models_list: List[ModelAndParams],
+        quantity: str,
+        time_to_expiry: float, 
+        conditions: MarketConditions, 
+        num_samples=100,
+        max_workers=None,
+        cache: PricingCache = None,
+        store: ResultStore = None
+    ) -> List[dict]:
+    assert quantity == "prices" or quantity == "distributions", "Quantity must be 'prices' or 'distributions'"
+    if max_workers is not None and max_workers > 1:
+        tasks = [(mod_params, quantity, time_to_expiry, conditions, num_samples, None, store) for mod_params in models_list]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(evaluate_model, tasks))
+    tasks = [(mod_params, quantity, time_to_expiry, conditions, num_samples, cache, store) for mod_params in models_list]
+    return [evaluate_model(task) for task in tasks]
+
+
 def compare_pricing_models(
         models_list: List[ModelAndParams],
         time_to_expiry:float, 
         conditions:MarketConditions, 
-        num_samples=100):
+        num_samples=100,
+        plot=True,
+        max_workers=None,
+        cache: PricingCache = None,
+        store: ResultStore = None):
     
-    common_min_strike = conditions.min_strike_of_interest
-    common_max_strike = conditions.max_strike_of_interest
-    fig, (ax1,ax2) = plt.subplots(nrows=1, ncols=2, figsize=(12,5))
+    results = run_comparison(
+        models_list=models_list, 
+        quantity="prices", 
+        time_to_expiry=time_to_expiry, 
+        conditions=conditions, 
+        num_samples=num_samples, 
+        max_workers=max_workers,
+        cache=cache,
+        store=store)
+    if not plot:
+        return results
 
-    for i, mod_params in enumerate(models_list):
-        current_model = PricingModel(
-            model_name=mod_params.model_name, 
-            params=mod_params.params, 
-            conditions= conditions
-        )
-        current_model_prices = current_model.pricing_plot(
-            time_to_expiry=time_to_expiry,
-            min_strike=common_min_strike,
-            max_strike=common_max_strike,
-            time_value_only=True,
-            plot=False,
-            num_samples=num_samples
-        )
-        
-        if mod_params.model_name == "Binomial":
-            fig_label = f"Binomial (n={mod_params.params['num_intervals']})"
-        else:
-            fig_label = mod_params.model_name
+    fig, (ax1,ax2) = plt.subplots(nrows=1, ncols=2, figsize=(12,5))
 
+    for i, result in enumerate(results):
         ax1.plot(
-            current_model_prices['strikes'],
-            current_model_prices['call_prices'], label=fig_label)
+            result['strikes'],
+            result['call_prices'], label=result['label'])
         
         ax2.plot(
-            current_model_prices['strikes'],
-            current_model_prices['put_prices'], label=fig_label)
+            result['strikes'],
+            result['put_prices'], label=result['label'])
         
         plt.figtext(0.15+i/6, -0.1,
             f"MODEL #{i+1}:\n" +
-            current_model.info_string(time_to_expiry=time_to_expiry),
+            result['info_string'],
             horizontalalignment ="left", verticalalignment ="top", 
             wrap = True, fontsize = 10)
 
@@ -61,43 +118,38 @@ def compare_pricing_models(
     ax2.set(xlabel="strike", ylabel ="price")
     ax2.legend() 
     plt.show()
-    return
+    return results
 
 def compare_distributions(
         models_list: List[ModelAndParams],
         time_to_expiry:float, 
         conditions:MarketConditions, 
-        num_samples=100
+        num_samples=100,
+        plot=True,
+        max_workers=None,
+        cache: PricingCache = None,
+        store: ResultStore = None
     ):
-    common_min_strike = conditions.min_strike_of_interest
-    common_max_strike = conditions.max_strike_of_interest
-    # fig, (ax1,ax2, ax3) = plt.subplots(nrows=1, ncols=3, figsize=(18,5))
-
-    for i, mod_params in enumerate(models_list):
-        current_model = PricingModel(
-            model_name=mod_params.model_name, 
-            params=mod_params.params, 
-            conditions= conditions
-        )
-        current_model_pdf = current_model.probability_distribution_plot(
-            time_to_expiry=time_to_expiry, 
-            min_strike=common_min_strike, 
-            max_strike=common_max_strike, 
-            num_samples=num_samples,
-            plot=False)
-        
-        if mod_params.model_name == "Binomial":
-            fig_label = f"Binomial (n={mod_params.params['num_intervals']})"
-        else:
-            fig_label = mod_params.model_name
+    results = run_comparison(
+        models_list=models_list, 
+        quantity="distributions", 
+        time_to_expiry=time_to_expiry, 
+        conditions=conditions, 
+        num_samples=num_samples, 
+        max_workers=max_workers,
+        cache=cache,
+        store=store)
+    if not plot:
+        return results
 
+    for i, result in enumerate(results):
         plt.plot(
-            current_model_pdf['strikes'],
-            current_model_pdf['probs'], label=fig_label)
+            result['strikes'],
+            result['probs'], label=result['label'])
         
         plt.figtext(0.95+i/3, 0.5,
             f"MODEL #{i+1}:\n" +
-            current_model.info_string(time_to_expiry=time_to_expiry),
+            result['info_string'],
             horizontalalignment ="left", verticalalignment ="top", 
             wrap = True, fontsize = 10)
 
@@ -105,4 +157,4 @@ def compare_distributions(
     plt.xlabel("price of underlying")
     plt.legend()  
     plt.show()
-    return
\ No newline at end of file
+    return results
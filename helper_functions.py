@@ -1,38 +1,171 @@
-from scipy.stats import norm
-import scipy.stats
+from normal_distribution import normal_cdf, normal_pdf_vectorized, NORMAL_CDF_BACKENDS
+from scipy.special import ndtr, expit
 from math import log, exp, sqrt
+import numpy as np
 
-Norm = scipy.stats.norm.cdf
+Norm = normal_cdf
 
-# Black-Scholes formula
+# Black-Scholes formula. The backend selects the implementation of the normal CDF (see normal_distribution.py)
 def black_scholes_formula(
         spot: float, 
         strike: float, 
         volatility: float, 
         time_to_expiry: float,
         interest_rate = 0.0, 
-        option_type = "call"
+        option_type = "call",
+        backend = "erf"
     ):
     assert option_type == "call" or option_type == "put", "Invalid option type; must be 'call' or 'put'"
+    assert backend in NORMAL_CDF_BACKENDS, "Invalid backend"
+    Norm = NORMAL_CDF_BACKENDS[backend]
     dplus = (log(spot/strike) + (interest_rate + (volatility**2)*0.5)*time_to_expiry)/(volatility*sqrt(time_to_expiry))
     dminus = (log(spot/strike) + (interest_rate - (volatility**2)*0.5)*time_to_expiry)/(volatility*sqrt(time_to_expiry))
     if option_type == "call":
         return spot*Norm(dplus) - strike*exp(-interest_rate*time_to_expiry)*Norm(dminus)
     else:
         return strike*exp(-interest_rate*time_to_expiry)*Norm(-dminus) - spot*Norm(-dplus)
+
+# Vectorized Black-Scholes formula; all arguments are broadcast against each other
+def black_scholes_formula_vectorized(
+        spot, 
+        strike, 
+        volatility, 
+        time_to_expiry,
+        interest_rate = 0.0, 
+        is_call = True
+    ) -> np.ndarray:
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    volatility = np.asarray(volatility, dtype=float)
+    time_to_expiry = np.asarray(time_to_expiry, dtype=float)
+    interest_rate = np.asarray(interest_rate, dtype=float)
+    # +1 for calls, -1 for puts: the put formula is the call formula with both signs flipped
+    sign = np.where(is_call, 1.0, -1.0)
+    log_moneyness = np.log(spot/strike)
+    vol_sqrt_time = volatility*np.sqrt(time_to_expiry)
+    dplus = (log_moneyness + (interest_rate + (volatility**2)*0.5)*time_to_expiry)/vol_sqrt_time
+    dminus = (log_moneyness + (interest_rate - (volatility**2)*0.5)*time_to_expiry)/vol_sqrt_time
+    discounted_strike = strike*np.exp(-interest_rate*time_to_expiry)
+    return sign*(spot*ndtr(sign*dplus) - discounted_strike*ndtr(sign*dminus))
+
+# Black-Scholes price and sensitivities in one fused pass, vectorized. Besides the usual Greeks
+# (theta is -dC/dT, per year; vega and rho are per unit of volatility and rate), this returns the
+# cross/second volatility derivatives vanna = d^2C/dSdvol and volga = d^2C/dvol^2, used for smile models
+def black_scholes_greeks(
+        spot, 
+        strike, 
+        volatility, 
+        time_to_expiry,
+        interest_rate = 0.0, 
+        is_call = True
+    ) -> dict:
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    volatility = np.asarray(volatility, dtype=float)
+    time_to_expiry = np.asarray(time_to_expiry, dtype=float)
+    sign = np.where(is_call, 1.0, -1.0)
+    sqrt_time = np.sqrt(time_to_expiry)
+    vol_sqrt_time = volatility*sqrt_time
+    dplus = (np.log(spot/strike) + (interest_rate + (volatility**2)*0.5)*time_to_expiry)/vol_sqrt_time
+    dminus = dplus - vol_sqrt_time
+    discounted_strike = strike*np.exp(-interest_rate*time_to_expiry)
+    cdf_dplus = ndtr(sign*dplus)
+    cdf_dminus = ndtr(sign*dminus)
+    pdf_dplus = normal_pdf_vectorized(dplus)
+    vega = spot*pdf_dplus*sqrt_time
+    return {
+        'price': sign*(spot*cdf_dplus - discounted_strike*cdf_dminus),
+        'delta': sign*cdf_dplus,
+        'gamma': pdf_dplus/(spot*vol_sqrt_time),
+        'vega': vega,
+        'theta': -spot*pdf_dplus*volatility/(2*sqrt_time) - sign*interest_rate*discounted_strike*cdf_dminus,
+        'rho': sign*time_to_expiry*discounted_strike*cdf_dminus,
+        'vanna': -pdf_dplus*dminus/volatility,
+        'volga': vega*dplus*dminus/volatility,
+    }
+
+# Boolean call mask from a single option type or a sequence of option types
+def option_type_mask(option_types) -> np.ndarray:
+    option_types = np.asarray(option_types)
+    if option_types.dtype == bool:
+        return option_types
+    is_call = option_types == "call"
+    assert np.all(is_call | (option_types == "put")), "Invalid option type; must be 'call' or 'put'"
+    return is_call
+
+# Intrinsic value of calls/puts, vectorized
+def intrinsic_value(spot, strike, is_call) -> np.ndarray:
+    return np.maximum(np.where(is_call, spot - strike, strike - spot), 0.0)
     
-# Smooth gluing function, constantly zero on {x<=0}, constantly one on {x>=1}
+# Breeden-Litzenberger risk-neutral density exp(rT)*d^2C/dK^2 for calls priced by the Black-Scholes
+# formula with a strike-dependent volatility, given the first two strike derivatives of the volatility
+def smile_density(
+        spot, 
+        strike, 
+        volatility, 
+        dvol_dstrike, 
+        d2vol_dstrike2,
+        time_to_expiry, 
+        interest_rate = 0.0
+    ) -> np.ndarray:
+    sqrt_time = np.sqrt(time_to_expiry)
+    dplus = (np.log(spot/strike) + (interest_rate + (volatility**2)*0.5)*time_to_expiry)/(volatility*sqrt_time)
+    dminus = dplus - volatility*sqrt_time
+    discounted_pdf_dminus = np.exp(-interest_rate*time_to_expiry)*normal_pdf_vectorized(dminus)
+    vega = spot*normal_pdf_vectorized(dplus)*sqrt_time
+    d2call_dstrike2 = discounted_pdf_dminus/(strike*volatility*sqrt_time)
+    d2call_dstrike_dvol = discounted_pdf_dminus*dplus/volatility
+    d2call_dvol2 = vega*dplus*dminus/volatility
+    total_second_derivative = (
+        d2call_dstrike2 
+        + 2*d2call_dstrike_dvol*dvol_dstrike 
+        + d2call_dvol2*dvol_dstrike*dvol_dstrike 
+        + vega*d2vol_dstrike2
+    )
+    return np.exp(interest_rate*time_to_expiry)*total_second_derivative
+
+# Smooth gluing function, constantly zero on {x<=0}, constantly one on {x>=1}.
+# On (0,1) it equals exp(-1/x)/(exp(-1/x) + exp(-1/(1-x))) = expit(1/(1-x) - 1/x), which is evaluated
+# in the latter form so that it stays finite near the end points, where both exponentials underflow.
+# Accepts scalars or arrays.
 def gluing_function(x):
-    if 0 < x < 1:
-        return exp(-1/x)/(exp(-1/x) + exp(-1/(1-x)))
-    elif x <= 0:
-        return 0
-    else:
-        return 1
+    if np.ndim(x) == 0:
+        if 0 < x < 1:
+            exponent = 1/x - 1/(1-x)
+            if exponent > 0:
+                return exp(-exponent)/(1 + exp(-exponent))
+            return 1/(1 + exp(exponent))
+        elif x <= 0:
+            return 0
+        else:
+            return 1
+    x = np.asarray(x, dtype=float)
+    inside, y = _gluing_interior(x)
+    return np.where(inside, expit(1/(1-y) - 1/y), np.where(x < 0.5, 0.0, 1.0))
+    
+# First and second derivatives of the gluing function, vectorized
+def gluing_function_derivatives(x):
+    x = np.asarray(x, dtype=float)
+    inside, y = _gluing_interior(x)
+    glue = expit(1/(1-y) - 1/y)
+    spread = glue*(1 - glue)
+    inverse_squares = 1/(y*y) + 1/((1-y)*(1-y))
+    first = spread*inverse_squares
+    second = first*(1 - 2*glue)*inverse_squares + spread*(2/((1-y)**3) - 2/(y**3))
+    return np.where(inside, first, 0.0), np.where(inside, second, 0.0)
+
+# Mask of the points in (0,1), and the points with those outside replaced by 1/2.
+# Within 1e-3 of the end points, exp(-1/x) underflows, so the function is exactly 0 or 1 there and its
+# derivatives vanish; those points are treated as end points, so that 1/x^2 and 1/(1-x)^2 stay finite.
+def _gluing_interior(x: np.ndarray):
+    inside = (x > 1e-3) & (1 - x > 1e-3)
+    return inside, np.where(inside, x, 0.5)
     
-# ReLu function
+# ReLu function, for scalars or arrays
 def relu(x):
-    return max(x,0)
+    if np.ndim(x) == 0:
+        return max(x,0)
+    return np.maximum(x, 0)
     
 # Choose function
 def choose(k, n):
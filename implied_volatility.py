@@ -0,0 +1,92 @@
+from normal_distribution import normal_cdf_vectorized, normal_pdf_vectorized
+from math import sqrt, pi
+import numpy as np
+
+
+MIN_VOLATILITY = 1e-6
+MAX_VOLATILITY = 10.0
+
+
+# Implied Black-Scholes volatilities of arrays of option prices; all arguments are broadcast against each other.
+# Returns the volatilities and a boolean array of which elements converged. Prices outside the no-arbitrage
+# bounds, and elements that did not converge within max_iterations, get NaN volatilities instead of raising.
+def implied_volatility(
+        prices, 
+        spot, 
+        strikes, 
+        times_to_expiry, 
+        interest_rate = 0.0, 
+        is_call = True,
+        tolerance = 1e-10,
+        max_iterations = 50
+    ):
+    prices, spot, strikes, times_to_expiry, interest_rate, is_call = np.broadcast_arrays(
+        np.asarray(prices, dtype=float), 
+        np.asarray(spot, dtype=float), 
+        np.asarray(strikes, dtype=float), 
+        np.asarray(times_to_expiry, dtype=float), 
+        np.asarray(interest_rate, dtype=float), 
+        is_call)
+    shape = prices.shape
+    prices, spot, strikes, times_to_expiry, interest_rate, is_call = (
+        array.ravel() for array in (prices, spot, strikes, times_to_expiry, interest_rate, is_call))
+    discounted_strikes = strikes*np.exp(-interest_rate*times_to_expiry)
+    sqrt_time = np.sqrt(times_to_expiry)
+
+    # Solve for the out-of-the-money option (via put-call parity), whose price is not swamped by intrinsic value
+    otm_is_call = spot <= discounted_strikes
+    forward_gap = spot - discounted_strikes
+    otm_prices = prices + np.where(otm_is_call == is_call, 0.0, np.where(is_call, -forward_gap, forward_gap))
+    upper_bounds = np.where(otm_is_call, spot, discounted_strikes)
+    sign = np.where(otm_is_call, 1.0, -1.0)
+
+    vols = np.full(prices.size, np.nan)
+    converged = np.zeros(prices.size, dtype=bool)
+    valid = (otm_prices > 0) & (otm_prices < upper_bounds) & (times_to_expiry > 0) & (strikes > 0) & (spot > 0)
+
+    # Rational initial guess (Corrado-Miller), falling back to the vega-maximizing volatility
+    call_prices = otm_prices + np.where(otm_is_call, 0.0, forward_gap)
+    centered = call_prices - 0.5*forward_gap
+    discriminant = np.maximum(centered*centered - forward_gap*forward_gap/pi, 0.0)
+    guess = sqrt(2*pi)/(spot + discounted_strikes)*(centered + np.sqrt(discriminant))/sqrt_time
+    fallback = np.sqrt(2*np.abs(np.log(spot/discounted_strikes)))/sqrt_time
+    guess = np.where(np.isfinite(guess) & (guess > MIN_VOLATILITY), guess, fallback)
+    vols[valid] = np.clip(guess[valid], MIN_VOLATILITY, MAX_VOLATILITY)
+
+    lower = np.full(prices.size, 0.0)
+    upper = np.full(prices.size, MAX_VOLATILITY)
+    active = np.flatnonzero(valid)
+    log_moneyness = np.log(spot/discounted_strikes)
+    for _ in range(max_iterations):
+        if active.size == 0:
+            break
+        vol = vols[active]
+        vol_sqrt_time = vol*sqrt_time[active]
+        dplus = log_moneyness[active]/vol_sqrt_time + 0.5*vol_sqrt_time
+        dminus = dplus - vol_sqrt_time
+        option_sign = sign[active]
+        model_prices = option_sign*(
+            spot[active]*normal_cdf_vectorized(option_sign*dplus) - discounted_strikes[active]*normal_cdf_vectorized(option_sign*dminus))
+        vega = spot[active]*normal_pdf_vectorized(dplus)*sqrt_time[active]
+        error = model_prices - otm_prices[active]
+
+        # Prices are increasing in the volatility, so the sign of the error tightens the bracket
+        too_high = error > 0
+        upper[active] = np.where(too_high, vol, upper[active])
+        lower[active] = np.where(too_high, lower[active], vol)
+
+        # Halley step, falling back to bisection of the bracket when it leaves it or is not finite
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton_step = error/vega
+            halley_step = newton_step/(1 - 0.5*newton_step*dplus*dminus/vol)
+            new_vol = vol - halley_step
+        in_bracket = np.isfinite(new_vol) & (new_vol >= lower[active]) & (new_vol <= upper[active])
+        new_vol = np.where(in_bracket, new_vol, 0.5*(lower[active] + upper[active]))
+        vols[active] = new_vol
+
+        done = (error == 0) | (np.abs(new_vol - vol) < tolerance*np.maximum(1.0, vol))
+        converged[active[done]] = True
+        active = active[~done]
+
+    vols[~converged] = np.nan
+    return vols.reshape(shape), converged.reshape(shape)
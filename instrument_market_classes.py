@@ -1,26 +1,166 @@
+from helper_functions import option_type_mask, intrinsic_value
+import numpy as np
+
+
+# Option types are stored as int8 codes; with calls coded as 1, a code array viewed as booleans is the call mask
+OPTION_TYPES = ("put", "call")
+PUT_CODE, CALL_CODE = 0, 1
+
+
+# A single option. Options created on their own keep their fields in slots, while OptionBook.__getitem__
+# returns views into one row of a shared book (with the fields read from and written to the book's arrays).
 class OptionClass:
+    __slots__ = ("_book", "_index", "_strike", "_time_to_expiry", "_type_code")
+
     def __init__(self, strike: float, time_to_expiry: float, option_type: str) -> None:
         assert option_type == "call" or option_type == "put", "Option type must be 'call' or 'put'"
-        self.strike = strike
-        self.time_to_expiry = time_to_expiry
-        self.option_type = option_type
+        self._book = None
+        self._strike = strike
+        self._time_to_expiry = time_to_expiry
+        self._type_code = CALL_CODE if option_type == "call" else PUT_CODE
+
+    @classmethod
+    def view(cls, book: "OptionBook", index: int) -> "OptionClass":
+        option = cls.__new__(cls)
+        option._book = book
+        option._index = index
+        return option
+
+    @property
+    def strike(self) -> float:
+        if self._book is None:
+            return self._strike
+        return float(self._book.strikes[self._index])
+
+    @strike.setter
+    def strike(self, strike: float) -> None:
+        if self._book is None:
+            self._strike = strike
+        else:
+            self._book.strikes[self._index] = strike
+
+    @property
+    def time_to_expiry(self) -> float:
+        if self._book is None:
+            return self._time_to_expiry
+        return float(self._book.times_to_expiry[self._index])
+
+    @time_to_expiry.setter
+    def time_to_expiry(self, time_to_expiry: float) -> None:
+        if self._book is None:
+            self._time_to_expiry = time_to_expiry
+        else:
+            self._book.times_to_expiry[self._index] = time_to_expiry
+
+    @property
+    def option_type(self) -> str:
+        return OPTION_TYPES[self._get_type_code()]
+
+    @property
+    def is_call(self) -> bool:
+        return self._get_type_code() == CALL_CODE
+
+    @option_type.setter
+    def option_type(self, option_type: str) -> None:
+        assert option_type == "call" or option_type == "put", "Option type must be 'call' or 'put'"
+        type_code = CALL_CODE if option_type == "call" else PUT_CODE
+        if self._book is None:
+            self._type_code = type_code
+        else:
+            self._book.type_codes[self._index] = type_code
 
     def value_at_expiration(self, spot_at_expiry: float) -> float:
-        if self.option_type == "call":
+        if self._get_type_code() == CALL_CODE:
             return max(0, spot_at_expiry - self.strike)
         else:
             return max(0, self.strike - spot_at_expiry)
 
+    # As a plain int, so that is_call is a plain bool
+    def _get_type_code(self) -> int:
+        if self._book is None:
+            return self._type_code
+        return int(self._book.type_codes[self._index])
+
+
+# Columnar book of options: contiguous float64 strikes and expiries and int8 option type codes.
+# Slicing a one-dimensional book returns a book viewing the same memory, and indexing returns OptionClass views.
+class OptionBook:
+    def __init__(self, strikes, times_to_expiry, option_types) -> None:
+        strikes, times_to_expiry, is_call = np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), 
+            np.asarray(times_to_expiry, dtype=float), 
+            option_type_mask(option_types))
+        # Arrays that already have the right layout are used as they are, without copying
+        self.strikes = np.ascontiguousarray(strikes)
+        self.times_to_expiry = np.ascontiguousarray(times_to_expiry)
+        self.type_codes = np.ascontiguousarray(is_call).view(np.int8)
+
+    @classmethod
+    def from_options(cls, options: list) -> "OptionBook":
+        return cls(
+            strikes=[option.strike for option in options], 
+            times_to_expiry=[option.time_to_expiry for option in options], 
+            option_types=[option.option_type for option in options])
+
+    # Wraps existing arrays (int8 type codes, 0 for puts and 1 for calls) without copying them
+    @classmethod
+    def from_arrays(cls, strikes: np.ndarray, times_to_expiry: np.ndarray, type_codes: np.ndarray) -> "OptionBook":
+        assert strikes.dtype == np.float64 and times_to_expiry.dtype == np.float64, "Strikes and expiries must be float64"
+        assert type_codes.dtype == np.int8, "Type codes must be int8"
+        assert strikes.shape == times_to_expiry.shape == type_codes.shape, "Arrays must have the same shape"
+        book = cls.__new__(cls)
+        book.strikes = strikes
+        book.times_to_expiry = times_to_expiry
+        book.type_codes = type_codes
+        return book
+
+    @property
+    def is_call(self) -> np.ndarray:
+        return self.type_codes.view(bool)
+
+    def __len__(self) -> int:
+        return self.strikes.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return OptionBook.from_arrays(
+                strikes=self.strikes[index], 
+                times_to_expiry=self.times_to_expiry[index], 
+                type_codes=self.type_codes[index])
+        # Multi-dimensional books are indexed in flat order
+        return OptionClass.view(self._flat_book(), index)
+
+    def __iter__(self):
+        flat_book = self._flat_book()
+        return (OptionClass.view(flat_book, index) for index in range(len(self)))
+
+    # The book itself if it is one-dimensional, else a one-dimensional book viewing its (contiguous) arrays
+    def _flat_book(self) -> "OptionBook":
+        if self.strikes.ndim == 1:
+            return self
+        return OptionBook.from_arrays(
+            strikes=self.strikes.reshape(-1), 
+            times_to_expiry=self.times_to_expiry.reshape(-1), 
+            type_codes=self.type_codes.reshape(-1))
+
+    def value_at_expiration(self, spot_at_expiry) -> np.ndarray:
+        return intrinsic_value(spot_at_expiry, self.strikes, self.is_call)
+
 
 
 class MarketConditions:
+    __slots__ = ("spot", "interest_rate", "min_strike_of_interest", "max_strike_of_interest")
+
     def __init__(self, spot, interest_rate) -> None:
         self.spot = spot
         self.interest_rate = interest_rate
         self.min_strike_of_interest=0.5*self.spot
         self.max_strike_of_interest=2*self.spot
 
+    # Hashable snapshot of everything prices can depend on
+    def snapshot(self) -> tuple:
+        return (self.spot, self.interest_rate, self.min_strike_of_interest, self.max_strike_of_interest)
+
     def set_min_max_strikes_of_interest(self, new_min_strike_of_interest, new_max_strike_of_interest):
         self.min_strike_of_interest = new_min_strike_of_interest
         self.max_strike_of_interest = new_max_strike_of_interest
-
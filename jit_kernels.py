@@ -0,0 +1,139 @@
+from math import erfc, exp, log, log1p, sqrt
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# Scalar pricing kernels for single-option calls, compiled with numba where it is installed. They only use
+# floats, math functions and plain loops, so that they compile in nopython mode; the compiled code is cached
+# on disk (next to this file, or under NUMBA_CACHE_DIR), so that later processes skip the compilation.
+# Without numba the kernels are plain Python functions, and PricingModel keeps its pure Python kernels.
+# All kernels take (spot, strike, time_to_expiry, interest_rate, is_call) followed by the model parameters,
+# passed as they are stored, without conversions (each new combination of argument types, such as an integer
+# spot, compiles and caches its own specialization).
+JIT_AVAILABLE = numba is not None
+
+INVERSE_SQRT_TWO = 1/sqrt(2)
+
+
+def jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def normal_cdf_kernel(x):
+    return 0.5*erfc(-x*INVERSE_SQRT_TWO)
+
+@jit
+def black_scholes_kernel(spot, strike, time_to_expiry, interest_rate, is_call, volatility):
+    vol_sqrt_time = volatility*sqrt(time_to_expiry)
+    dplus = (log(spot/strike) + (interest_rate + volatility*volatility*0.5)*time_to_expiry)/vol_sqrt_time
+    dminus = dplus - vol_sqrt_time
+    discounted_strike = strike*exp(-interest_rate*time_to_expiry)
+    if is_call:
+        return spot*normal_cdf_kernel(dplus) - discounted_strike*normal_cdf_kernel(dminus)
+    return discounted_strike*normal_cdf_kernel(-dminus) - spot*normal_cdf_kernel(-dplus)
+
+# Gluing function (see helper_functions.py)
+@jit
+def gluing_kernel(x):
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    exponent = 1/x - 1/(1-x)
+    if exponent > 0:
+        return exp(-exponent)/(1 + exp(-exponent))
+    return 1/(1 + exp(exponent))
+
+@jit
+def quadratic_smile_kernel(spot, strike, time_to_expiry, interest_rate, is_call, c0, c1, c2):
+    d1 = (log(spot/strike) + interest_rate*time_to_expiry)/(c0*sqrt(time_to_expiry))
+    volatility = c0 + c1*d1 + c2*d1*d1
+    return black_scholes_kernel(spot, strike, time_to_expiry, interest_rate, is_call, volatility)
+
+@jit
+def hyperbolic_smile_kernel(spot, strike, time_to_expiry, interest_rate, is_call, c0, c1, c2_plus, c2_minus, glue_end_point):
+    d1 = (log(spot/strike) + interest_rate*time_to_expiry)/(c0*sqrt(time_to_expiry))
+    f_plus = sqrt(c0*c0 + c1*c1*d1 + c2_plus*c2_plus*d1*d1)
+    f_minus = sqrt(c0*c0 + c1*c1*d1 + c2_minus*c2_minus*d1*d1)
+    interpolation = gluing_kernel((d1 + glue_end_point)/(2*glue_end_point))
+    volatility = interpolation*f_plus + (1 - interpolation)*f_minus
+    return black_scholes_kernel(spot, strike, time_to_expiry, interest_rate, is_call, volatility)
+
+# Plain binomial tree: European options are summed over the terminal nodes (with the log weights updated
+# from node to node), American ones are rolled back through the tree in a single buffer of N+1 node values
+@jit
+def binomial_kernel(spot, strike, time_to_expiry, interest_rate, is_call, up_tick, down_tick, num_intervals, american):
+    time_interval = time_to_expiry/num_intervals
+    interest = exp(interest_rate*time_interval)
+    assert down_tick < interest and interest < up_tick, "There is no probability eliminating arbitrage"
+    martingale_prob = (interest - down_tick)/(up_tick - down_tick)
+    sign = 1.0 if is_call else -1.0
+    log_up, log_down = log(up_tick), log(down_tick)
+    if not american:
+        log_odds = log(martingale_prob) - log1p(-martingale_prob)
+        log_weight = num_intervals*log1p(-martingale_prob)
+        price = 0.0
+        for i in range(num_intervals + 1):
+            payoff = sign*(spot*exp(i*log_up + (num_intervals - i)*log_down) - strike)
+            if payoff > 0:
+                price += exp(log_weight)*payoff
+            if i < num_intervals:
+                log_weight += log((num_intervals - i)/(i + 1)) + log_odds
+        return exp(-interest_rate*time_to_expiry)*price
+
+    discounted_up_prob = martingale_prob/interest
+    discounted_down_prob = (1 - martingale_prob)/interest
+    # Node spots are spot*down_tick^step*(up_tick/down_tick)^i, as in BinomialTree
+    ratio_powers = np.empty(num_intervals + 1)
+    down_powers = np.empty(num_intervals + 1)
+    for i in range(num_intervals + 1):
+        ratio_powers[i] = exp(i*(log_up - log_down))
+        down_powers[i] = exp(i*log_down)
+    values = np.empty(num_intervals + 1)
+    for i in range(num_intervals + 1):
+        values[i] = max(sign*(spot*down_powers[num_intervals]*ratio_powers[i] - strike), 0.0)
+    for step in range(num_intervals - 1, -1, -1):
+        for i in range(step + 1):
+            continuation = values[i]*discounted_down_prob + values[i + 1]*discounted_up_prob
+            values[i] = max(continuation, sign*(spot*down_powers[step]*ratio_powers[i] - strike))
+    return values[0]
+
+# Volatility surface (see VolSurface.volatilities), from its moneyness grid, expiries and total variances
+@jit
+def vol_surface_kernel(spot, strike, time_to_expiry, interest_rate, is_call, moneyness, expiries, total_variances):
+    log_moneyness = log(strike/spot) - interest_rate*time_to_expiry
+    position = (min(max(log_moneyness, moneyness[0]), moneyness[-1]) - moneyness[0])/(moneyness[1] - moneyness[0])
+    left = min(int(position), moneyness.size - 2)
+    weight = position - left
+
+    last = expiries.size - 1
+    upper = min(np.searchsorted(expiries, time_to_expiry), last)
+    lower = max(upper - 1, 0)
+    lower_variance = total_variances[lower, left]*(1 - weight) + total_variances[lower, left + 1]*weight
+    upper_variance = total_variances[upper, left]*(1 - weight) + total_variances[upper, left + 1]*weight
+    if upper > lower and time_to_expiry <= expiries[last]:
+        expiry_weight = (time_to_expiry - expiries[lower])/(expiries[upper] - expiries[lower])
+        total_variance = lower_variance*(1 - expiry_weight) + upper_variance*expiry_weight
+    else:
+        total_variance = upper_variance*time_to_expiry/expiries[upper]
+    return black_scholes_kernel(spot, strike, time_to_expiry, interest_rate, is_call, sqrt(total_variance/time_to_expiry))
+
+
+# Compiles (or loads from the disk cache) every kernel for the argument types used by the models, so that
+# the first pricing call of a process does not pay for it
+def compile_jit_kernels() -> None:
+    if not JIT_AVAILABLE:
+        return
+    black_scholes_kernel(100.0, 100.0, 1.0, 0.0, True, 0.2)
+    quadratic_smile_kernel(100.0, 100.0, 1.0, 0.0, True, 0.2, -0.1, 0.05)
+    hyperbolic_smile_kernel(100.0, 100.0, 1.0, 0.0, True, 0.2, 0.1, 0.1, 0.1, 3.0)
+    binomial_kernel(100.0, 100.0, 1.0, 0.0, True, 1.1, 0.9, 10, False)
+    binomial_kernel(100.0, 100.0, 1.0, 0.0, True, 1.1, 0.9, 10, True)
+    vol_surface_kernel(100.0, 100.0, 1.0, 0.0, True, np.linspace(-1.0, 1.0, 3), np.array([1.0]), np.full((1, 3), 0.04))
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from threading import RLock
+import hashlib
+import sys
+import time
+import numpy as np
+
+
+# Rough per-entry overhead (key tuple, bookkeeping) on top of the size of the cached value
+ENTRY_OVERHEAD_BYTES = 256
+
+
+# Bounded LRU cache of option prices, shared between any number of PricingModels.
+# Entries are keyed on a snapshot of the model (name and parameters) and of the option(s) priced, and are
+# tagged with a snapshot of the market conditions; as soon as a model is used under different conditions
+# (spot, interest rate or strike range), all its entries priced under the old conditions are dropped.
+# Entries older than time_to_live seconds (if given) are treated as misses, and the least recently used
+# entries are evicted whenever the estimated memory use exceeds max_bytes.
+class PricingCache:
+    def __init__(self, max_bytes=64*1024*1024, time_to_live=None) -> None:
+        assert max_bytes > 0, "Byte budget must be positive"
+        self.max_bytes = max_bytes
+        self.time_to_live = time_to_live
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._conditions_by_model = {}
+        self._keys_by_model = {}
+        self._lock = RLock()
+
+    def get(self, model_key: tuple, conditions_key: tuple, option_key: tuple):
+        with self._lock:
+            self._check_conditions(model_key, conditions_key)
+            key = (model_key, option_key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, created = entry
+            if self.time_to_live is not None and time.monotonic() - created > self.time_to_live:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, model_key: tuple, conditions_key: tuple, option_key: tuple, value) -> None:
+        size = ENTRY_OVERHEAD_BYTES + (value.nbytes if isinstance(value, np.ndarray) else sys.getsizeof(value))
+        if size > self.max_bytes:
+            return
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        with self._lock:
+            self._check_conditions(model_key, conditions_key)
+            key = (model_key, option_key)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._keys_by_model.setdefault(model_key, set()).add(key)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._conditions_by_model.clear()
+            self._keys_by_model.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+    def _check_conditions(self, model_key: tuple, conditions_key: tuple) -> None:
+        previous = self._conditions_by_model.get(model_key)
+        if previous is not None and previous != conditions_key:
+            stale_keys = self._keys_by_model.pop(model_key, set())
+            for key in stale_keys:
+                self._remove(key)
+            self.invalidations += len(stale_keys)
+        self._conditions_by_model[model_key] = conditions_key
+
+    def _remove(self, key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        model_keys = self._keys_by_model.get(key[0])
+        if model_keys is not None:
+            model_keys.discard(key)
+
+
+# Hashable key for a batch of options, from a digest of the contents of its arrays
+def batch_key(*arrays) -> tuple:
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.data)
+    return ('batch', digest.hexdigest())
@@ -1,98 +1,144 @@
 
-from instrument_market_classes import OptionClass, MarketConditions
+from instrument_market_classes import OptionClass, OptionBook, MarketConditions
 from matplotlib import pyplot as plt
 from pricing_model_menagerie import *
+from helper_functions import intrinsic_value
+from pricing_cache import PricingCache, batch_key
+from result_store import ResultStore
+from jit_kernels import JIT_AVAILABLE
+from numbers import Real
+import numpy as np
 
 
+# With backend="jit", single options are priced by the model's compiled scalar kernel (see jit_kernels.py),
+# where the model has one and numba is installed; otherwise the pure Python kernels are used. The backend
+# attribute records which one is in use. Batches, densities and Greeks always use the vectorized kernels.
 class PricingModel:
-    def __init__(self, model_name: str, params: dict, conditions: MarketConditions) -> None:
+    def __init__(self, model_name: str, params: dict, conditions: MarketConditions, cache: PricingCache = None, backend="python") -> None:
+        assert backend in PRICING_BACKENDS, "Invalid backend"
         self.model_name = model_name
         self.params = params
         self.conditions = conditions
+        self.cache = cache
+        self.cache_key = (model_name, tuple(sorted(params.items())))
         self.max_strike_of_interest=conditions.max_strike_of_interest
         self.min_strike_of_interest=conditions.min_strike_of_interest
 
-        if model_name == "Black-Scholes":
-            assert 'volatility' in params, "Missing paramter"
-            self.model = BlackScholes(volatility=params['volatility'])
-
-        elif model_name == "Quadratic volatility smile":
-            assert 'atm_vol' in params, "Missing parameter"
-            assert 'skew' in params, "Missing parameter"
-            assert 'curvature' in params, "Missing parameter"
-            self.model = VolSmileQuadratic(
-                c0=params['atm_vol'], 
-                c1=params['skew'], 
-                c2=params['curvature'])
-        elif model_name == "Hyperbolic volatility smile":
-            assert 'atm_vol' in params, "Missing parameter"
-            assert 'skew' in params, "Missing parameter"
-            assert 'right_asymp' in params, "Missing parameter"
-            assert 'left_asymp' in params, "Missing parameter"
-            self.model = VolSmileHyperbolic(
-                c0=params['atm_vol'], 
-                c1=sqrt(params['skew']*2*params['atm_vol']), 
-                c2_plus=params['right_asymp'], 
-                c2_minus=params['left_asymp'])
-        elif model_name == "Binomial":
-            assert 'up_tick' in params, "Missing parameter"
-            assert 'down_tick' in params, "Missing parameter"
-            assert 'num_intervals' in params, "Missing parameter"
-            self.model = Binomial(
-                up_tick=params['up_tick'], 
-                down_tick=params['down_tick'], 
-                num_intervals=params['num_intervals'])
-        else:
-            assert False, "Unrecognized model type"
+        assert model_name in MODEL_REGISTRY, "Unrecognized model type"
+        model_class = MODEL_REGISTRY[model_name]
+        for param in model_class.required_params:
+            assert param in params, "Missing parameter"
+        # The model's kernels are bound once here, so that pricing calls go straight to them
+        self.model = model_class.from_params({**model_class.optional_params, **params})
+        kernels = self.model.kernels()
+        assert all(kernel in kernels for kernel in MODEL_KERNELS), "Missing kernel"
+        self.pricing_function = kernels['pricing_function']
+        self.batch_pricing_function = kernels['batch_pricing_function']
+        self.density_function = kernels['density_function']
+        self.greeks_function = kernels['greeks_function']
+        self.backend = "python"
+        if backend == "jit" and JIT_AVAILABLE and hasattr(self.model, 'jit_kernels'):
+            jit_pricing_function = self.model.jit_kernels()['pricing_function']
+            if jit_pricing_function is not None:
+                self.pricing_function = jit_pricing_function
+                self.backend = "jit"
 
     def info_string(self, time_to_expiry: float) -> str:
         info_string = f"Model type:\n{self.model_name}" 
         info_string += "\n\nParameters:"
         for p in self.params:
-            info_string += f"\n{p}: {round(self.params[p],4)}"
+            value = self.params[p]
+            if isinstance(value, Real) and not isinstance(value, bool):
+                value = round(value, 4)
+            info_string += f"\n{p}: {value}"
         info_string += "\n\nConditions:" + f"\nspot={self.conditions.spot}" + f"\ntime_to_expiry={round(time_to_expiry,4)}" + f"\ninterest_rate={self.conditions.interest_rate}"
         return info_string
                
 
     def model_pricing_function(self, option: OptionClass, time_value_only=False):
-        if self.model_name == "Black-Scholes":
-            price = self.model.bs_pricing_function(option=option, conditions=self.conditions)
-        elif self.model_name == "Quadratic volatility smile":
-            price = self.model.quadratic_pricing_function(option=option, conditions=self.conditions)
-        elif self.model_name == "Hyperbolic volatility smile":
-            price = self.model.hyperbolic_pricing_function(option=option, conditions=self.conditions)
-        elif self.model_name == "Binomial":
-            price = self.model.binomial_pricing_function(option=option, conditions=self.conditions)
+        if self.cache is not None:
+            option_key = (option.strike, option.time_to_expiry, option.option_type)
+            price = self.cache.get(self.cache_key, self.conditions.snapshot(), option_key)
+            if price is None:
+                price = self._uncached_pricing_function(option)
+                self.cache.put(self.cache_key, self.conditions.snapshot(), option_key, price)
+        else:
+            price = self._uncached_pricing_function(option)
         if time_value_only:
             if option.option_type == "call":
                 price -= max(0, self.conditions.spot - option.strike)
             else: 
                 price -= max(0, option.strike - self.conditions.spot)
         return price
+
+    def _uncached_pricing_function(self, option: OptionClass):
+        return self.pricing_function(option=option, conditions=self.conditions)
+
+    # Prices a whole book with a single call to the model's vectorized kernel. With a cache, the cached
+    # arrays are read-only, so a copy is returned (which the caller may modify).
+    def model_batch_pricing_function(self, book: OptionBook, time_value_only=False) -> np.ndarray:
+        prices = None
+        if self.cache is not None:
+            option_key = batch_key(book.strikes, book.times_to_expiry, book.type_codes)
+            prices = self.cache.get(self.cache_key, self.conditions.snapshot(), option_key)
+        if prices is None:
+            prices = self.batch_pricing_function(
+                conditions=self.conditions, 
+                strikes=book.strikes, 
+                times_to_expiry=book.times_to_expiry, 
+                is_call=book.is_call)
+            if self.cache is not None:
+                self.cache.put(self.cache_key, self.conditions.snapshot(), option_key, prices)
+        if time_value_only:
+            return prices - book.value_at_expiration(self.conditions.spot)
+        if self.cache is not None:
+            return prices.copy()
+        return prices
+
+    def price_many(self, strikes, expiries, option_types, time_value_only=False) -> np.ndarray:
+        return self.model_batch_pricing_function(
+            book=OptionBook(strikes=strikes, times_to_expiry=expiries, option_types=option_types),
+            time_value_only=time_value_only)
         
+    # Price, delta, gamma, vega, theta and rho of a whole book, as a dictionary of arrays
+    def model_greeks_function(self, book: OptionBook) -> dict:
+        assert self.greeks_function is not None, "No Greeks for this model"
+        return self.greeks_function(
+            conditions=self.conditions, 
+            strikes=book.strikes, 
+            times_to_expiry=book.times_to_expiry, 
+            is_call=book.is_call)
+
+    def greeks_many(self, strikes, expiries, option_types) -> dict:
+        return self.model_greeks_function(
+            book=OptionBook(strikes=strikes, times_to_expiry=expiries, option_types=option_types))
+
     def pricing_plot(
             self, 
             time_to_expiry: float, 
             num_samples=100,
             plot=True,
-            time_value_only=False
+            time_value_only=False,
+            store: ResultStore = None
         ) -> dict:
         min_strike= self.min_strike_of_interest
         max_strike= self.max_strike_of_interest
         step_size = (max_strike - min_strike )/num_samples
-        strikes = [min_strike + i*step_size for i in range(num_samples)]
-        call_prices = [
-            self.model_pricing_function(
-                option=OptionClass(strike=K, time_to_expiry=time_to_expiry, option_type="call"), 
-                time_value_only=time_value_only)
-            for K in strikes
-        ]
-        put_prices = [
-            self.model_pricing_function(
-                option=OptionClass(strike=K, time_to_expiry=time_to_expiry, option_type="put"), 
-                time_value_only=time_value_only)
-            for K in strikes
-        ]
+        grid_spec = {
+            'grid': "prices", 'min_strike': min_strike, 'max_strike': max_strike, 
+            'time_to_expiry': time_to_expiry, 'num_samples': num_samples, 'time_value_only': time_value_only}
+        stored = self._stored_grid(store=store, grid_spec=grid_spec)
+        if stored is None:
+            strikes = [min_strike + i*step_size for i in range(num_samples)]
+            call_prices = list(self.price_many(
+                strikes=strikes, expiries=time_to_expiry, option_types="call", time_value_only=time_value_only))
+            put_prices = list(self.price_many(
+                strikes=strikes, expiries=time_to_expiry, option_types="put", time_value_only=time_value_only))
+            if store is not None:
+                stored = self._store_grid(store=store, grid_spec=grid_spec, arrays={
+                    'strikes': strikes, 'call_prices': call_prices, 'put_prices': put_prices})
+        if stored is not None:
+            strikes, call_prices, put_prices = stored['strikes'], stored['call_prices'], stored['put_prices']
 
         if plot:
             plt.plot(strikes, call_prices, label="calls")
@@ -117,24 +163,55 @@ class PricingModel:
         right_wing = abbrev_pricing_function(option.strike + radius)
         return round(left_wing - 2*body + right_wing, 9) 
     
+    # Risk-neutral density exp(rT)*d^2C/dK^2 at the given strikes. The finite-difference method prices
+    # all the butterfly legs on one shared strike grid, so that neighbouring legs are only priced once.
+    # With method="auto", models with an analytic density use it (and precision is ignored).
+    def risk_neutral_density(self, strikes, time_to_expiry: float, precision=0.1, method="auto") -> np.ndarray:
+        strikes = np.asarray(strikes, dtype=float)
+        method = self._density_method(method)
+        if method == "analytic":
+            assert self.density_function is not None, "No analytic density for this model"
+            return self.density_function(conditions=self.conditions, strikes=strikes, time_to_expiry=time_to_expiry)
+        # Legs at strike distance below ~1e-12 are identified with each other
+        grid, leg_indices = np.unique(
+            np.round(np.add.outer([-precision, 0, precision], strikes), 12), return_inverse=True)
+        legs = self.price_many(strikes=grid, expiries=time_to_expiry, option_types="call")[leg_indices.reshape(3, -1)]
+        discounted_density = (legs[0] - 2*legs[1] + legs[2])/(precision*precision)
+        return exp(self.conditions.interest_rate*time_to_expiry)*discounted_density
+
+    def _density_method(self, method: str) -> str:
+        assert method in ("auto", "analytic", "finite_difference"), "Invalid method"
+        if method == "auto":
+            return "finite_difference" if self.density_function is None else "analytic"
+        return method
+    
     def probability_distribution_plot(
             self,
             time_to_expiry: float,
-
             precision=0.1,
             num_samples=100,
-            plot=True
+            plot=True,
+            method="auto",
+            store: ResultStore = None
         ):
         max_strike=self.max_strike_of_interest
         min_strike=self.min_strike_of_interest
         step_size = (max_strike - min_strike )/num_samples
-        strikes = [min_strike + i*step_size for i in range(num_samples)]
-        probs = [
-            self.butterfly_price(
-                option=OptionClass(strike=K, time_to_expiry=time_to_expiry, option_type="call"),
-                radius=precision
-            )/(precision*precision) for K in strikes
-        ]
+        method = self._density_method(method)
+        grid_spec = {
+            'grid': "densities", 'min_strike': min_strike, 'max_strike': max_strike, 
+            'time_to_expiry': time_to_expiry, 'num_samples': num_samples, 'method': method}
+        if method == "finite_difference":
+            grid_spec['precision'] = precision
+        stored = self._stored_grid(store=store, grid_spec=grid_spec)
+        if stored is None:
+            strikes = [min_strike + i*step_size for i in range(num_samples)]
+            probs = list(self.risk_neutral_density(
+                strikes=strikes, time_to_expiry=time_to_expiry, precision=precision, method=method))
+            if store is not None:
+                stored = self._store_grid(store=store, grid_spec=grid_spec, arrays={'strikes': strikes, 'probs': probs})
+        if stored is not None:
+            strikes, probs = stored['strikes'], stored['probs']
         if plot:
             plt.plot(strikes, probs)
             plt.title("Risk-neutral probability density function")
@@ -145,3 +222,18 @@ class PricingModel:
                 wrap = True, fontsize = 10)
             plt.show()
         return {'strikes': strikes, 'probs': probs}
+
+    # Grids of the plotting methods can be kept in a ResultStore, keyed on the model, the market conditions
+    # and the grid specification, which includes the model's own strike range (fixed when the model was
+    # created, so possibly not that of the current conditions). With a store, the grids are returned as (read-only) arrays instead of lists.
+    def _stored_grid(self, store: ResultStore, grid_spec: dict):
+        if store is None:
+            return None
+        return store.get(store.key(self.model_name, self.params, self.conditions.snapshot(), grid_spec))
+
+    def _store_grid(self, store: ResultStore, grid_spec: dict, arrays: dict) -> dict:
+        arrays = {name: np.asarray(values, dtype=float) for name, values in arrays.items()}
+        store.put(store.key(self.model_name, self.params, self.conditions.snapshot(), grid_spec), arrays)
+        for array in arrays.values():
+            array.setflags(write=False)
+        return arrays
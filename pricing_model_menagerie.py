@@ -1,16 +1,65 @@
 
-from helper_functions import choose, gluing_function, black_scholes_formula
+from helper_functions import gluing_function, black_scholes_formula
 from instrument_market_classes import OptionClass, MarketConditions
 from matplotlib import pyplot as plt
-from math import log, sqrt, exp
-from helper_functions import relu
+from math import log, sqrt, exp, log1p
+from functools import lru_cache
+from scipy.special import gammaln
+from scipy.linalg import solve_banded
+from helper_functions import black_scholes_formula_vectorized, black_scholes_greeks, smile_density, gluing_function_derivatives
+from binomial_lattice import BinomialTree, get_binomial_tree
+from jit_kernels import black_scholes_kernel, quadratic_smile_kernel, hyperbolic_smile_kernel, binomial_kernel, vol_surface_kernel
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 
+# Keys of the dictionaries returned by the Greeks functions of all models
+GREEKS = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')
+
+# Pricing models by name, as used by PricingModel. A model class declares its model_name, its
+# required_params and its optional_params (with their defaults), a from_params constructor taking the
+# parameters (with the defaults filled in), and a kernels method returning a dictionary of its bound pricing
+# functions (with the keys in MODEL_KERNELS; the density and Greeks functions may be None).
+# Decorating such a class with register_model makes it available to PricingModel.
+# A model class may also define jit_kernels, returning a dictionary with a 'pricing_function' that calls
+# a compiled scalar kernel (see jit_kernels.py), or None where its configuration has no such kernel;
+# PricingModel uses it with the "jit" backend.
+MODEL_REGISTRY = {}
+MODEL_KERNELS = ('pricing_function', 'batch_pricing_function', 'density_function', 'greeks_function')
+PRICING_BACKENDS = ("python", "jit")
+
+def register_model(model_class):
+    for attribute in ('model_name', 'required_params', 'optional_params', 'from_params', 'kernels'):
+        assert hasattr(model_class, attribute), f"Model class must define {attribute}"
+    MODEL_REGISTRY[model_class.model_name] = model_class
+    return model_class
+
+
+@register_model
 class BlackScholes:
+    model_name = "Black-Scholes"
+    required_params = ('volatility',)
+    optional_params = {}
+
     def __init__(self, volatility) -> None:
         assert volatility > 0, "Volatility must be positive"
         self.volatility = volatility
 
+    @classmethod
+    def from_params(cls, params: dict):
+        return cls(volatility=params['volatility'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.bs_pricing_function,
+            'batch_pricing_function': self.bs_batch_pricing_function,
+            'density_function': self.bs_density_function,
+            'greeks_function': self.bs_greeks_function,
+        }
+
+    def jit_kernels(self) -> dict:
+        return {'pricing_function': self.bs_jit_pricing_function}
+
     def bs_pricing_function(self, conditions: MarketConditions, option: OptionClass) -> float:
         return black_scholes_formula(
             spot=conditions.spot, 
@@ -21,9 +70,50 @@ class BlackScholes:
             option_type=option.option_type
         )
 
+    def bs_jit_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return black_scholes_kernel(
+            conditions.spot, option.strike, option.time_to_expiry, conditions.interest_rate, option.is_call,
+            self.volatility)
+
+    def bs_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        return black_scholes_formula_vectorized(
+            spot=conditions.spot, 
+            strike=strikes,
+            volatility=self.volatility,
+            time_to_expiry=times_to_expiry, 
+            interest_rate=conditions.interest_rate,
+            is_call=is_call
+        )
+
+    def bs_density_function(self, conditions: MarketConditions, strikes, time_to_expiry: float) -> np.ndarray:
+        return smile_density(
+            spot=conditions.spot, 
+            strike=np.asarray(strikes, dtype=float), 
+            volatility=self.volatility, 
+            dvol_dstrike=0.0, 
+            d2vol_dstrike2=0.0, 
+            time_to_expiry=time_to_expiry, 
+            interest_rate=conditions.interest_rate)
+
+    def bs_greeks_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> dict:
+        greeks = black_scholes_greeks(
+            spot=conditions.spot, 
+            strike=strikes,
+            volatility=self.volatility,
+            time_to_expiry=times_to_expiry, 
+            interest_rate=conditions.interest_rate,
+            is_call=is_call
+        )
+        return {greek: greeks[greek] for greek in GREEKS}
+
 ##################################
 
+@register_model
 class VolSmileQuadratic:
+    model_name = "Quadratic volatility smile"
+    required_params = ('atm_vol', 'skew', 'curvature')
+    optional_params = {}
+
     def __init__(self, c0: float, c1: float, c2: float) -> None:
         assert c0 > 0, "Volatility must be positive"
         assert c1*c1 - 4*c0*c2 <= 0, "Invalid parameters"
@@ -31,13 +121,33 @@ class VolSmileQuadratic:
         self.c1 = c1
         self.c2 = c2
 
+    @classmethod
+    def from_params(cls, params: dict):
+        return cls(c0=params['atm_vol'], c1=params['skew'], c2=params['curvature'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.quadratic_pricing_function,
+            'batch_pricing_function': self.quadratic_batch_pricing_function,
+            'density_function': self.quadratic_density_function,
+            'greeks_function': self.quadratic_greeks_function,
+        }
+
+    def jit_kernels(self) -> dict:
+        return {'pricing_function': self.quadratic_jit_pricing_function}
+
+    # Accepts scalars or arrays
     def quadratic_vol_smile_function(self, x):
         return self.c0 + self.c1*x + self.c2*x*x
 
+    # First and second derivatives of the smile with respect to x
+    def quadratic_vol_smile_derivatives(self, x):
+        return self.c1 + 2*self.c2*x, 2*self.c2 + 0*x
+
     def plot_smile(self, min_d1=-4, max_d1=4, num_samples=100):
         step_size = (max_d1 - min_d1 )/num_samples
         d1s = [min_d1 + i*step_size for i in range(num_samples)]
-        vols = [self.quadratic_vol_smile_function(d1) for d1 in d1s]
+        vols = self.quadratic_vol_smile_function(np.array(d1s))
 
         plt.plot(d1s, vols, color="black")
         plt.ylim([0,max(1,max(vols)*1.2)])
@@ -65,9 +175,55 @@ class VolSmileQuadratic:
             option_type=option.option_type
         )
 
+    def quadratic_jit_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return quadratic_smile_kernel(
+            conditions.spot, option.strike, option.time_to_expiry, conditions.interest_rate, option.is_call,
+            self.c0, self.c1, self.c2)
+
+    def quadratic_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        spot, interest_rate = conditions.spot, conditions.interest_rate
+        d1 = (np.log(spot/strikes) + interest_rate*times_to_expiry)/(self.c0*np.sqrt(times_to_expiry))
+        return black_scholes_formula_vectorized(
+            spot=spot, 
+            strike=strikes,
+            time_to_expiry=times_to_expiry,
+            volatility=self.quadratic_vol_smile_function(x=d1), 
+            interest_rate=interest_rate,
+            is_call=is_call
+        )
+
+    def quadratic_density_function(self, conditions: MarketConditions, strikes, time_to_expiry: float) -> np.ndarray:
+        strikes = np.asarray(strikes, dtype=float)
+        x, dx_dstrike, d2x_dstrike2 = smile_variable(
+            conditions=conditions, strikes=strikes, time_to_expiry=time_to_expiry, atm_vol=self.c0)
+        first, second = self.quadratic_vol_smile_derivatives(x)
+        return smile_density(
+            spot=conditions.spot, 
+            strike=strikes, 
+            volatility=self.quadratic_vol_smile_function(x), 
+            dvol_dstrike=first*dx_dstrike, 
+            d2vol_dstrike2=second*dx_dstrike*dx_dstrike + first*d2x_dstrike2, 
+            time_to_expiry=time_to_expiry, 
+            interest_rate=conditions.interest_rate)
+
+    def quadratic_greeks_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> dict:
+        return smile_greeks(
+            conditions=conditions, 
+            strikes=strikes, 
+            times_to_expiry=times_to_expiry, 
+            is_call=is_call, 
+            atm_vol=self.c0, 
+            vol_smile_function=self.quadratic_vol_smile_function, 
+            vol_smile_derivatives=self.quadratic_vol_smile_derivatives)
+
 ##################################
 
+@register_model
 class VolSmileHyperbolic:
+    model_name = "Hyperbolic volatility smile"
+    required_params = ('atm_vol', 'skew', 'right_asymp', 'left_asymp')
+    optional_params = {}
+
     def __init__(self, c0: float, c1: float, c2_plus: float, c2_minus) -> None:
         assert min(c0,c1,c2_minus, c2_plus) > 0, "All parameters must be positive"
         assert max(c1*c1*c1*c1 - 4*c0*c0*c2_plus*c2_plus, c1*c1*c1*c1 - 4*c0*c0*c2_minus*c2_minus) < 0, "Invalid parameters"
@@ -76,16 +232,61 @@ class VolSmileHyperbolic:
         self.c2_plus = c2_plus
         self.c2_minus = c2_minus
 
+    @classmethod
+    def from_params(cls, params: dict):
+        return cls(
+            c0=params['atm_vol'], 
+            c1=sqrt(params['skew']*2*params['atm_vol']), 
+            c2_plus=params['right_asymp'], 
+            c2_minus=params['left_asymp'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.hyperbolic_pricing_function,
+            'batch_pricing_function': self.hyperbolic_batch_pricing_function,
+            'density_function': self.hyperbolic_density_function,
+            'greeks_function': self.hyperbolic_greeks_function,
+        }
+
+    def jit_kernels(self) -> dict:
+        return {'pricing_function': self.hyperbolic_jit_pricing_function}
+
+    # Accepts scalars or arrays
     def hyperbolic_vol_smile_function(self, x, glue_end_point=3):
-        f_plus = sqrt(self.c0*self.c0 + self.c1*self.c1*x + self.c2_plus*self.c2_plus*x*x)
-        f_minus = sqrt(self.c0*self.c0 + self.c1*self.c1*x + self.c2_minus*self.c2_minus*x*x)
+        f_plus = np.sqrt(self.c0*self.c0 + self.c1*self.c1*x + self.c2_plus*self.c2_plus*x*x)
+        f_minus = np.sqrt(self.c0*self.c0 + self.c1*self.c1*x + self.c2_minus*self.c2_minus*x*x)
         interpolation = gluing_function((x+glue_end_point)/(2*glue_end_point))
         return interpolation*f_plus + (1-interpolation)*f_minus
 
+    # First and second derivatives of the smile with respect to x, vectorized
+    def hyperbolic_vol_smile_derivatives(self, x, glue_end_point=3):
+        x = np.asarray(x, dtype=float)
+        first_derivatives, second_derivatives, values = [], [], []
+        for c2 in (self.c2_plus, self.c2_minus):
+            value = np.sqrt(self.c0*self.c0 + self.c1*self.c1*x + c2*c2*x*x)
+            first = (self.c1*self.c1 + 2*c2*c2*x)/(2*value)
+            values.append(value)
+            first_derivatives.append(first)
+            second_derivatives.append((c2*c2 - first*first)/value)
+        glue_first, glue_second = gluing_function_derivatives((x+glue_end_point)/(2*glue_end_point))
+        glue = gluing_function((x+glue_end_point)/(2*glue_end_point))
+        interpolation_first = glue_first/(2*glue_end_point)
+        interpolation_second = glue_second/(4*glue_end_point*glue_end_point)
+        first = (
+            interpolation_first*(values[0] - values[1]) 
+            + glue*first_derivatives[0] + (1-glue)*first_derivatives[1]
+        )
+        second = (
+            interpolation_second*(values[0] - values[1]) 
+            + 2*interpolation_first*(first_derivatives[0] - first_derivatives[1])
+            + glue*second_derivatives[0] + (1-glue)*second_derivatives[1]
+        )
+        return first, second
+
     def plot_smile(self, min_d1=-4, max_d1=4, num_samples=100):
         step_size = (max_d1 - min_d1 )/num_samples
         d1s = [min_d1 + i*step_size for i in range(num_samples)]
-        vols = [self.hyperbolic_vol_smile_function(d1) for d1 in d1s]
+        vols = self.hyperbolic_vol_smile_function(np.array(d1s))
 
         plt.plot(d1s, vols, color="black")
         plt.ylim([0,max(1,max(vols)*1.2)])
@@ -113,38 +314,991 @@ class VolSmileHyperbolic:
             option_type=option.option_type
         )
 
+    def hyperbolic_jit_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return hyperbolic_smile_kernel(
+            conditions.spot, option.strike, option.time_to_expiry, conditions.interest_rate, option.is_call,
+            self.c0, self.c1, self.c2_plus, self.c2_minus, 3.0)
+
+    def hyperbolic_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        spot, interest_rate = conditions.spot, conditions.interest_rate
+        d1 = (np.log(spot/strikes) + interest_rate*times_to_expiry)/(self.c0*np.sqrt(times_to_expiry))
+        vols = self.hyperbolic_vol_smile_function(x=d1)
+        return black_scholes_formula_vectorized(
+            spot=spot, 
+            strike=strikes,
+            time_to_expiry=times_to_expiry,
+            volatility=vols, 
+            interest_rate=interest_rate,
+            is_call=is_call
+        )
+
+    def hyperbolic_density_function(self, conditions: MarketConditions, strikes, time_to_expiry: float) -> np.ndarray:
+        strikes = np.asarray(strikes, dtype=float)
+        x, dx_dstrike, d2x_dstrike2 = smile_variable(
+            conditions=conditions, strikes=strikes, time_to_expiry=time_to_expiry, atm_vol=self.c0)
+        first, second = self.hyperbolic_vol_smile_derivatives(x)
+        return smile_density(
+            spot=conditions.spot, 
+            strike=strikes, 
+            volatility=self.hyperbolic_vol_smile_function(x), 
+            dvol_dstrike=first*dx_dstrike, 
+            d2vol_dstrike2=second*dx_dstrike*dx_dstrike + first*d2x_dstrike2, 
+            time_to_expiry=time_to_expiry, 
+            interest_rate=conditions.interest_rate)
+
+    def hyperbolic_greeks_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> dict:
+        return smile_greeks(
+            conditions=conditions, 
+            strikes=strikes, 
+            times_to_expiry=times_to_expiry, 
+            is_call=is_call, 
+            atm_vol=self.c0, 
+            vol_smile_function=self.hyperbolic_vol_smile_function, 
+            vol_smile_derivatives=self.hyperbolic_vol_smile_derivatives)
+
+#####################
+
+# The variable x = (log(S/K) + rT)/(atm_vol*sqrt(T)) of the volatility smiles, with its first two strike derivatives
+def smile_variable(conditions: MarketConditions, strikes, time_to_expiry, atm_vol: float):
+    spot, interest_rate = conditions.spot, conditions.interest_rate
+    scale = atm_vol*np.sqrt(time_to_expiry)
+    x = (np.log(spot/strikes) + interest_rate*time_to_expiry)/scale
+    dx_dstrike = -1/(strikes*scale)
+    d2x_dstrike2 = 1/(strikes*strikes*scale)
+    return x, dx_dstrike, d2x_dstrike2
+
+# Greeks of a smile model: the Black-Scholes Greeks at vol(x), plus the chain-rule terms coming from
+# the dependence of x on spot, expiry and rate. Vega is the sensitivity to a parallel shift of the smile.
+def smile_greeks(
+        conditions: MarketConditions, 
+        strikes, 
+        times_to_expiry, 
+        is_call, 
+        atm_vol: float, 
+        vol_smile_function, 
+        vol_smile_derivatives
+    ) -> dict:
+    spot, interest_rate = conditions.spot, conditions.interest_rate
+    scale = atm_vol*np.sqrt(times_to_expiry)
+    x = (np.log(spot/strikes) + interest_rate*times_to_expiry)/scale
+    first, second = vol_smile_derivatives(x)
+    greeks = black_scholes_greeks(
+        spot=spot, 
+        strike=strikes, 
+        volatility=vol_smile_function(x), 
+        time_to_expiry=times_to_expiry, 
+        interest_rate=interest_rate, 
+        is_call=is_call)
+    dx_dspot = 1/(spot*scale)
+    dvol_dspot = first*dx_dspot
+    d2vol_dspot2 = second*dx_dspot*dx_dspot - first*dx_dspot/spot
+    dvol_dexpiry = first*(interest_rate/scale - x/(2*times_to_expiry))
+    dvol_drate = first*times_to_expiry/scale
+    vega = greeks['vega']
+    return {
+        'price': greeks['price'],
+        'delta': greeks['delta'] + vega*dvol_dspot,
+        'gamma': greeks['gamma'] + 2*greeks['vanna']*dvol_dspot + greeks['volga']*dvol_dspot*dvol_dspot + vega*d2vol_dspot2,
+        'vega': vega,
+        'theta': greeks['theta'] - vega*dvol_dexpiry,
+        'rho': greeks['rho'] + vega*dvol_drate,
+    }
+
 #####################
 
+@register_model
 class Binomial:
-    def __init__(self, up_tick: float, down_tick: float, num_intervals: int) -> None:
+    model_name = "Binomial"
+    required_params = ('up_tick', 'down_tick', 'num_intervals')
+    optional_params = {'american': False, 'acceleration': None, 'richardson': False}
+
+    # Convergence acceleration: with "leisen_reimer", every strike is priced on its own tree, whose ticks
+    # and probabilities come from the Peizer-Pratt inversion of d1 and d2 (with an odd number of intervals,
+    # rounding num_intervals up if needed); with "bbs", the last interval is replaced by the Black-Scholes
+    # formula. Both use the volatility encoded by the ticks. With richardson=True, the prices with N and
+    # N/2 intervals are extrapolated to N = infinity, assuming an error of order 1/N^2 for Leisen-Reimer
+    # trees and 1/N for BBS. Plain trees are not extrapolated: their error oscillates with N (with the
+    # position of the strike among the terminal nodes), and extrapolating it makes the prices worse.
+    def __init__(
+            self, 
+            up_tick: float, 
+            down_tick: float, 
+            num_intervals: int, 
+            american=False, 
+            acceleration=None, 
+            richardson=False
+        ) -> None:
         assert min(up_tick, down_tick, num_intervals) > 0, "All parameters must be positive"
         assert 0 < down_tick < up_tick, "Invalid parameters"
+        assert acceleration in BINOMIAL_ACCELERATIONS, "Invalid acceleration"
+        assert not richardson or num_intervals >= 4, "Richardson extrapolation needs at least 4 intervals"
+        assert not richardson or acceleration is not None, "Richardson extrapolation needs an acceleration"
         self.up_tick = up_tick
         self.down_tick = down_tick
         self.num_intervals = num_intervals
+        self.american = american
+        self.acceleration = acceleration
+        self.richardson = richardson
+
+    @classmethod
+    def from_params(cls, params: dict):
+        return cls(
+            up_tick=params['up_tick'], 
+            down_tick=params['down_tick'], 
+            num_intervals=params['num_intervals'],
+            american=params['american'],
+            acceleration=params['acceleration'],
+            richardson=params['richardson'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.binomial_pricing_function,
+            'batch_pricing_function': self.binomial_batch_pricing_function,
+            # The binomial distribution is discrete, so its density is only available via finite differences
+            'density_function': None,
+            'greeks_function': self.binomial_greeks_function,
+        }
+
+    # Only the plain lattice has a compiled kernel
+    def jit_kernels(self) -> dict:
+        return {'pricing_function': self.binomial_jit_pricing_function if self.acceleration is None else None}
 
     def binomial_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
-        strike, time_to_expiry = option.strike, option.time_to_expiry
+        return float(self.binomial_batch_pricing_function(
+            conditions=conditions,
+            strikes=np.array([option.strike]),
+            times_to_expiry=np.array([option.time_to_expiry]),
+            is_call=np.array([option.is_call])
+        )[0])
+
+    def binomial_jit_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return binomial_kernel(
+            conditions.spot, option.strike, option.time_to_expiry, conditions.interest_rate, option.is_call,
+            self.up_tick, self.down_tick, int(self.num_intervals), bool(self.american))
+
+    def binomial_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        strikes, times_to_expiry, is_call = np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), np.asarray(times_to_expiry, dtype=float), is_call)
+        fine_intervals = self.leisen_reimer_intervals(self.num_intervals)
+        prices = self._lattice_prices(conditions, strikes, times_to_expiry, is_call, fine_intervals)
+        if not self.richardson:
+            return prices
+        coarse_intervals = self.leisen_reimer_intervals(fine_intervals//2)
+        coarse_prices = self._lattice_prices(conditions, strikes, times_to_expiry, is_call, coarse_intervals)
+        order = 2 if self.acceleration == "leisen_reimer" else 1
+        fine_weight, coarse_weight = fine_intervals**order, coarse_intervals**order
+        return (fine_weight*prices - coarse_weight*coarse_prices)/(fine_weight - coarse_weight)
+
+    # Differences between the (European) prices and the Black-Scholes prices at the volatility of the ticks
+    def binomial_pricing_errors(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        assert not self.american, "Errors are only available for European options"
+        return self.binomial_batch_pricing_function(
+            conditions=conditions, strikes=strikes, times_to_expiry=times_to_expiry, is_call=is_call
+        ) - black_scholes_formula_vectorized(
+            spot=conditions.spot, 
+            strike=strikes, 
+            volatility=self.tree_volatility(times_to_expiry), 
+            time_to_expiry=times_to_expiry, 
+            interest_rate=conditions.interest_rate, 
+            is_call=is_call)
+
+    # Volatility of the log-spot encoded by the ticks, for the given expiries
+    def tree_volatility(self, times_to_expiry):
+        return (log(self.up_tick) - log(self.down_tick))/(2*np.sqrt(np.asarray(times_to_expiry, dtype=float)/self.num_intervals))
+
+    def leisen_reimer_intervals(self, num_intervals: int) -> int:
+        if self.acceleration == "leisen_reimer" and num_intervals % 2 == 0:
+            return num_intervals + 1
+        return num_intervals
+
+    # Prices on trees with the given number of intervals, with ticks rescaled so that they encode the same
+    # volatility. Without acceleration, every strike of a given expiry is priced against a single terminal distribution.
+    def _lattice_prices(self, conditions: MarketConditions, strikes, times_to_expiry, is_call, num_intervals: int) -> np.ndarray:
+        spot, interest_rate = conditions.spot, conditions.interest_rate
+        tick_scale = sqrt(self.num_intervals/num_intervals)
+        up_tick, down_tick = exp(log(self.up_tick)*tick_scale), exp(log(self.down_tick)*tick_scale)
+        prices = np.empty(strikes.shape)
+        for time_to_expiry in np.unique(times_to_expiry):
+            same_expiry = times_to_expiry == time_to_expiry
+            if self.acceleration == "leisen_reimer":
+                prices[same_expiry] = leisen_reimer_prices(
+                    spot=spot, 
+                    strikes=strikes[same_expiry], 
+                    is_call=is_call[same_expiry], 
+                    volatility=float(self.tree_volatility(time_to_expiry)), 
+                    num_intervals=num_intervals, 
+                    time_to_expiry=float(time_to_expiry), 
+                    interest_rate=interest_rate, 
+                    american=self.american)
+                continue
+            if self.american:
+                # Early exercise needs backward induction through the (cached) tree
+                tree = get_binomial_tree(
+                    spot=spot, 
+                    up_tick=up_tick, 
+                    down_tick=down_tick, 
+                    num_intervals=num_intervals, 
+                    time_to_expiry=float(time_to_expiry), 
+                    interest_rate=interest_rate)
+                prices[same_expiry] = tree.price(
+                    strikes=strikes[same_expiry], is_call=is_call[same_expiry], american=True, smoothed=self.acceleration == "bbs")
+                continue
+            if self.acceleration == "bbs":
+                prices[same_expiry] = smoothed_binomial_prices(
+                    spot=spot, 
+                    strikes=strikes[same_expiry], 
+                    is_call=is_call[same_expiry], 
+                    up_tick=up_tick, 
+                    down_tick=down_tick, 
+                    num_intervals=num_intervals, 
+                    time_to_expiry=float(time_to_expiry), 
+                    interest_rate=interest_rate)
+                continue
+            growth, weight_head, weight_tail, weighted_growth_head, weighted_growth_tail = binomial_terminal_distribution(
+                up_tick=up_tick, 
+                down_tick=down_tick, 
+                num_intervals=num_intervals, 
+                time_to_expiry=float(time_to_expiry), 
+                interest_rate=interest_rate)
+            expiry_strikes = strikes[same_expiry]
+            # Terminal spots are increasing, so calls are in the money exactly at the nodes from `first_itm` onwards
+            # and puts exactly at the nodes before it
+            first_itm = np.searchsorted(spot*growth, expiry_strikes, side="right")
+            call_prices = spot*weighted_growth_tail[first_itm] - expiry_strikes*weight_tail[first_itm]
+            put_prices = expiry_strikes*weight_head[first_itm] - spot*weighted_growth_head[first_itm]
+            discount_factor = exp(-interest_rate*float(time_to_expiry))
+            prices[same_expiry] = discount_factor*np.where(is_call[same_expiry], call_prices, put_prices)
+        return prices
+
+
+    # Price, delta, gamma and theta from the (plain, unaccelerated) lattice itself. The ticks encode a volatility
+    # log(up_tick/down_tick)/(2*sqrt(dt)) and vega is taken with respect to it; vega and rho are
+    # central differences over re-built trees, each priced for all strikes of an expiry at once.
+    # Accelerated trees are priced differently from their lattice, so their Greeks are central differences
+    # of their own prices instead (see _accelerated_greeks), and their price is the batch price.
+    def binomial_greeks_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call, bump_size=1e-4) -> dict:
+        strikes, times_to_expiry, is_call = np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), np.asarray(times_to_expiry, dtype=float), is_call)
+        if self.acceleration is not None:
+            return self._accelerated_greeks(conditions, strikes, times_to_expiry, is_call, bump_size)
+        spot, interest_rate = conditions.spot, conditions.interest_rate
+        greeks = {greek: np.empty(strikes.shape) for greek in GREEKS}
+        for time_to_expiry in np.unique(times_to_expiry):
+            same_expiry = times_to_expiry == time_to_expiry
+            tree_args = {
+                'spot': spot, 
+                'up_tick': self.up_tick, 
+                'down_tick': self.down_tick, 
+                'num_intervals': self.num_intervals, 
+                'time_to_expiry': float(time_to_expiry), 
+                'interest_rate': interest_rate
+            }
+            bumped_price = lambda **bumps: BinomialTree(**{**tree_args, **bumps}).price(
+                strikes=strikes[same_expiry], is_call=is_call[same_expiry], american=self.american)
+            for greek, values in get_binomial_tree(**tree_args).greeks(
+                    strikes=strikes[same_expiry], is_call=is_call[same_expiry], american=self.american).items():
+                greeks[greek][same_expiry] = values
+
+            tick_bump = exp(bump_size*sqrt(float(time_to_expiry)/self.num_intervals))
+            greeks['vega'][same_expiry] = (
+                bumped_price(up_tick=self.up_tick*tick_bump, down_tick=self.down_tick/tick_bump) 
+                - bumped_price(up_tick=self.up_tick/tick_bump, down_tick=self.down_tick*tick_bump)
+            )/(2*bump_size)
+            greeks['rho'][same_expiry] = (
+                bumped_price(interest_rate=interest_rate + bump_size) 
+                - bumped_price(interest_rate=interest_rate - bump_size)
+            )/(2*bump_size)
+        return greeks
+
+    # Central differences of the batch prices, bumping the spot by the fraction BINOMIAL_SPOT_BUMP of its value,
+    # the expiries by the fraction bump_size of theirs, and the rate and the volatility of the ticks by bump_size. Expiries are bumped with the
+    # log ticks scaled by the square root of the bump, so that the volatility of the ticks is unchanged.
+    def _accelerated_greeks(self, conditions: MarketConditions, strikes, times_to_expiry, is_call, bump_size) -> dict:
         spot, interest_rate = conditions.spot, conditions.interest_rate
-        time_interval = time_to_expiry/self.num_intervals
 
-        up_tick = self.up_tick
-        down_tick = self.down_tick
-        interest = exp(interest_rate*time_interval)
+        # Prices of the selected options (all of them by default) under the bumped inputs
+        def bumped_price(spot=spot, interest_rate=interest_rate, expiry_scale=1.0, up_tick=self.up_tick, down_tick=self.down_tick, selection=slice(None)):
+            tick_scale = sqrt(expiry_scale)
+            model = Binomial(
+                up_tick=exp(log(up_tick)*tick_scale), 
+                down_tick=exp(log(down_tick)*tick_scale), 
+                num_intervals=self.num_intervals, 
+                american=self.american, 
+                acceleration=self.acceleration, 
+                richardson=self.richardson)
+            return model.binomial_batch_pricing_function(
+                conditions=MarketConditions(spot=spot, interest_rate=interest_rate), 
+                strikes=strikes[selection], 
+                times_to_expiry=times_to_expiry[selection]*expiry_scale, 
+                is_call=is_call[selection])
 
-        assert down_tick < interest and interest < up_tick, "There is no probability eliminating arbitrage"
-        martingale_prob = (interest - down_tick)/(up_tick - down_tick)
+        spot_bump = spot*BINOMIAL_SPOT_BUMP
+        prices = bumped_price()
+        up_prices, down_prices = bumped_price(spot=spot + spot_bump), bumped_price(spot=spot - spot_bump)
+        greeks = {
+            'price': prices,
+            'delta': (up_prices - down_prices)/(2*spot_bump),
+            'gamma': (up_prices - 2*prices + down_prices)/(spot_bump*spot_bump),
+            'vega': np.empty(strikes.shape),
+            'theta': (bumped_price(expiry_scale=1 - bump_size) - bumped_price(expiry_scale=1 + bump_size))/(2*bump_size*times_to_expiry),
+            'rho': (bumped_price(interest_rate=interest_rate + bump_size) - bumped_price(interest_rate=interest_rate - bump_size))/(2*bump_size),
+        }
+        # The tick bump for a given volatility bump depends on the expiry
+        for time_to_expiry in np.unique(times_to_expiry):
+            same_expiry = times_to_expiry == time_to_expiry
+            tick_bump = exp(bump_size*sqrt(float(time_to_expiry)/self.num_intervals))
+            greeks['vega'][same_expiry] = (
+                bumped_price(up_tick=self.up_tick*tick_bump, down_tick=self.down_tick/tick_bump, selection=same_expiry) 
+                - bumped_price(up_tick=self.up_tick/tick_bump, down_tick=self.down_tick*tick_bump, selection=same_expiry)
+            )/(2*bump_size)
+        return greeks
 
-        running_sum = 0
-        for i in range(self.num_intervals+1):
-            Sfinal = spot*(up_tick**i)*(down_tick**(self.num_intervals-i))
-            probability = (martingale_prob**i)*((1-martingale_prob)**(self.num_intervals-i))
-            if option.option_type == "call":
-                running_sum += choose(i,self.num_intervals)*relu(Sfinal - strike)*probability
-            else:
-                running_sum += choose(i,self.num_intervals)*relu(strike - Sfinal)*probability
-        discount_factor = exp(-interest_rate*time_to_expiry)
-        return discount_factor*running_sum
+#####################
+
+BINOMIAL_ACCELERATIONS = (None, "leisen_reimer", "bbs")
+# Number of strikes priced together by the accelerated binomial pricers, bounding the (strikes x nodes) matrices
+BINOMIAL_STRIKE_BLOCK = 256
+# Relative spot bump of the Greeks of accelerated trees. Their prices are only piecewise smooth in the spot
+# for American options (the exercise nodes change with it), so smaller bumps give erratic gammas.
+BINOMIAL_SPOT_BUMP = 1e-2
+
+# Peizer-Pratt (method 2) inversion, the probability that a binomial tree with n (odd) intervals uses
+# to match a normal quantile z
+def peizer_pratt_inversion(z, num_intervals: int):
+    n = num_intervals
+    return 0.5 + np.sign(z)*0.5*np.sqrt(-np.expm1(-(z/(n + 1/3 + 0.1/(n + 1)))**2*(n + 1/6)))
+
+# Leisen-Reimer prices: each strike gets its own tree, centered on it, whose terminal distribution
+# converges to the lognormal one at the rate 1/N^2. European options are priced directly from the
+# terminal distributions (in blocks of strikes), American ones by backward induction.
+def leisen_reimer_prices(spot, strikes, is_call, volatility, num_intervals, time_to_expiry, interest_rate, american=False) -> np.ndarray:
+    assert num_intervals % 2 == 1, "Leisen-Reimer trees need an odd number of intervals"
+    vol_sqrt_time = volatility*sqrt(time_to_expiry)
+    dplus = (np.log(spot/strikes) + interest_rate*time_to_expiry)/vol_sqrt_time + 0.5*vol_sqrt_time
+    dminus = dplus - vol_sqrt_time
+    up_prob = peizer_pratt_inversion(dminus, num_intervals)
+    interest = exp(interest_rate*time_to_expiry/num_intervals)
+    up_ticks = interest*peizer_pratt_inversion(dplus, num_intervals)/up_prob
+    down_ticks = (interest - up_prob*up_ticks)/(1 - up_prob)
+    if american:
+        return np.array([
+            BinomialTree(
+                spot=spot, 
+                up_tick=up_tick, 
+                down_tick=down_tick, 
+                num_intervals=num_intervals, 
+                time_to_expiry=time_to_expiry, 
+                interest_rate=interest_rate
+            ).price(strikes=strike, is_call=call, american=True)
+            for strike, call, up_tick, down_tick in zip(strikes, is_call, up_ticks, down_ticks)
+        ]).reshape(strikes.shape)
+
+    num_ups = np.arange(num_intervals+1)
+    log_choose = gammaln(num_intervals+1) - gammaln(num_ups+1) - gammaln(num_intervals-num_ups+1)
+    sign = np.where(is_call, 1.0, -1.0)
+    prices = np.empty(strikes.shape)
+    for start in range(0, strikes.size, BINOMIAL_STRIKE_BLOCK):
+        block = slice(start, start + BINOMIAL_STRIKE_BLOCK)
+        p, u, d = up_prob[block, None], up_ticks[block, None], down_ticks[block, None]
+        weights = np.exp(log_choose + num_ups*np.log(p) + (num_intervals-num_ups)*np.log1p(-p))
+        terminal_spots = spot*np.exp(num_ups*np.log(u) + (num_intervals-num_ups)*np.log(d))
+        payoffs = np.maximum(sign[block, None]*(terminal_spots - strikes[block, None]), 0.0)
+        prices[block] = (weights*payoffs).sum(axis=1)
+    return exp(-interest_rate*time_to_expiry)*prices
+
+# Binomial Black-Scholes (BBS) prices of European options: the tree with num_intervals - 1 intervals,
+# whose nodes are valued with the Black-Scholes formula over the last interval (in blocks of strikes)
+def smoothed_binomial_prices(spot, strikes, is_call, up_tick, down_tick, num_intervals, time_to_expiry, interest_rate) -> np.ndarray:
+    time_interval = time_to_expiry/num_intervals
+    volatility = (log(up_tick) - log(down_tick))/(2*sqrt(time_interval))
+    if num_intervals == 1:
+        return black_scholes_formula_vectorized(
+            spot=spot, strike=strikes, volatility=volatility, time_to_expiry=time_to_expiry, interest_rate=interest_rate, is_call=is_call)
+    growth, weight_head = binomial_terminal_distribution(
+        up_tick=up_tick, 
+        down_tick=down_tick, 
+        num_intervals=num_intervals-1, 
+        time_to_expiry=time_to_expiry - time_interval, 
+        interest_rate=interest_rate)[:2]
+    weights = np.diff(weight_head)
+    prices = np.empty(strikes.shape)
+    for start in range(0, strikes.size, BINOMIAL_STRIKE_BLOCK):
+        block = slice(start, start + BINOMIAL_STRIKE_BLOCK)
+        node_values = black_scholes_formula_vectorized(
+            spot=spot*growth, 
+            strike=strikes[block, None], 
+            volatility=volatility, 
+            time_to_expiry=time_interval, 
+            interest_rate=interest_rate, 
+            is_call=is_call[block, None])
+        prices[block] = node_values @ weights
+    return exp(-interest_rate*(time_to_expiry - time_interval))*prices
+
+#####################
+
+# Terminal distribution of the binomial tree, with the binomial weights computed in log space
+# Returns the terminal growth factors S_i/S_0 (increasing in i), together with the head sums
+# (over nodes < i) and tail sums (over nodes >= i) of the weights and of the weighted growth factors
+@lru_cache(maxsize=128)
+def binomial_terminal_distribution(
+        up_tick: float, 
+        down_tick: float, 
+        num_intervals: int, 
+        time_to_expiry: float, 
+        interest_rate: float
+    ):
+    time_interval = time_to_expiry/num_intervals
+    interest = exp(interest_rate*time_interval)
+    assert down_tick < interest and interest < up_tick, "There is no probability eliminating arbitrage"
+    martingale_prob = (interest - down_tick)/(up_tick - down_tick)
+
+    num_ups = np.arange(num_intervals+1)
+    log_weights = (
+        gammaln(num_intervals+1) - gammaln(num_ups+1) - gammaln(num_intervals-num_ups+1)
+        + num_ups*log(martingale_prob) + (num_intervals-num_ups)*log1p(-martingale_prob)
+    )
+    weights = np.exp(log_weights)
+    growth = np.exp(num_ups*log(up_tick) + (num_intervals-num_ups)*log(down_tick))
+    weighted_growth = weights*growth
+    weight_head = np.concatenate(([0.0], np.cumsum(weights)))
+    weight_tail = np.append(np.cumsum(weights[::-1])[::-1], 0.0)
+    weighted_growth_head = np.concatenate(([0.0], np.cumsum(weighted_growth)))
+    weighted_growth_tail = np.append(np.cumsum(weighted_growth[::-1])[::-1], 0.0)
+    distribution = (growth, weight_head, weight_tail, weighted_growth_head, weighted_growth_tail)
+    for array in distribution:
+        array.setflags(write=False)
+    return distribution
+
+#####################
+
+# Monte Carlo pricing of European options, under geometric Brownian motion with the given volatility or,
+# if a smile model is given, under the local volatility implied by it: the volatility at level S and time t
+# is the Dupire local volatility sigma_loc(t, S) of the smile (see dupire_local_variance, as used by
+# LocalVolatilityPDE), with Euler steps in log-spot, so that the prices reproduce the smile where it is
+# arbitrage-free. Paths are generated in chunks of chunk_size, each chunk with its own child of the seed, so
+# results do not depend on how the chunks are spread over num_workers processes.
+# With antithetic=True, each normal draw is also used with the opposite sign. Under local volatility,
+# the Black-Scholes price at the at-the-money vol is used as a control variate, with a GBM path driven
+# by the same draws (under pure GBM this control would be the estimator itself).
+# As a PricingModel, smile parameters (with 'volatility' as the at-the-money vol) switch on local volatility.
+@register_model
+class MonteCarlo:
+    model_name = "Monte Carlo"
+    required_params = ('volatility', 'num_paths')
+    optional_params = {
+        'num_steps': None, 'seed': 0, 'num_workers': 1, 
+        'skew': None, 'curvature': None, 'left_asymp': None, 'right_asymp': None
+    }
+
+    def __init__(
+            self, 
+            volatility: float, 
+            num_paths: int, 
+            num_steps=1, 
+            seed=0, 
+            smile=None, 
+            antithetic=True, 
+            control_variate=True, 
+            chunk_size=2**14, 
+            num_workers=1
+        ) -> None:
+        assert volatility > 0, "Volatility must be positive"
+        assert min(num_paths, num_steps, chunk_size, num_workers) > 0, "All parameters must be positive"
+        # Antithetic draws come in pairs
+        assert not antithetic or (num_paths % 2 == 0 and chunk_size % 2 == 0), "With antithetic draws, the number of paths and the chunk size must be even"
+        self.volatility = volatility
+        self.num_paths = int(num_paths)
+        self.num_steps = int(num_steps)
+        self.seed = int(seed)
+        self.smile = smile
+        self.antithetic = antithetic
+        self.control_variate = control_variate and smile is not None
+        self.chunk_size = int(chunk_size)
+        self.num_workers = int(num_workers)
+
+    @classmethod
+    def from_params(cls, params: dict):
+        smile = None
+        if params['skew'] is not None:
+            assert params['curvature'] is not None or (params['left_asymp'] is not None and params['right_asymp'] is not None), \
+                "A smile needs 'curvature', or both 'left_asymp' and 'right_asymp', besides 'skew'"
+            smile = smile_from_params({**params, 'atm_vol': params['volatility']})
+        num_steps = params['num_steps']
+        if num_steps is None:
+            num_steps = 1 if smile is None else 50
+        return cls(
+            volatility=params['volatility'], 
+            num_paths=params['num_paths'], 
+            num_steps=num_steps, 
+            seed=params['seed'], 
+            smile=smile, 
+            num_workers=params['num_workers'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.monte_carlo_pricing_function,
+            'batch_pricing_function': self.monte_carlo_batch_pricing_function,
+            'density_function': None,
+            'greeks_function': None,
+        }
+
+    def monte_carlo_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return float(self.monte_carlo_batch_pricing_function(
+            conditions=conditions,
+            strikes=np.array([option.strike]),
+            times_to_expiry=np.array([option.time_to_expiry]),
+            is_call=np.array([option.is_call])
+        )[0])
+
+    def monte_carlo_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        return self.monte_carlo_pricing_with_errors(
+            conditions=conditions, strikes=strikes, times_to_expiry=times_to_expiry, is_call=is_call)[0]
+
+    # Prices and their standard errors. All strikes of an expiry are priced on the same paths, and the chunks
+    # of all the expiries are simulated by a single process pool.
+    def monte_carlo_pricing_with_errors(self, conditions: MarketConditions, strikes, times_to_expiry, is_call):
+        strikes, times_to_expiry, is_call = np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), np.asarray(times_to_expiry, dtype=float), is_call)
+        prices = np.empty(strikes.shape)
+        standard_errors = np.empty(strikes.shape)
+        num_chunks = -(-self.num_paths//self.chunk_size)
+        expiries = np.unique(times_to_expiry)
+        tasks = []
+        for time_to_expiry in expiries:
+            same_expiry = times_to_expiry == time_to_expiry
+            seeds = np.random.SeedSequence([self.seed, num_chunks]).spawn(num_chunks)
+            tasks += [
+                (self, conditions.spot, conditions.interest_rate, float(time_to_expiry), strikes[same_expiry], is_call[same_expiry],
+                 min(self.chunk_size, self.num_paths - i*self.chunk_size), seed)
+                for i, seed in enumerate(seeds)
+            ]
+        if self.num_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                chunk_sums = list(executor.map(monte_carlo_chunk, tasks))
+        else:
+            chunk_sums = [monte_carlo_chunk(task) for task in tasks]
+
+        for i, time_to_expiry in enumerate(expiries):
+            same_expiry = times_to_expiry == time_to_expiry
+            expiry_strikes, expiry_is_call = strikes[same_expiry], is_call[same_expiry]
+            sums = sum(chunk_sums[i*num_chunks:(i + 1)*num_chunks])
+            count, payoff_sum, payoff_square_sum, control_sum, control_square_sum, cross_sum = sums
+            payoff_mean = payoff_sum/count
+            payoff_variance = payoff_square_sum/count - payoff_mean*payoff_mean
+            if self.control_variate:
+                control_mean = control_sum/count
+                control_variance = control_square_sum/count - control_mean*control_mean
+                covariance = cross_sum/count - payoff_mean*control_mean
+                beta = np.where(control_variance > 0, covariance/np.where(control_variance > 0, control_variance, 1.0), 0.0)
+                control_price = black_scholes_formula_vectorized(
+                    spot=conditions.spot, 
+                    strike=expiry_strikes, 
+                    volatility=self.smile.c0, 
+                    time_to_expiry=time_to_expiry, 
+                    interest_rate=conditions.interest_rate, 
+                    is_call=expiry_is_call)
+                payoff_mean = payoff_mean - beta*(control_mean - control_price)
+                payoff_variance = payoff_variance - beta*covariance
+            prices[same_expiry] = payoff_mean
+            standard_errors[same_expiry] = np.sqrt(np.maximum(payoff_variance, 0.0)/count)
+        return prices, standard_errors
+
+
+# Number of strikes whose payoffs are evaluated together, bounding the (paths x strikes) payoff matrices
+MONTE_CARLO_STRIKE_BLOCK = 64
+
+# Simulates one chunk of paths and returns the sums needed for the estimators, one row per statistic:
+# number of samples, and per strike the sums of payoffs, squared payoffs, controls, squared controls and
+# payoff-control products (all discounted; antithetic pairs count as one sample)
+def monte_carlo_chunk(task) -> np.ndarray:
+    model, spot, interest_rate, time_to_expiry, strikes, is_call, num_paths, seed = task
+    generator = np.random.default_rng(seed)
+    num_draws = num_paths//2 if model.antithetic else num_paths
+    time_interval = time_to_expiry/model.num_steps
+
+    draws = [generator.standard_normal(num_draws) for _ in range(model.num_steps)]
+    if model.antithetic:
+        draws = [np.concatenate((draw, -draw)) for draw in draws]
+    log_spots = np.full(draws[0].size, log(spot))
+    control_log_spots = log_spots.copy()
+    control_vol = model.smile.c0 if model.smile is not None else model.volatility
+    for step, draw in enumerate(draws):
+        if model.smile is None:
+            vols = model.volatility
+        else:
+            # Dupire local volatility at the current spot, taken at the middle of the step
+            time = (step + 0.5)*time_interval
+            vols = np.sqrt(dupire_local_variance(model.smile, log_spots - log(spot) - interest_rate*time, time))
+        log_spots += (interest_rate - 0.5*vols*vols)*time_interval + vols*sqrt(time_interval)*draw
+        if model.control_variate:
+            control_log_spots += (interest_rate - 0.5*control_vol*control_vol)*time_interval + control_vol*sqrt(time_interval)*draw
+    terminal_spots = np.exp(log_spots)
+    control_spots = np.exp(control_log_spots)
+    discount_factor = exp(-interest_rate*time_to_expiry)
+
+    sums = np.zeros((6, strikes.size))
+    sums[0] = num_draws
+    sign = np.where(is_call, 1.0, -1.0)
+    for start in range(0, strikes.size, MONTE_CARLO_STRIKE_BLOCK):
+        block = slice(start, start + MONTE_CARLO_STRIKE_BLOCK)
+        payoffs = discount_factor*np.maximum(sign[block]*(terminal_spots[:, None] - strikes[block]), 0.0)
+        if model.antithetic:
+            payoffs = 0.5*(payoffs[:num_draws] + payoffs[num_draws:])
+        sums[1, block] = payoffs.sum(axis=0)
+        sums[2, block] = (payoffs*payoffs).sum(axis=0)
+        if model.control_variate:
+            controls = discount_factor*np.maximum(sign[block]*(control_spots[:, None] - strikes[block]), 0.0)
+            if model.antithetic:
+                controls = 0.5*(controls[:num_draws] + controls[num_draws:])
+            sums[3, block] = controls.sum(axis=0)
+            sums[4, block] = (controls*controls).sum(axis=0)
+            sums[5, block] = (payoffs*controls).sum(axis=0)
+    return sums
+
+
+# Vectorized volatility function of a smile model
+def smile_vol_function(smile):
+    if isinstance(smile, VolSmileQuadratic):
+        return smile.quadratic_vol_smile_function
+    return smile.hyperbolic_vol_smile_function
+
+# Vectorized first and second derivatives of the volatility function of a smile model
+def smile_vol_derivatives(smile):
+    if isinstance(smile, VolSmileQuadratic):
+        return smile.quadratic_vol_smile_derivatives
+    return smile.hyperbolic_vol_smile_derivatives
+
+
+# Smile model from PricingModel-style parameters: a hyperbolic smile if asymptotes are given, otherwise a quadratic one
+def smile_from_params(params: dict):
+    if params.get('left_asymp') is not None or params.get('right_asymp') is not None:
+        return VolSmileHyperbolic.from_params(params)
+    return VolSmileQuadratic.from_params(params)
+
+#####################
+
+# Volatility surface built from one smile per expiry. The smiles are tabulated once, as total variances
+# vol^2*T on a uniform grid of log-forward moneyness k = log(K/F) (on which the smile variable of a slice
+# is -k/(atm_vol*sqrt(T)), independently of spot and rate), and queries are answered by linear
+# interpolation in k and in total variance between expiries. Moneyness outside the grid is clamped to its
+# ends, and expiries before the first (after the last) slice keep the volatility of that slice.
+# The grid spans max_std_devs at-the-money standard deviations of the longest slice.
+# As a PricingModel, the parameters are tuples with one entry per expiry (see vol_surface_params).
+@register_model
+class VolSurface:
+    model_name = "Volatility surface"
+    required_params = ('expiries', 'atm_vol', 'skew')
+    optional_params = {
+        'curvature': None, 'left_asymp': None, 'right_asymp': None, 
+        'num_moneyness': 4001, 'max_std_devs': 6.0
+    }
+
+    def __init__(self, expiries, smiles, num_moneyness=4001, max_std_devs=6.0) -> None:
+        assert len(expiries) == len(smiles) > 0, "Need one smile per expiry"
+        assert num_moneyness > 1, "Need at least two moneyness points"
+        order = np.argsort(expiries)
+        self.expiries = np.asarray(expiries, dtype=float)[order]
+        assert self.expiries[0] > 0 and np.all(np.diff(self.expiries) > 0), "Expiries must be positive and distinct"
+        self.smiles = [smiles[i] for i in order]
+        width = max_std_devs*max(smile.c0*sqrt(time_to_expiry) for smile, time_to_expiry in zip(self.smiles, self.expiries))
+        self.moneyness = np.linspace(-width, width, num_moneyness)
+        self.moneyness_step = self.moneyness[1] - self.moneyness[0]
+        self.total_variances = np.empty((self.expiries.size, num_moneyness))
+        for i in range(self.expiries.size):
+            self._build_slice(i)
+
+    @classmethod
+    def from_params(cls, params: dict):
+        assert params['curvature'] is not None or (params['left_asymp'] is not None and params['right_asymp'] is not None), \
+            "Missing parameter: the smiles need 'curvature' (quadratic), or both 'left_asymp' and 'right_asymp' (hyperbolic)"
+        smile_param_names = [name for name in ('atm_vol', 'skew', 'curvature', 'left_asymp', 'right_asymp') if params[name] is not None]
+        assert all(len(params[name]) == len(params['expiries']) for name in smile_param_names), "Need one value of each parameter per expiry"
+        smiles = [
+            smile_from_params({name: params[name][i] for name in smile_param_names}) 
+            for i in range(len(params['expiries']))
+        ]
+        return cls(
+            expiries=params['expiries'], 
+            smiles=smiles, 
+            num_moneyness=params['num_moneyness'], 
+            max_std_devs=params['max_std_devs'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.vol_surface_pricing_function,
+            'batch_pricing_function': self.vol_surface_batch_pricing_function,
+            'density_function': None,
+            'greeks_function': None,
+        }
+
+    def jit_kernels(self) -> dict:
+        return {'pricing_function': self.vol_surface_jit_pricing_function}
+
+    def _build_slice(self, i: int):
+        time_to_expiry = self.expiries[i]
+        smile = self.smiles[i]
+        x = -self.moneyness/(smile.c0*sqrt(time_to_expiry))
+        vols = smile_vol_function(smile)(x)
+        self.total_variances[i] = vols*vols*time_to_expiry
+
+    # Replaces the smile of an existing expiry, or adds a new expiry, retabulating only that slice.
+    # The moneyness grid is kept. (Prices cached by a PricingModel around this surface are not invalidated.)
+    def update_slice(self, time_to_expiry: float, smile):
+        assert time_to_expiry > 0, "Expiries must be positive"
+        i = int(np.searchsorted(self.expiries, time_to_expiry))
+        if i < self.expiries.size and self.expiries[i] == time_to_expiry:
+            self.smiles[i] = smile
+        else:
+            self.expiries = np.insert(self.expiries, i, time_to_expiry)
+            self.smiles.insert(i, smile)
+            self.total_variances = np.insert(self.total_variances, i, 0.0, axis=0)
+        self._build_slice(i)
+
+    # Volatilities at the given log-forward moneyness and expiries, vectorized
+    def volatilities(self, log_moneyness, times_to_expiry) -> np.ndarray:
+        log_moneyness, times_to_expiry = np.broadcast_arrays(
+            np.asarray(log_moneyness, dtype=float), np.asarray(times_to_expiry, dtype=float))
+        position = (np.clip(log_moneyness, self.moneyness[0], self.moneyness[-1]) - self.moneyness[0])/self.moneyness_step
+        left = np.minimum(position.astype(np.intp), self.moneyness.size - 2)
+        weight = position - left
+
+        last = self.expiries.size - 1
+        upper = np.clip(np.searchsorted(self.expiries, times_to_expiry), 0, last)
+        lower = np.maximum(upper - 1, 0)
+        lower_variances = self.total_variances[lower, left]*(1 - weight) + self.total_variances[lower, left + 1]*weight
+        upper_variances = self.total_variances[upper, left]*(1 - weight) + self.total_variances[upper, left + 1]*weight
+        lower_expiries, upper_expiries = self.expiries[lower], self.expiries[upper]
+        # Between slices the total variance is interpolated linearly; outside, the vol of the nearest slice is kept
+        inside = upper > lower
+        expiry_weight = np.where(inside, (times_to_expiry - lower_expiries)/np.where(inside, upper_expiries - lower_expiries, 1.0), 1.0)
+        outside_variances = upper_variances*times_to_expiry/upper_expiries
+        total_variances = np.where(
+            inside & (times_to_expiry <= self.expiries[last]),
+            lower_variances*(1 - expiry_weight) + upper_variances*expiry_weight,
+            outside_variances)
+        return np.sqrt(total_variances/times_to_expiry)
+
+    def vol_surface_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return float(self.vol_surface_batch_pricing_function(
+            conditions=conditions, 
+            strikes=np.array([option.strike]), 
+            times_to_expiry=np.array([option.time_to_expiry]), 
+            is_call=np.array([option.is_call])
+        )[0])
+
+    def vol_surface_jit_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return vol_surface_kernel(
+            conditions.spot, option.strike, option.time_to_expiry, conditions.interest_rate, option.is_call,
+            self.moneyness, self.expiries, self.total_variances)
+
+    def vol_surface_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        spot, interest_rate = conditions.spot, conditions.interest_rate
+        log_moneyness = np.log(strikes/spot) - interest_rate*times_to_expiry
+        return black_scholes_formula_vectorized(
+            spot=spot, 
+            strike=strikes,
+            time_to_expiry=times_to_expiry,
+            volatility=self.volatilities(log_moneyness=log_moneyness, times_to_expiry=times_to_expiry), 
+            interest_rate=interest_rate,
+            is_call=is_call
+        )
+
+
+# PricingModel parameters of a volatility surface, from a dictionary mapping each expiry to the
+# parameters of its smile (such as those returned by SmileCalibrator.calibrate)
+def vol_surface_params(slice_params: dict, **options) -> dict:
+    expiries = sorted(slice_params)
+    params = {'expiries': tuple(expiries)}
+    for name in slice_params[expiries[0]]:
+        params[name] = tuple(slice_params[time_to_expiry][name] for time_to_expiry in expiries)
+    params.update(options)
+    return params
+
+#####################
+
+# Local volatility implied by a smile model. The smile gives implied volatilities for every expiry, as a
+# function of x = -k/(atm_vol*sqrt(T)) with k = log(K/F), so the total implied variance w(k, T) = vol(x)^2*T
+# is differentiated analytically and plugged into Dupire's formula
+#   local variance = dw/dT / (1 - k/w dw/dk + (-1/4 - 1/w + k^2/w^2)(dw/dk)^2/4 + d^2w/dk^2/2).
+# Where the smile admits arbitrage (non-positive numerator or denominator) the local variance is floored.
+MIN_LOCAL_VARIANCE = 1e-6
+
+def dupire_local_variance(smile, log_moneyness, time_to_expiry: float) -> np.ndarray:
+    scale = smile.c0*sqrt(time_to_expiry)
+    x = -log_moneyness/scale
+    vol = smile_vol_function(smile)(x)
+    first, second = smile_vol_derivatives(smile)(x)
+    dx_dk = -1/scale
+    total_variance = vol*vol*time_to_expiry
+    dw_dk = 2*vol*first*dx_dk*time_to_expiry
+    d2w_dk2 = 2*(first*first + vol*second)*dx_dk*dx_dk*time_to_expiry
+    dw_dt = vol*vol - vol*first*x
+    k_over_w = log_moneyness/total_variance
+    denominator = (
+        1 - k_over_w*dw_dk 
+        + 0.25*(-0.25 - 1/total_variance + k_over_w*k_over_w)*dw_dk*dw_dk 
+        + 0.5*d2w_dk2
+    )
+    valid = (denominator > 0) & (dw_dt > 0)
+    local_variance = np.where(valid, dw_dt/np.where(valid, denominator, 1.0), MIN_LOCAL_VARIANCE)
+    return np.maximum(local_variance, MIN_LOCAL_VARIANCE)
+
+
+# Call prices for all strikes at once, under the local volatility of a smile model, from the forward
+# (Dupire) equation dC/dT = 1/2 sigma_loc(K,T)^2 K^2 d^2C/dK^2 - r K dC/dK with C(K, 0) = (S - K)^+.
+# The equation is solved on a uniform strike grid [0, max_strike] (with C = S at K = 0 and C = 0 at
+# max_strike), marching once through all the expiries (sorted), with tridiagonal banded solves.
+# Time steps use the TR-BDF2 scheme (a Crank-Nicolson stage followed by a BDF2 stage): it is second order
+# like Crank-Nicolson, but also damps the oscillations that Crank-Nicolson lets through at the kink of the
+# initial payoff and wherever the local volatility jumps (e.g. at the edges of floored regions).
+# Returns the strike grid and the call prices, one row per expiry. Cached, since solving prices every strike.
+TR_BDF2_GAMMA = 2 - sqrt(2)
+
+@lru_cache(maxsize=32)
+def local_vol_call_grid(
+        smile_params: tuple, 
+        spot: float, 
+        interest_rate: float, 
+        expiries: tuple, 
+        num_strike_steps: int, 
+        max_strike: float, 
+        time_steps_per_year: int
+    ):
+    assert all(time_to_expiry > 0 for time_to_expiry in expiries), "Expiries must be positive"
+    smile = smile_from_params(dict(smile_params))
+    strikes = np.linspace(0.0, max_strike, num_strike_steps+1)
+    step = strikes[1]
+    interior = strikes[1:-1]
+    banded = np.empty((3, interior.size))
+
+    # Tridiagonal coefficients of the right-hand side operator on the interior nodes, at the given time
+    def operator_coefficients(time: float):
+        forward = spot*exp(interest_rate*time)
+        local_variance = dupire_local_variance(smile, np.log(interior/forward), time)
+        diffusion = 0.5*local_variance*interior*interior/(step*step)
+        drift = interest_rate*interior/(2*step)
+        # Central differences for the drift term, except where it dominates the diffusion: there, one-sided
+        # (upwind) differences keep the off-diagonal coefficients non-negative
+        upwind = np.where(np.abs(drift) > diffusion, np.abs(drift), 0.0)
+        return diffusion + drift + upwind, -2*diffusion - 2*upwind, diffusion - drift + upwind
+
+    # Solves (1 - weight*L) C = right_hand_side on the interior nodes; the boundary values do not change
+    def solve_implicit(calls: np.ndarray, right_hand_side: np.ndarray, coefficients: tuple, weight: float) -> np.ndarray:
+        lower, diagonal, upper = coefficients
+        right_hand_side[0] += weight*lower[0]*calls[0]
+        banded[0, 1:] = -weight*upper[:-1]
+        banded[1] = 1 - weight*diagonal
+        banded[2, :-1] = -weight*lower[1:]
+        new_calls = calls.copy()
+        new_calls[1:-1] = solve_banded((1, 1), banded, right_hand_side, overwrite_b=True, check_finite=False)
+        return new_calls
+
+    def time_step(calls: np.ndarray, time: float, time_interval: float) -> np.ndarray:
+        gamma = TR_BDF2_GAMMA
+        half_stage = 0.5*gamma*time_interval
+        coefficients = operator_coefficients(time + half_stage)
+        lower, diagonal, upper = coefficients
+        right_hand_side = calls[1:-1] + half_stage*(lower*calls[:-2] + diagonal*calls[1:-1] + upper*calls[2:])
+        stage_calls = solve_implicit(calls, right_hand_side, coefficients, weight=half_stage)
+        right_hand_side = (stage_calls[1:-1] - (1 - gamma)**2*calls[1:-1])/(gamma*(2 - gamma))
+        return solve_implicit(
+            calls, right_hand_side, operator_coefficients(time + time_interval), weight=(1 - gamma)/(2 - gamma)*time_interval)
+
+    calls = np.maximum(spot - strikes, 0.0)
+    calls_by_expiry = {}
+    time = 0.0
+    for time_to_expiry in sorted(expiries):
+        num_steps = max(int(np.ceil((time_to_expiry - time)*time_steps_per_year)), 1)
+        time_interval = (time_to_expiry - time)/num_steps
+        for i in range(num_steps):
+            calls = time_step(calls, time + i*time_interval, time_interval)
+        time = time_to_expiry
+        calls_by_expiry[time_to_expiry] = calls
+    call_grid = np.array([calls_by_expiry[time_to_expiry] for time_to_expiry in expiries])
+    for array in (strikes, call_grid):
+        array.setflags(write=False)
+    return strikes, call_grid
+
+
+# Prices under the local volatility of a smile model (quadratic, or hyperbolic if asymptotes are given),
+# from a single forward PDE solve covering every strike and all the expiries priced together; strikes
+# between grid points are priced by interpolation. The strike grid extends to max_strike_multiple times
+# the spot. Being computed from the PDE grid, the densities are those of an arbitrage-free model; the prices
+# agree with those of the smile model wherever its implied volatilities are arbitrage-free, but differ where
+# the local variance had to be floored (e.g. the far wings of short expiries, whose total variance a fixed
+# smile in x makes grow as the expiry shrinks).
+@register_model
+class LocalVolatilityPDE:
+    model_name = "Local volatility PDE"
+    required_params = ('atm_vol', 'skew')
+    optional_params = {
+        'curvature': None, 'left_asymp': None, 'right_asymp': None, 
+        'num_strike_steps': 2000, 'time_steps_per_year': 250, 'max_strike_multiple': 5.0
+    }
+
+    def __init__(self, smile_params: dict, num_strike_steps=2000, time_steps_per_year=250, max_strike_multiple=5.0) -> None:
+        assert min(num_strike_steps, time_steps_per_year) > 1, "Grid sizes must be larger than one"
+        assert max_strike_multiple > 1, "The strike grid must extend beyond the spot"
+        self.smile_params = tuple(sorted((name, value) for name, value in smile_params.items() if value is not None))
+        self.smile = smile_from_params(dict(self.smile_params))
+        self.num_strike_steps = int(num_strike_steps)
+        self.time_steps_per_year = int(time_steps_per_year)
+        self.max_strike_multiple = max_strike_multiple
+
+    @classmethod
+    def from_params(cls, params: dict):
+        assert params['curvature'] is not None or (params['left_asymp'] is not None and params['right_asymp'] is not None), \
+            "Missing parameter: the smile needs 'curvature' (quadratic), or both 'left_asymp' and 'right_asymp' (hyperbolic)"
+        smile_params = {name: params[name] for name in ('atm_vol', 'skew', 'curvature', 'left_asymp', 'right_asymp')}
+        return cls(
+            smile_params=smile_params, 
+            num_strike_steps=params['num_strike_steps'], 
+            time_steps_per_year=params['time_steps_per_year'], 
+            max_strike_multiple=params['max_strike_multiple'])
+
+    def kernels(self) -> dict:
+        return {
+            'pricing_function': self.local_vol_pricing_function,
+            'batch_pricing_function': self.local_vol_batch_pricing_function,
+            'density_function': self.local_vol_density_function,
+            'greeks_function': None,
+        }
+
+    # Strike grid and call prices (one row per expiry) of the solve for the given expiries
+    def local_vol_call_grid(self, conditions: MarketConditions, expiries):
+        return local_vol_call_grid(
+            smile_params=self.smile_params, 
+            spot=conditions.spot, 
+            interest_rate=conditions.interest_rate, 
+            expiries=tuple(float(time_to_expiry) for time_to_expiry in expiries), 
+            num_strike_steps=self.num_strike_steps, 
+            max_strike=self.max_strike_multiple*conditions.spot, 
+            time_steps_per_year=self.time_steps_per_year)
 
+    def local_vol_pricing_function(self, option: OptionClass, conditions: MarketConditions) -> float:
+        return float(self.local_vol_batch_pricing_function(
+            conditions=conditions, 
+            strikes=np.array([option.strike]), 
+            times_to_expiry=np.array([option.time_to_expiry]), 
+            is_call=np.array([option.is_call])
+        )[0])
 
+    # Calls are interpolated on the grid (and are zero beyond it); puts follow by put-call parity
+    def local_vol_batch_pricing_function(self, conditions: MarketConditions, strikes, times_to_expiry, is_call) -> np.ndarray:
+        strikes, times_to_expiry, is_call = np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), np.asarray(times_to_expiry, dtype=float), is_call)
+        expiries = np.unique(times_to_expiry)
+        grid_strikes, call_grid = self.local_vol_call_grid(conditions=conditions, expiries=expiries)
+        calls = np.empty(strikes.shape)
+        for i, time_to_expiry in enumerate(expiries):
+            same_expiry = times_to_expiry == time_to_expiry
+            calls[same_expiry] = np.interp(strikes[same_expiry], grid_strikes, call_grid[i], right=0.0)
+        puts = calls - conditions.spot + strikes*np.exp(-conditions.interest_rate*times_to_expiry)
+        return np.where(is_call, calls, puts)
 
+    # Density exp(rT)*d^2C/dK^2 from second differences on the grid, interpolated to the strikes
+    def local_vol_density_function(self, conditions: MarketConditions, strikes, time_to_expiry: float) -> np.ndarray:
+        grid_strikes, call_grid = self.local_vol_call_grid(conditions=conditions, expiries=(time_to_expiry,))
+        step = grid_strikes[1] - grid_strikes[0]
+        densities = np.diff(call_grid[0], n=2)/(step*step)
+        return exp(conditions.interest_rate*time_to_expiry)*np.interp(strikes, grid_strikes[1:-1], densities, right=0.0)
@@ -0,0 +1,349 @@
+from instrument_market_classes import OptionBook, MarketConditions
+from pricing_model_class import PricingModel
+from pricing_model_menagerie import GREEKS
+from pricing_cache import PricingCache
+from implied_volatility import implied_volatility
+from collections import OrderedDict
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import numpy as np
+
+
+# Local pricing service, speaking newline-delimited JSON over TCP or a Unix socket.
+# A request is an object with an 'id' (echoed back), a 'type' and the fields of that type:
+#   "price":        model, params, spot, interest_rate, strike, time_to_expiry, option_type
+#   "greeks":       the same fields; the result is a dictionary of the GREEKS
+#   "implied_vol":  price, spot, interest_rate, strike, time_to_expiry, option_type; the result is the
+#                   volatility (null if the price admits none)
+# and the response is {"id": ..., "result": ...} or {"id": ..., "error": "..."}. Prices and Greeks the
+# model cannot compute (NaN or infinite, e.g. at expiry for some models) are returned as null. Requests may be pipelined
+# on a connection; responses come back as soon as they are ready, not necessarily in order.
+REQUEST_TYPES = ("price", "greeks", "implied_vol")
+
+
+class PricingServiceError(Exception):
+    pass
+
+
+# Serves the requests of any number of connections. Concurrent requests with the same type, model and
+# market conditions are micro-batched: they are collected for up to batch_window seconds (or until
+# max_batch_size of them are waiting) and then answered by a single vectorized call. If that call fails,
+# the requests of the batch are answered one by one, so that only the failing ones get an error. With no window, a
+# batch holds the requests read in the same event loop iteration, which adds no latency; non-zero windows
+# are subject to the event loop's timer resolution (1ms with epoll). The PricingModels
+# (and the optional PricingCache shared by them) are kept across requests, up to max_models of them.
+class PricingService:
+    def __init__(self, batch_window=0.0, max_batch_size=4096, max_models=256, cache: PricingCache = None) -> None:
+        assert batch_window >= 0, "Batch window must be non-negative"
+        assert max_batch_size > 0 and max_models > 0, "Sizes must be positive"
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_models = max_models
+        self.cache = cache
+        self.num_requests = 0
+        self.num_batches = 0
+        self._models = OrderedDict()
+        self._batches = {}
+        self._timers = {}
+
+    # Answers one request (as a dictionary), waiting for the batch it joins to be computed
+    async def handle_request(self, request: dict) -> dict:
+        request_id = request.get('id')
+        try:
+            key, option = self._parse(request)
+        except (AssertionError, KeyError, TypeError, ValueError) as error:
+            return {'id': request_id, 'error': f"Invalid request: {error!r}"}
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batches.setdefault(key, [])
+        batch.append((option, future))
+        self.num_requests += 1
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            loop = asyncio.get_running_loop()
+            if self.batch_window > 0:
+                self._timers[key] = loop.call_later(self.batch_window, self._flush, key)
+            else:
+                self._timers[key] = loop.call_soon(self._flush, key)
+        try:
+            return {'id': request_id, 'result': await future}
+        except Exception as error:
+            return {'id': request_id, 'error': f"Pricing failed: {error!r}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def respond(request: dict):
+            response = await self.handle_request(request)
+            writer.write((json.dumps(response) + "\n").encode())
+
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    assert isinstance(request, dict), "Requests must be JSON objects"
+                except (AssertionError, ValueError) as error:
+                    writer.write((json.dumps({'id': None, 'error': f"Invalid request: {error!r}"}) + "\n").encode())
+                    continue
+                task = asyncio.ensure_future(respond(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if writer.transport.get_write_buffer_size() > 2**20:
+                    await writer.drain()
+            if pending:
+                await asyncio.gather(*pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.num_requests,
+            'batches': self.num_batches,
+            'models': len(self._models),
+        }
+
+    # Batch key and (strike, time to expiry, is_call[, price]) of a request
+    def _parse(self, request: dict):
+        request_type = request['type']
+        assert request_type in REQUEST_TYPES, "Unrecognized request type"
+        option_type = request['option_type']
+        assert option_type == "call" or option_type == "put", "Invalid option type; must be 'call' or 'put'"
+        option = (float(request['strike']), float(request['time_to_expiry']), option_type == "call")
+        market = (float(request['spot']), float(request['interest_rate']))
+        assert all(np.isfinite(option[:2] + market)), "Market data and options must be finite"
+        assert option[0] > 0 and market[0] > 0, "Strike and spot must be positive"
+        assert option[1] >= 0, "Time to expiry must be non-negative"
+        if request_type == "implied_vol":
+            price = float(request['price'])
+            assert np.isfinite(price), "Price must be finite"
+            return (request_type, None, market), option + (price,)
+        params = request['params']
+        assert isinstance(params, dict), "Parameters must be a JSON object"
+        # Parameters are keyed by their canonical JSON; lists (per-expiry parameters) are passed on as tuples
+        model_key = (request['model'], json.dumps(params, sort_keys=True))
+        return (request_type, model_key, market), option
+
+    # Warm PricingModel of the given model, with its market conditions updated
+    def _model(self, model_key: tuple, spot: float, interest_rate: float) -> PricingModel:
+        model = self._models.get(model_key)
+        if model is None:
+            model_name, params = model_key
+            params = {name: tuple(value) if isinstance(value, list) else value for name, value in json.loads(params).items()}
+            model = PricingModel(
+                model_name=model_name,
+                params=params,
+                conditions=MarketConditions(spot=spot, interest_rate=interest_rate),
+                cache=self.cache)
+            self._models[model_key] = model
+            if len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        self._models.move_to_end(model_key)
+        model.conditions.spot = spot
+        model.conditions.interest_rate = interest_rate
+        return model
+
+    def _flush(self, key: tuple) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(key, None)
+        if not batch:
+            return
+        self.num_batches += 1
+        options = np.array([option for option, _ in batch])
+        try:
+            results = self._compute(key, options)
+        except Exception as error:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(error)
+                return
+            # Every request gets its own result or error, rather than the error of the whole batch
+            results = []
+            for i, (_, future) in enumerate(batch):
+                try:
+                    results.append(self._compute(key, options[i:i+1])[0])
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                    results.append(None)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    # Results of a batch of options (rows of strike, time to expiry, is_call[, price]), with null for
+    # any non-finite value
+    def _compute(self, key: tuple, options: np.ndarray) -> list:
+        request_type, model_key, (spot, interest_rate) = key
+        strikes, times_to_expiry, is_call = options[:, 0], options[:, 1], options[:, 2] > 0
+        if request_type == "implied_vol":
+            vols, converged = implied_volatility(
+                prices=options[:, 3],
+                spot=spot,
+                strikes=strikes,
+                times_to_expiry=times_to_expiry,
+                interest_rate=interest_rate,
+                is_call=is_call)
+            return [finite_or_none(vol) if ok else None for vol, ok in zip(vols, converged)]
+        model = self._model(model_key, spot, interest_rate)
+        book = OptionBook.from_arrays(strikes=strikes, times_to_expiry=times_to_expiry, type_codes=is_call.astype(np.int8))
+        if request_type == "price":
+            return [finite_or_none(price) for price in model.model_batch_pricing_function(book=book)]
+        greeks = model.model_greeks_function(book=book)
+        return [{greek: finite_or_none(greeks[greek][i]) for greek in GREEKS} for i in range(len(options))]
+
+
+# JSON-safe result: the float, or None (null) for NaN and infinities, which JSON cannot represent
+def finite_or_none(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+# Client for the pricing service. Any number of requests can be awaited concurrently; they are
+# pipelined over the single connection and matched to their responses by id.
+class PricingClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._pending = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    # The address is a Unix socket path, or a (host, port) pair
+    @classmethod
+    async def connect(cls, address):
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address)
+        else:
+            reader, writer = await asyncio.open_connection(*address)
+        return cls(reader, writer)
+
+    async def request(self, **fields):
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write((json.dumps({'id': request_id, **fields}) + "\n").encode())
+        response = await future
+        if 'error' in response:
+            raise PricingServiceError(response['error'])
+        return response['result']
+
+    async def price(self, model: str, params: dict, spot, interest_rate, strike, time_to_expiry, option_type="call") -> float:
+        return await self.request(
+            type="price", model=model, params=params, spot=spot, interest_rate=interest_rate,
+            strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+
+    async def greeks(self, model: str, params: dict, spot, interest_rate, strike, time_to_expiry, option_type="call") -> dict:
+        return await self.request(
+            type="greeks", model=model, params=params, spot=spot, interest_rate=interest_rate,
+            strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+
+    async def implied_volatility(self, price, spot, interest_rate, strike, time_to_expiry, option_type="call"):
+        return await self.request(
+            type="implied_vol", price=price, spot=spot, interest_rate=interest_rate,
+            strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+
+    async def close(self) -> None:
+        self._writer.close()
+        self._receiver.cancel()
+
+    async def _receive(self) -> None:
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._pending.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection to the pricing service closed"))
+        self._pending.clear()
+
+
+# Listening socket on a Unix socket path, or on a (host, port) pair
+def create_listening_socket(address) -> socket.socket:
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen(1024)
+    listener.setblocking(False)
+    return listener
+
+
+async def run_worker(listener: socket.socket, **service_options) -> None:
+    service = PricingService(**service_options)
+    if listener.family == socket.AF_UNIX:
+        server = await asyncio.start_unix_server(service.handle_connection, sock=listener)
+    else:
+        server = await asyncio.start_server(service.handle_connection, sock=listener)
+    async with server:
+        await server.serve_forever()
+
+
+def worker_main(listener: socket.socket, service_options: dict) -> None:
+    try:
+        asyncio.run(run_worker(listener, **service_options))
+    except KeyboardInterrupt:
+        pass
+
+
+# Serves until interrupted. The listening socket is created once, and with num_workers > 1 that many
+# worker processes are forked up front, all accepting connections on it (each with its own warm models).
+# The workers are stopped when the server is interrupted or terminated.
+def serve(address, num_workers=1, **service_options) -> None:
+    listener = create_listening_socket(address)
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    if num_workers <= 1:
+        worker_main(listener, service_options)
+        return
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=worker_main, args=(listener, service_options), daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local option pricing service")
+    parser.add_argument("--unix", help="Unix socket path to listen on (instead of TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-window", type=float, default=0.0, help="seconds to collect a batch for")
+    parser.add_argument("--max-batch-size", type=int, default=4096)
+    args = parser.parse_args()
+    address = args.unix if args.unix is not None else (args.host, args.port)
+    serve(address, num_workers=args.workers, batch_window=args.batch_window, max_batch_size=args.max_batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+import hashlib
+import os
+import shutil
+import uuid
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Persistent store of computed grids (strikes, prices, densities, ...) in a directory that any number of
+# processes can share. Each entry is a subdirectory named by the hash of its key, holding one .npy file
+# per array, which readers load as read-only memory maps.
+# Entries are written to a temporary directory which is then renamed into place, so readers never see a
+# partial entry, and concurrent writers of the same entry simply keep the first one. Whenever the total
+# size exceeds max_bytes, the least recently used entries are evicted (under a file lock, by renaming them
+# away before deleting them, so that readers holding memory maps keep valid data).
+class ResultStore:
+    def __init__(self, directory: str, max_bytes=1024*1024*1024) -> None:
+        assert max_bytes > 0, "Byte budget must be positive"
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # Hash of a model (name and parameters), market conditions snapshot and grid specification
+    @staticmethod
+    def key(model_name: str, params: dict, conditions_key: tuple, grid_spec: dict) -> str:
+        description = repr((model_name, tuple(sorted(params.items())), conditions_key, tuple(sorted(grid_spec.items()))))
+        return hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+
+    # Dictionary of read-only memory-mapped arrays, or None if the entry is not stored
+    def get(self, key: str):
+        entry = os.path.join(self.directory, key)
+        try:
+            arrays = {
+                file_name[:-len(".npy")]: np.load(os.path.join(entry, file_name), mmap_mode="r")
+                for file_name in os.listdir(entry) if file_name.endswith(".npy")
+            }
+            # The modification time of an entry is its last use, for eviction
+            os.utime(entry)
+        except FileNotFoundError:
+            # Not stored, or evicted while being read
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def put(self, key: str, arrays: dict) -> None:
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry):
+            return
+        temporary = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.mkdir(temporary)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), np.asarray(array))
+        try:
+            os.rename(temporary, entry)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+        self._evict()
+
+    def clear(self) -> None:
+        with self._locked():
+            for key in self._entries():
+                self._remove(key)
+
+    def stats(self) -> dict:
+        sizes = [self._entry_size(key) for key in self._entries()]
+        return {
+            'entries': len(sizes),
+            'bytes': sum(sizes),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _entries(self) -> list:
+        return [name for name in os.listdir(self.directory) if not name.startswith(".")]
+
+    def _entry_size(self, key: str) -> int:
+        entry = os.path.join(self.directory, key)
+        try:
+            return sum(os.path.getsize(os.path.join(entry, file_name)) for file_name in os.listdir(entry))
+        except FileNotFoundError:
+            return 0
+
+    def _evict(self) -> None:
+        with self._locked():
+            entries = []
+            for key in self._entries():
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.directory, key)), key))
+                except FileNotFoundError:
+                    continue
+            entries.sort()
+            sizes = {key: self._entry_size(key) for _, key in entries}
+            total_bytes = sum(sizes.values())
+            for _, key in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                self._remove(key)
+                total_bytes -= sizes[key]
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        trash = os.path.join(self.directory, f".trash-{uuid.uuid4().hex}")
+        try:
+            os.rename(os.path.join(self.directory, key), trash)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    # Exclusive lock on the store directory, shared by all processes using it (a no-op where fcntl is unavailable)
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,190 @@
+from instrument_market_classes import OptionBook, MarketConditions
+from pricing_model_class import PricingModel
+from comparisons import ModelAndParams, model_label
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from math import exp, log
+from typing import List
+import itertools
+import json
+import os
+import time
+import numpy as np
+
+
+# Output columns of a sweep, with their types; 'model' is the index of the model in the scenario spec
+SWEEP_COLUMNS = {
+    'model': np.int16,
+    'spot': np.float64,
+    'vol_shock': np.float64,
+    'interest_rate': np.float64,
+    'time_to_expiry': np.float64,
+    'strike': np.float64,
+    'is_call': np.bool_,
+    'price': np.float64,
+}
+
+
+# Declarative description of a grid of scenarios: every model, under every combination of a relative
+# spot shock (spot*(1 + shock)), a relative volatility shock and an additive interest rate shift applied
+# to the base conditions, prices every option of the (strike x expiry x option type) grid.
+# A volatility shock scales the parameters setting a model's volatility level (see shocked_params).
+class ScenarioSpec:
+    def __init__(
+            self,
+            models: List[ModelAndParams],
+            base_conditions: MarketConditions,
+            strikes,
+            expiries,
+            option_types=("call", "put"),
+            spot_shocks=(0.0,),
+            vol_shocks=(0.0,),
+            rate_shifts=(0.0,)
+        ) -> None:
+        assert len(models) > 0, "Need at least one model"
+        assert all(shock > -1 for shock in spot_shocks), "Spot shocks must be above -100%"
+        assert all(shock > -1 for shock in vol_shocks), "Volatility shocks must be above -100%"
+        self.models = models
+        self.base_conditions = base_conditions
+        strikes, expiries, option_types = np.meshgrid(
+            np.asarray(strikes, dtype=float), np.asarray(expiries, dtype=float), np.asarray(option_types), indexing="ij")
+        self.book = OptionBook(strikes=strikes.ravel(), times_to_expiry=expiries.ravel(), option_types=option_types.ravel())
+        self.spot_shocks = tuple(spot_shocks)
+        self.vol_shocks = tuple(vol_shocks)
+        self.rate_shifts = tuple(rate_shifts)
+
+    def num_scenario_prices(self) -> int:
+        return len(self.models)*len(self.spot_shocks)*len(self.vol_shocks)*len(self.rate_shifts)*len(self.book)
+
+    # Chunks of the sweep, as (model index, vol shock, rate shift). All the spot shocks of a chunk are
+    # priced by one PricingModel, so they share its cached binomial distributions (which do not depend on
+    # the spot), and its smile slices.
+    def chunks(self) -> list:
+        return list(itertools.product(range(len(self.models)), self.vol_shocks, self.rate_shifts))
+
+
+# Parameters of a model with its volatility level scaled by 1 + vol_shock: the volatility or
+# at-the-money volatility (per expiry for a volatility surface), or the log up and down ticks of the
+# binomial model. The other smile parameters are kept.
+def shocked_params(mod_params: ModelAndParams, vol_shock: float) -> dict:
+    params = dict(mod_params.params)
+    scale = 1 + vol_shock
+    if mod_params.model_name == "Binomial":
+        params['up_tick'] = exp(log(params['up_tick'])*scale)
+        params['down_tick'] = exp(log(params['down_tick'])*scale)
+    for name in ('volatility', 'atm_vol'):
+        if name in params:
+            value = params[name]
+            params[name] = tuple(v*scale for v in value) if isinstance(value, tuple) else value*scale
+    return params
+
+
+# Prices one chunk of a sweep; kept at module level so that it can run in worker processes.
+# Returns the chunk's output columns.
+def price_chunk(task) -> dict:
+    spec, model_index, vol_shock, rate_shift = task
+    base = spec.base_conditions
+    conditions = MarketConditions(spot=base.spot, interest_rate=base.interest_rate + rate_shift)
+    conditions.set_min_max_strikes_of_interest(base.min_strike_of_interest, base.max_strike_of_interest)
+    mod_params = spec.models[model_index]
+    model = PricingModel(
+        model_name=mod_params.model_name,
+        params=shocked_params(mod_params, vol_shock),
+        conditions=conditions)
+    book = spec.book
+    prices = np.empty((len(spec.spot_shocks), len(book)))
+    for i, spot_shock in enumerate(spec.spot_shocks):
+        conditions.spot = base.spot*(1 + spot_shock)
+        prices[i] = model.model_batch_pricing_function(book=book)
+    num_spots = len(spec.spot_shocks)
+    return {
+        'model': np.full(prices.size, model_index, dtype=SWEEP_COLUMNS['model']),
+        'spot': np.repeat(base.spot*(1 + np.asarray(spec.spot_shocks)), len(book)),
+        'vol_shock': np.full(prices.size, vol_shock),
+        'interest_rate': np.full(prices.size, conditions.interest_rate),
+        'time_to_expiry': np.tile(book.times_to_expiry, num_spots),
+        'strike': np.tile(book.strikes, num_spots),
+        'is_call': np.tile(book.is_call, num_spots),
+        'price': prices.ravel(),
+    }
+
+
+# Streams sweep results to a directory, as one raw binary file per column (appended to chunk by chunk),
+# plus a schema.json with the column types, the model labels and the number of rows, written on close.
+# load_sweep reads the columns back as memory maps.
+class SweepWriter:
+    def __init__(self, directory: str, model_labels: list) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.model_labels = model_labels
+        self.num_rows = 0
+        self._files = {name: open(os.path.join(directory, f"{name}.bin"), "wb") for name in SWEEP_COLUMNS}
+
+    def write(self, columns: dict) -> None:
+        for name, dtype in SWEEP_COLUMNS.items():
+            self._files[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self.num_rows += len(columns['price'])
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        schema = {
+            'num_rows': self.num_rows,
+            'columns': {name: np.dtype(dtype).str for name, dtype in SWEEP_COLUMNS.items()},
+            'models': self.model_labels,
+        }
+        with open(os.path.join(self.directory, "schema.json"), "w") as file:
+            json.dump(schema, file, indent=2)
+
+
+# Columns of a finished sweep as read-only memory maps, and the model labels
+def load_sweep(directory: str):
+    with open(os.path.join(directory, "schema.json")) as file:
+        schema = json.load(file)
+    columns = {}
+    for name, dtype in schema['columns'].items():
+        path = os.path.join(directory, f"{name}.bin")
+        if schema['num_rows'] == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(path, dtype=dtype, mode="r", shape=(schema['num_rows'],))
+    return columns, schema['models']
+
+
+def print_progress(done_chunks: int, num_chunks: int, num_rows: int, elapsed: float) -> None:
+    print(f"{done_chunks}/{num_chunks} chunks, {num_rows} prices, {elapsed:.1f}s")
+
+
+# Runs a sweep, pricing its chunks on a thread or process pool and streaming their results to the output
+# directory as they complete (in any order). At most two chunks per worker are in flight at any time, which
+# bounds the memory used. The progress function, if any, is called after each chunk with the number of
+# chunks done, the total number of chunks, the number of prices written and the elapsed seconds.
+# Returns the number of prices written.
+def run_sweep(
+        spec: ScenarioSpec,
+        output_directory: str,
+        executor="thread",
+        max_workers=None,
+        progress=None
+    ) -> int:
+    assert executor == "thread" or executor == "process", "Executor must be 'thread' or 'process'"
+    max_workers = max_workers or os.cpu_count() or 1
+    pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    writer = SweepWriter(directory=output_directory, model_labels=[model_label(mod_params) for mod_params in spec.models])
+    tasks = iter([(spec, *chunk) for chunk in spec.chunks()])
+    num_chunks = len(spec.chunks())
+    done_chunks = 0
+    start = time.perf_counter()
+    try:
+        with pool_class(max_workers=max_workers) as pool:
+            pending = {pool.submit(price_chunk, task) for task in itertools.islice(tasks, 2*max_workers)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    writer.write(future.result())
+                    done_chunks += 1
+                    if progress is not None:
+                        progress(done_chunks, num_chunks, writer.num_rows, time.perf_counter() - start)
+                pending |= {pool.submit(price_chunk, task) for task in itertools.islice(tasks, len(done))}
+    finally:
+        writer.close()
+    return writer.num_rows
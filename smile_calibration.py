@@ -0,0 +1,179 @@
+from instrument_market_classes import MarketConditions
+from implied_volatility import implied_volatility
+from helper_functions import gluing_function, gluing_function_derivatives
+from scipy.optimize import least_squares
+from concurrent.futures import ProcessPoolExecutor
+from math import exp, log, sqrt
+import numpy as np
+
+
+SMILE_MODEL_NAMES = ("Quadratic volatility smile", "Hyperbolic volatility smile")
+
+
+# Implied volatilities quoted for a single expiry
+class QuotedSlice:
+    def __init__(self, time_to_expiry: float, strikes, implied_vols) -> None:
+        strikes = np.asarray(strikes, dtype=float)
+        implied_vols = np.asarray(implied_vols, dtype=float)
+        assert strikes.shape == implied_vols.shape, "Strikes and implied vols must have the same shape"
+        quoted = np.isfinite(implied_vols)
+        self.time_to_expiry = time_to_expiry
+        self.strikes = strikes[quoted]
+        self.implied_vols = implied_vols[quoted]
+
+    # Quotes whose implied volatility cannot be computed are dropped
+    @classmethod
+    def from_prices(cls, conditions: MarketConditions, time_to_expiry: float, strikes, prices, option_types) -> "QuotedSlice":
+        implied_vols, _ = implied_volatility(
+            prices=prices, 
+            spot=conditions.spot, 
+            strikes=strikes, 
+            times_to_expiry=time_to_expiry, 
+            interest_rate=conditions.interest_rate, 
+            is_call=np.asarray(option_types) == "call")
+        return cls(time_to_expiry=time_to_expiry, strikes=strikes, implied_vols=implied_vols)
+
+
+# Calibration works on unconstrained coordinates, from which the smile parameters are built so that the
+# admissibility conditions of VolSmileQuadratic and VolSmileHyperbolic hold automatically:
+#   quadratic:  c0 = exp(a), c1 = b, c2 = c1^2/(4*c0) + exp(e)
+#   hyperbolic: c0 = exp(a), c1 = exp(b), c2_plus/minus = c1^2/(2*c0) + exp(e_plus/minus)
+
+def quadratic_smile_residuals(coordinates, log_moneyness, sqrt_time, implied_vols):
+    c0, c1, c2 = quadratic_smile_parameters(coordinates)
+    x = log_moneyness/(c0*sqrt_time)
+    return c0 + c1*x + c2*x*x - implied_vols
+
+def quadratic_smile_jacobian(coordinates, log_moneyness, sqrt_time, implied_vols):
+    a, b, e = coordinates
+    c0, c1, c2 = quadratic_smile_parameters(coordinates)
+    x = log_moneyness/(c0*sqrt_time)
+    # Partial derivatives in (c0, c1, c2), where x itself depends on c0 via dx/dc0 = -x/c0
+    dvol_dc0 = 1 - (c1 + 2*c2*x)*x/c0
+    dvol_dc1 = x
+    dvol_dc2 = x*x
+    return np.column_stack((
+        dvol_dc0*c0 - dvol_dc2*c1*c1/(4*c0),
+        dvol_dc1 + dvol_dc2*c1/(2*c0),
+        dvol_dc2*exp(e),
+    ))
+
+def quadratic_smile_parameters(coordinates):
+    a, b, e = coordinates
+    c0 = exp(a)
+    return c0, b, b*b/(4*c0) + exp(e)
+
+def hyperbolic_smile_residuals(coordinates, log_moneyness, sqrt_time, implied_vols, glue_end_point=3):
+    c0, c1, c2_plus, c2_minus = hyperbolic_smile_parameters(coordinates)
+    x = log_moneyness/(c0*sqrt_time)
+    f_plus = np.sqrt(c0*c0 + c1*c1*x + c2_plus*c2_plus*x*x)
+    f_minus = np.sqrt(c0*c0 + c1*c1*x + c2_minus*c2_minus*x*x)
+    interpolation = gluing_function((x+glue_end_point)/(2*glue_end_point))
+    return interpolation*f_plus + (1-interpolation)*f_minus - implied_vols
+
+def hyperbolic_smile_jacobian(coordinates, log_moneyness, sqrt_time, implied_vols, glue_end_point=3):
+    a, b, e_plus, e_minus = coordinates
+    c0, c1, c2_plus, c2_minus = hyperbolic_smile_parameters(coordinates)
+    x = log_moneyness/(c0*sqrt_time)
+    f_plus = np.sqrt(c0*c0 + c1*c1*x + c2_plus*c2_plus*x*x)
+    f_minus = np.sqrt(c0*c0 + c1*c1*x + c2_minus*c2_minus*x*x)
+    y = (x+glue_end_point)/(2*glue_end_point)
+    interpolation = gluing_function(y)
+    interpolation_dx = gluing_function_derivatives(y)[0]/(2*glue_end_point)
+    dvol_dx = (
+        interpolation_dx*(f_plus - f_minus) 
+        + interpolation*(c1*c1 + 2*c2_plus*c2_plus*x)/(2*f_plus) 
+        + (1-interpolation)*(c1*c1 + 2*c2_minus*c2_minus*x)/(2*f_minus)
+    )
+    # Partial derivatives in (c0, c1, c2_plus, c2_minus), where x itself depends on c0 via dx/dc0 = -x/c0
+    dvol_dc0 = (interpolation/f_plus + (1-interpolation)/f_minus)*c0 - dvol_dx*x/c0
+    dvol_dc1 = (interpolation/f_plus + (1-interpolation)/f_minus)*c1*x
+    dvol_dc2_plus = interpolation*c2_plus*x*x/f_plus
+    dvol_dc2_minus = (1-interpolation)*c2_minus*x*x/f_minus
+    dvol_dc2 = dvol_dc2_plus + dvol_dc2_minus
+    return np.column_stack((
+        dvol_dc0*c0 - dvol_dc2*c1*c1/(2*c0),
+        dvol_dc1*c1 + dvol_dc2*c1*c1/c0,
+        dvol_dc2_plus*exp(e_plus),
+        dvol_dc2_minus*exp(e_minus),
+    ))
+
+def hyperbolic_smile_parameters(coordinates):
+    a, b, e_plus, e_minus = coordinates
+    c0, c1 = exp(a), exp(b)
+    return c0, c1, c1*c1/(2*c0) + exp(e_plus), c1*c1/(2*c0) + exp(e_minus)
+
+# Starting coordinates from polynomial fits of the vols (quadratic) or squared vols (hyperbolic) in x
+def initial_coordinates(model_name: str, log_moneyness, sqrt_time, implied_vols):
+    atm_vol = float(implied_vols[np.argmin(np.abs(log_moneyness))])
+    x = log_moneyness/(atm_vol*sqrt_time)
+    if model_name == "Quadratic volatility smile":
+        c2, c1, c0 = np.polyfit(x, implied_vols, deg=2)
+        c0 = max(c0, 1e-4)
+        return np.array([log(c0), c1, log(max(c2 - c1*c1/(4*c0), 1e-6))])
+    square_c2, square_c1, square_c0 = np.polyfit(x, implied_vols*implied_vols, deg=2)
+    c0 = sqrt(max(square_c0, 1e-8))
+    c1 = sqrt(max(square_c1, 1e-6))
+    excess_c2 = log(max(sqrt(max(square_c2, 0.0)) - c1*c1/(2*c0), 1e-6))
+    return np.array([log(c0), log(c1), excess_c2, excess_c2])
+
+# Fits one expiry by least squares in volatility space; returns the fitted coordinates and the RMS error
+def calibrate_slice(model_name: str, conditions: MarketConditions, quotes: QuotedSlice, initial=None):
+    assert model_name in SMILE_MODEL_NAMES, "Unrecognized model type"
+    residuals, jacobian, num_parameters = (
+        (quadratic_smile_residuals, quadratic_smile_jacobian, 3) if model_name == "Quadratic volatility smile"
+        else (hyperbolic_smile_residuals, hyperbolic_smile_jacobian, 4))
+    assert quotes.strikes.size >= num_parameters, "Not enough quotes to calibrate"
+    log_moneyness = np.log(conditions.spot/quotes.strikes) + conditions.interest_rate*quotes.time_to_expiry
+    sqrt_time = sqrt(quotes.time_to_expiry)
+    if initial is None:
+        initial = initial_coordinates(model_name, log_moneyness, sqrt_time, quotes.implied_vols)
+    fit = least_squares(
+        residuals, 
+        initial, 
+        jac=jacobian, 
+        method="lm", 
+        args=(log_moneyness, sqrt_time, quotes.implied_vols))
+    return fit.x, sqrt(2*fit.cost/quotes.strikes.size)
+
+# Smile parameters in the form expected by PricingModel
+def smile_model_params(model_name: str, coordinates) -> dict:
+    if model_name == "Quadratic volatility smile":
+        c0, c1, c2 = quadratic_smile_parameters(coordinates)
+        return {'atm_vol': float(c0), 'skew': float(c1), 'curvature': float(c2)}
+    c0, c1, c2_plus, c2_minus = hyperbolic_smile_parameters(coordinates)
+    return {'atm_vol': float(c0), 'skew': float(c1*c1/(2*c0)), 'right_asymp': float(c2_plus), 'left_asymp': float(c2_minus)}
+
+
+# Calibrates a smile model expiry by expiry, warm-starting each expiry from its previous fit
+class SmileCalibrator:
+    def __init__(self, model_name: str) -> None:
+        assert model_name in SMILE_MODEL_NAMES, "Unrecognized model type"
+        self.model_name = model_name
+        self.coordinates = {}
+        self.rms_errors = {}
+
+    # Returns a dictionary mapping each expiry to the fitted PricingModel parameters.
+    # With max_workers > 1 the expiries are fitted in parallel across a process pool.
+    def calibrate(self, conditions: MarketConditions, quoted_slices: list, max_workers=None) -> dict:
+        tasks = [
+            (self.model_name, conditions, quotes, self.coordinates.get(quotes.time_to_expiry))
+            for quotes in quoted_slices
+        ]
+        if max_workers is not None and max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                fits = list(executor.map(calibrate_slice_task, tasks, chunksize=max(1, len(tasks)//(4*max_workers))))
+        else:
+            fits = [calibrate_slice_task(task) for task in tasks]
+
+        params = {}
+        for quotes, (coordinates, rms_error) in zip(quoted_slices, fits):
+            self.coordinates[quotes.time_to_expiry] = coordinates
+            self.rms_errors[quotes.time_to_expiry] = rms_error
+            params[quotes.time_to_expiry] = smile_model_params(self.model_name, coordinates)
+        return params
+
+
+def calibrate_slice_task(task):
+    model_name, conditions, quotes, initial = task
+    return calibrate_slice(model_name=model_name, conditions=conditions, quotes=quotes, initial=initial)
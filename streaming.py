@@ -0,0 +1,182 @@
+from instrument_market_classes import OptionBook, MarketConditions
+from pricing_model_class import PricingModel
+from comparisons import ModelAndParams, model_label
+from typing import Iterable, List
+import asyncio
+import numpy as np
+
+
+# Ticks and options refer to an underlying by any hashable name; books with a single underlying can leave it out
+DEFAULT_UNDERLYING = None
+
+
+class MarketTick:
+    __slots__ = ("timestamp", "spot", "interest_rate", "underlying")
+
+    def __init__(self, timestamp: float, spot: float, interest_rate: float, underlying=DEFAULT_UNDERLYING) -> None:
+        self.timestamp = timestamp
+        self.spot = spot
+        self.interest_rate = interest_rate
+        self.underlying = underlying
+
+
+# New values and changes (relative to the previously published values) of the repriced options of one
+# model. Indices refer to the order in which options were registered; values and changes map each
+# quantity ('price', and the Greeks if requested) to an array aligned with the indices.
+class RepricingUpdate:
+    __slots__ = ("timestamp", "underlying", "model_label", "indices", "values", "changes")
+
+    def __init__(self, timestamp: float, underlying, model_label: str, indices: np.ndarray, values: dict, changes: dict) -> None:
+        self.timestamp = timestamp
+        self.underlying = underlying
+        self.model_label = model_label
+        self.indices = indices
+        self.values = values
+        self.changes = changes
+
+
+# The options of one underlying, kept as a book of their own (with their registration indices), with the
+# positions in it of each expiry bucket. Its models share (and see the in-place updates of) its market conditions.
+class UnderlyingBook:
+    __slots__ = ("conditions", "models", "book", "indices", "buckets", "dirty_buckets", "priced_conditions")
+
+    def __init__(self, conditions: MarketConditions, models_list: List[ModelAndParams]) -> None:
+        self.conditions = conditions
+        self.models = [
+            (model_label(mod_params), PricingModel(model_name=mod_params.model_name, params=mod_params.params, conditions=conditions))
+            for mod_params in models_list
+        ]
+        self.book = OptionBook(strikes=[], times_to_expiry=[], option_types=np.zeros(0, dtype=bool))
+        self.indices = np.zeros(0, dtype=np.intp)
+        self.buckets = {}
+        self.dirty_buckets = set()
+        self.priced_conditions = None
+
+
+# Reprices a registered book of options under several models as market ticks arrive.
+# Options are bucketed by underlying and expiry, and a tick only concerns the buckets of its underlying:
+# if it moves the spot or the rate by more than the tolerances, all of them are repriced; otherwise only
+# the buckets with newly registered options are priced. Per-expiry quantities that do not depend on the
+# spot (e.g. binomial weights) are cached by the models themselves.
+class StreamingRepricer:
+    def __init__(
+            self, 
+            models_list: List[ModelAndParams], 
+            initial_conditions: MarketConditions, 
+            with_greeks=False,
+            spot_tolerance=0.0,
+            rate_tolerance=0.0
+        ) -> None:
+        self.models_list = models_list
+        self.quantities = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho') if with_greeks else ('price',)
+        self.spot_tolerance = spot_tolerance
+        self.rate_tolerance = rate_tolerance
+        self.num_options = 0
+        self.underlyings = {}
+        self.last_values = {model_label(mod_params): {quantity: np.zeros(0) for quantity in self.quantities} for mod_params in models_list}
+        self.add_underlying(underlying=DEFAULT_UNDERLYING, conditions=initial_conditions)
+
+    # Market conditions of the default underlying
+    @property
+    def conditions(self) -> MarketConditions:
+        return self.underlyings[DEFAULT_UNDERLYING].conditions
+
+    def add_underlying(self, underlying, conditions: MarketConditions) -> None:
+        assert underlying not in self.underlyings, "Underlying already added"
+        own_conditions = MarketConditions(spot=conditions.spot, interest_rate=conditions.interest_rate)
+        own_conditions.set_min_max_strikes_of_interest(conditions.min_strike_of_interest, conditions.max_strike_of_interest)
+        self.underlyings[underlying] = UnderlyingBook(conditions=own_conditions, models_list=self.models_list)
+
+    def register_options(self, book: OptionBook, underlying=DEFAULT_UNDERLYING) -> np.ndarray:
+        assert underlying in self.underlyings, "Unknown underlying"
+        state = self.underlyings[underlying]
+        new_indices = np.arange(self.num_options, self.num_options + len(book))
+        self.num_options += len(book)
+        state.book = OptionBook(
+            strikes=np.concatenate((state.book.strikes, book.strikes.ravel())), 
+            times_to_expiry=np.concatenate((state.book.times_to_expiry, book.times_to_expiry.ravel())), 
+            option_types=np.concatenate((state.book.is_call, book.is_call.ravel())))
+        state.indices = np.concatenate((state.indices, new_indices))
+        for values in self.last_values.values():
+            for quantity in self.quantities:
+                values[quantity] = np.concatenate((values[quantity], np.full(len(book), np.nan)))
+        expiries, bucket_of_option = np.unique(state.book.times_to_expiry, return_inverse=True)
+        state.buckets = {float(expiry): np.flatnonzero(bucket_of_option == i) for i, expiry in enumerate(expiries)}
+        state.dirty_buckets.update(float(expiry) for expiry in np.unique(book.times_to_expiry))
+        return new_indices
+
+    def on_tick(self, tick: MarketTick) -> List[RepricingUpdate]:
+        assert tick.underlying in self.underlyings, "Unknown underlying"
+        state = self.underlyings[tick.underlying]
+        if state.priced_conditions is None or (
+                abs(tick.spot - state.priced_conditions[0]) > self.spot_tolerance 
+                or abs(tick.interest_rate - state.priced_conditions[1]) > self.rate_tolerance):
+            state.conditions.spot = tick.spot
+            state.conditions.interest_rate = tick.interest_rate
+            state.priced_conditions = (tick.spot, tick.interest_rate)
+            affected_buckets = list(state.buckets)
+        else:
+            affected_buckets = [expiry for expiry in state.buckets if expiry in state.dirty_buckets]
+        state.dirty_buckets.clear()
+        if not affected_buckets:
+            return []
+
+        if len(affected_buckets) == len(state.buckets):
+            # The whole book of the underlying is priced as it is, without gathering its options
+            affected_book, indices = state.book, state.indices
+        else:
+            positions = np.concatenate([state.buckets[expiry] for expiry in affected_buckets])
+            affected_book = OptionBook.from_arrays(
+                strikes=state.book.strikes[positions], 
+                times_to_expiry=state.book.times_to_expiry[positions], 
+                type_codes=state.book.type_codes[positions])
+            indices = state.indices[positions]
+        updates = []
+        for label, model in state.models:
+            if len(self.quantities) > 1:
+                new_values = model.model_greeks_function(book=affected_book)
+            else:
+                new_values = {'price': model.batch_pricing_function(
+                    conditions=state.conditions, 
+                    strikes=affected_book.strikes, 
+                    times_to_expiry=affected_book.times_to_expiry, 
+                    is_call=affected_book.is_call)}
+            last_values = self.last_values[label]
+            changes = {quantity: new_values[quantity] - last_values[quantity][indices] for quantity in self.quantities}
+            for quantity in self.quantities:
+                last_values[quantity][indices] = new_values[quantity]
+            updates.append(RepricingUpdate(
+                timestamp=tick.timestamp, 
+                underlying=tick.underlying, 
+                model_label=label, 
+                indices=indices, 
+                values={quantity: new_values[quantity] for quantity in self.quantities}, 
+                changes=changes))
+        return updates
+
+    def reprice(self, ticks: Iterable[MarketTick]):
+        for tick in ticks:
+            for update in self.on_tick(tick):
+                yield update
+
+    # Consumes ticks from tick_queue until it receives None, publishing updates to update_queue (followed by None).
+    # A bounded update_queue applies backpressure: repricing waits while the consumer is behind. With conflate=True,
+    # the ticks that queued up in the meantime are collapsed into the latest one of each underlying (taken in the
+    # order in which the underlyings first ticked), since only the current market matters.
+    async def run(self, tick_queue: asyncio.Queue, update_queue: asyncio.Queue, conflate=True) -> None:
+        while True:
+            ticks = [await tick_queue.get()]
+            while conflate and ticks[-1] is not None and not tick_queue.empty():
+                ticks.append(tick_queue.get_nowait())
+            finished = ticks[-1] is None
+            if finished:
+                ticks.pop()
+            latest_ticks = {}
+            for tick in ticks:
+                latest_ticks[tick.underlying] = tick
+            for tick in latest_ticks.values():
+                for update in self.on_tick(tick):
+                    await update_queue.put(update)
+            if finished:
+                await update_queue.put(None)
+                return
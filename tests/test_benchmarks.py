@@ -0,0 +1,55 @@
+from benchmarks import measure, save_results, load_results, compare_to_baseline
+
+
+def benchmark_row(name="Black-Scholes", batch_size=100, p50_seconds=1e-3, peak_memory_bytes=1000) -> dict:
+    return {'name': name, 'batch_size': batch_size, 'p50_seconds': p50_seconds, 'peak_memory_bytes': peak_memory_bytes}
+
+
+def test_measure_reports_latencies_and_memory():
+    row = measure(name="sum", function=lambda: sum(range(1000)), batch_size=1000, min_seconds=0, min_repeats=5)
+    assert row['name'] == "sum" and row['batch_size'] == 1000 and row['repeats'] == 5
+    assert 0 < row['p50_seconds'] <= row['p90_seconds'] <= row['p99_seconds']
+    assert row['options_per_second'] == 1000/row['p50_seconds']
+    assert row['peak_memory_bytes'] >= 0
+
+
+def test_results_round_trip(tmp_path):
+    rows = [benchmark_row(), benchmark_row(batch_size=1000)]
+    path = tmp_path / "results.json"
+    save_results(rows=rows, path=str(path))
+    assert load_results(path=str(path)) == rows
+
+
+def test_no_regressions_within_tolerance():
+    baseline = [benchmark_row()]
+    rows = [benchmark_row(p50_seconds=1.19e-3, peak_memory_bytes=1190)]
+    assert compare_to_baseline(rows=rows, baseline_rows=baseline, tolerance=0.2) == []
+
+
+def test_regressions_are_reported_per_metric():
+    baseline = [benchmark_row()]
+    rows = [benchmark_row(p50_seconds=1.5e-3, peak_memory_bytes=3000)]
+    regressions = compare_to_baseline(rows=rows, baseline_rows=baseline, tolerance=0.2)
+    assert [regression['metric'] for regression in regressions] == ['p50_seconds', 'peak_memory_bytes']
+    assert regressions[0]['baseline'] == 1e-3 and regressions[0]['current'] == 1.5e-3
+    assert abs(regressions[0]['ratio'] - 1.5) < 1e-12
+    assert regressions[1]['ratio'] == 3
+
+
+def test_benchmarks_are_matched_by_name_and_batch_size():
+    baseline = [benchmark_row(), benchmark_row(name="Binomial")]
+    rows = [
+        # Not in the baseline: ignored
+        benchmark_row(batch_size=1000, p50_seconds=1.0),
+        # Faster than the baseline: not a regression
+        benchmark_row(p50_seconds=1e-4),
+        benchmark_row(name="Binomial", p50_seconds=2e-3),
+    ]
+    regressions = compare_to_baseline(rows=rows, baseline_rows=baseline)
+    assert [(regression['name'], regression['metric']) for regression in regressions] == [("Binomial", 'p50_seconds')]
+
+
+def test_growth_from_zero_memory_has_infinite_ratio():
+    regressions = compare_to_baseline(
+        rows=[benchmark_row(peak_memory_bytes=10)], baseline_rows=[benchmark_row(peak_memory_bytes=0)])
+    assert len(regressions) == 1 and regressions[0]['ratio'] == float("inf")
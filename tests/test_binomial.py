@@ -0,0 +1,53 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from benchmarks import choose_sum_binomial_price
+from math import exp, sqrt
+import numpy as np
+import pytest
+
+
+VOLATILITY = 0.2
+EXPIRY = 1.0
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+OPTION_TYPES = ["call", "put", "call", "put", "call"]
+NUM_INTERVALS = (50, 100, 200, 400)
+
+
+# Cox-Ross-Rubinstein ticks for VOLATILITY, so that every tree converges to the same Black-Scholes prices
+def binomial_model(num_intervals: int, **options) -> PricingModel:
+    up_tick = exp(VOLATILITY*sqrt(EXPIRY/num_intervals))
+    return PricingModel(
+        model_name="Binomial", 
+        params={'up_tick': up_tick, 'down_tick': 1/up_tick, 'num_intervals': num_intervals, **options}, 
+        conditions=CONDITIONS)
+
+def max_pricing_error(num_intervals: int, **options) -> float:
+    errors = binomial_model(num_intervals, **options).model.binomial_pricing_errors(
+        conditions=CONDITIONS, strikes=STRIKES, times_to_expiry=EXPIRY, is_call=np.array(OPTION_TYPES) == "call")
+    return np.abs(errors).max()
+
+
+def test_plain_tree_converges_to_black_scholes():
+    errors = [max_pricing_error(num_intervals) for num_intervals in NUM_INTERVALS]
+    assert all(fine < coarse for coarse, fine in zip(errors, errors[1:]))
+    assert errors[-1] < 1e-2
+
+# The O(N) log-space sum must reproduce the original choose()-based sum over the terminal nodes
+@pytest.mark.parametrize("num_intervals", [1, 2, 25, 100])
+def test_log_space_prices_match_the_choose_sum(num_intervals):
+    model = binomial_model(num_intervals)
+    prices = model.price_many(strikes=STRIKES, expiries=EXPIRY, option_types=OPTION_TYPES)
+    expected = [
+        choose_sum_binomial_price(
+            spot=CONDITIONS.spot, strike=strike, up_tick=model.model.up_tick, down_tick=model.model.down_tick, 
+            num_intervals=num_intervals, time_to_expiry=EXPIRY, interest_rate=CONDITIONS.interest_rate, 
+            option_type=option_type)
+        for strike, option_type in zip(STRIKES, OPTION_TYPES)
+    ]
+    np.testing.assert_allclose(prices, expected, rtol=1e-12, atol=1e-12)
+
+def test_large_trees_do_not_overflow():
+    prices = binomial_model(5000).price_many(strikes=STRIKES, expiries=EXPIRY, option_types=OPTION_TYPES)
+    assert np.all(np.isfinite(prices))
+    assert max_pricing_error(5000) < 1e-3
@@ -0,0 +1,76 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from helper_functions import black_scholes_greeks
+from math import exp, sqrt
+import numpy as np
+import pytest
+
+
+VOLATILITY = 0.2
+EXPIRY = 1.0
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+OPTION_TYPES = ["call", "put", "call", "put", "call"]
+NUM_INTERVALS = (50, 100, 200, 400)
+ACCELERATIONS = ["bbs", "leisen_reimer"]
+
+
+# Cox-Ross-Rubinstein ticks for VOLATILITY, so that every tree converges to the same Black-Scholes prices
+def binomial_model(num_intervals: int, **options) -> PricingModel:
+    up_tick = exp(VOLATILITY*sqrt(EXPIRY/num_intervals))
+    return PricingModel(
+        model_name="Binomial", 
+        params={'up_tick': up_tick, 'down_tick': 1/up_tick, 'num_intervals': num_intervals, **options}, 
+        conditions=CONDITIONS)
+
+def max_pricing_error(num_intervals: int, **options) -> float:
+    errors = binomial_model(num_intervals, **options).model.binomial_pricing_errors(
+        conditions=CONDITIONS, strikes=STRIKES, times_to_expiry=EXPIRY, is_call=np.array(OPTION_TYPES) == "call")
+    return np.abs(errors).max()
+
+
+@pytest.mark.parametrize("acceleration", ACCELERATIONS)
+def test_accelerated_trees_beat_the_plain_tree(acceleration):
+    errors = [max_pricing_error(num_intervals, acceleration=acceleration) for num_intervals in NUM_INTERVALS]
+    assert all(fine < coarse for coarse, fine in zip(errors, errors[1:]))
+    assert all(error < max_pricing_error(num_intervals) for num_intervals, error in zip(NUM_INTERVALS, errors))
+
+def test_leisen_reimer_converges_at_second_order():
+    errors = [max_pricing_error(num_intervals, acceleration="leisen_reimer") for num_intervals in NUM_INTERVALS]
+    # Doubling the number of intervals divides the error by about four
+    assert all(fine < coarse/3 for coarse, fine in zip(errors, errors[1:]))
+    assert errors[-1] < 1e-5
+
+@pytest.mark.parametrize("acceleration", ACCELERATIONS)
+def test_richardson_extrapolation_reduces_the_error(acceleration):
+    for num_intervals in NUM_INTERVALS:
+        assert (max_pricing_error(num_intervals, acceleration=acceleration, richardson=True) 
+                < max_pricing_error(num_intervals, acceleration=acceleration))
+
+# The error of a plain tree oscillates with the number of intervals, so extrapolating it makes it worse
+def test_richardson_extrapolation_needs_an_acceleration():
+    with pytest.raises(AssertionError, match="needs an acceleration"):
+        binomial_model(100, richardson=True)
+
+
+@pytest.mark.parametrize("acceleration", ACCELERATIONS)
+@pytest.mark.parametrize("richardson", [False, True])
+def test_accelerated_greeks_match_black_scholes(acceleration, richardson):
+    model = binomial_model(100, acceleration=acceleration, richardson=richardson)
+    greeks = model.greeks_many(strikes=STRIKES, expiries=EXPIRY, option_types=OPTION_TYPES)
+    # The Greeks are those of the accelerated prices, not of the plain lattice
+    np.testing.assert_array_equal(greeks['price'], model.price_many(strikes=STRIKES, expiries=EXPIRY, option_types=OPTION_TYPES))
+    expected = black_scholes_greeks(
+        spot=CONDITIONS.spot, strike=STRIKES, volatility=VOLATILITY, time_to_expiry=EXPIRY, 
+        interest_rate=CONDITIONS.interest_rate, is_call=np.array(OPTION_TYPES) == "call")
+    for greek in ('delta', 'gamma', 'vega', 'theta', 'rho'):
+        np.testing.assert_allclose(greeks[greek], expected[greek], rtol=0.01, atol=1e-3, err_msg=greek)
+
+@pytest.mark.parametrize("acceleration", ACCELERATIONS)
+def test_accelerated_american_greeks_match_a_fine_plain_tree(acceleration):
+    greeks = binomial_model(100, acceleration=acceleration, american=True).greeks_many(
+        strikes=STRIKES, expiries=EXPIRY, option_types="put")
+    expected = binomial_model(2000, american=True).greeks_many(strikes=STRIKES, expiries=EXPIRY, option_types="put")
+    # Both trees are coarse around the exercise boundary, where their gammas differ by up to about 10%
+    for greek, tolerance in (('price', 0.005), ('delta', 0.01), ('gamma', 0.1), ('vega', 0.03), ('theta', 0.03), ('rho', 0.03)):
+        np.testing.assert_allclose(greeks[greek], expected[greek], rtol=tolerance, err_msg=greek)
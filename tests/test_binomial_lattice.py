@@ -0,0 +1,71 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from binomial_lattice import BinomialTree, get_binomial_tree
+from math import exp, sqrt
+import numpy as np
+
+
+VOLATILITY = 0.2
+EXPIRY = 1.0
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+OPTION_TYPES = ["call", "put", "call", "put", "call"]
+
+
+def binomial_model(num_intervals: int, **options) -> PricingModel:
+    up_tick = exp(VOLATILITY*sqrt(EXPIRY/num_intervals))
+    return PricingModel(
+        model_name="Binomial", 
+        params={'up_tick': up_tick, 'down_tick': 1/up_tick, 'num_intervals': num_intervals, **options}, 
+        conditions=CONDITIONS)
+
+
+# Two-step American put rolled back by hand: early exercise pays at the down node
+def test_two_step_american_put():
+    tree = BinomialTree(spot=100.0, up_tick=1.2, down_tick=0.8, num_intervals=2, time_to_expiry=2.0, interest_rate=0.05)
+    interest = exp(0.05)
+    up_prob = (interest - 0.8)/(1.2 - 0.8)
+    continuation = lambda up_value, down_value: (up_prob*up_value + (1 - up_prob)*down_value)/interest
+    up_node = continuation(0.0, 110.0 - 96.0)
+    down_node = max(continuation(110.0 - 96.0, 110.0 - 64.0), 110.0 - 80.0)
+    expected = continuation(up_node, down_node)
+    assert abs(tree.price(strikes=110.0, is_call=False, american=True) - expected) < 1e-12
+    assert tree.price(strikes=110.0, is_call=False, american=False) < expected
+
+
+# The O(N) European pricer sums over the terminal nodes; it must agree with the backward induction of the lattice
+def test_european_prices_match_the_lattice():
+    model = binomial_model(200)
+    tree = BinomialTree(
+        spot=CONDITIONS.spot, 
+        up_tick=model.model.up_tick, 
+        down_tick=model.model.down_tick, 
+        num_intervals=200, 
+        time_to_expiry=EXPIRY, 
+        interest_rate=CONDITIONS.interest_rate)
+    lattice_prices = tree.price(strikes=STRIKES, is_call=np.array(OPTION_TYPES) == "call", american=False)
+    np.testing.assert_allclose(
+        model.price_many(strikes=STRIKES, expiries=EXPIRY, option_types=OPTION_TYPES), lattice_prices, rtol=0, atol=1e-10)
+
+
+def test_american_options():
+    european, american = binomial_model(200), binomial_model(200, american=True)
+    # Early exercise has a positive value for puts...
+    american_puts = american.price_many(strikes=STRIKES, expiries=EXPIRY, option_types="put")
+    assert np.all(american_puts > european.price_many(strikes=STRIKES, expiries=EXPIRY, option_types="put"))
+    assert np.all(american_puts >= np.maximum(STRIKES - CONDITIONS.spot, 0.0))
+    # ...but none for calls on a stock without dividends, with a non-negative rate
+    np.testing.assert_allclose(
+        american.price_many(strikes=STRIKES, expiries=EXPIRY, option_types="call"), 
+        european.price_many(strikes=STRIKES, expiries=EXPIRY, option_types="call"), 
+        rtol=0, atol=1e-10)
+
+
+def test_trees_are_reused():
+    tree_args = {
+        'spot': 100.0, 'up_tick': 1.01, 'down_tick': 0.99, 'num_intervals': 100, 'time_to_expiry': 0.5, 'interest_rate': 0.01}
+    tree = get_binomial_tree(**tree_args)
+    assert get_binomial_tree(**tree_args) is tree
+    assert get_binomial_tree(**{**tree_args, 'spot': 101.0}) is not tree
+    # The shared tree is read-only
+    assert not tree.down_tick_powers.flags.writeable
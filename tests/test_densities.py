@@ -0,0 +1,59 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from math import exp
+import numpy as np
+import pytest
+
+
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+EXPIRY = 0.5
+ANALYTIC_MODELS = {
+    "Black-Scholes": {'volatility': 0.25},
+    "Quadratic volatility smile": {'atm_vol': 0.2, 'skew': -0.02, 'curvature': 0.005},
+    "Hyperbolic volatility smile": {'atm_vol': 0.2, 'skew': 0.01, 'right_asymp': 0.05, 'left_asymp': 0.08},
+}
+
+
+def pricing_model(model_name: str, params: dict) -> PricingModel:
+    return PricingModel(model_name=model_name, params=params, conditions=CONDITIONS)
+
+
+@pytest.mark.parametrize("model_name", list(ANALYTIC_MODELS))
+def test_analytic_densities_match_butterflies(model_name):
+    model = pricing_model(model_name, ANALYTIC_MODELS[model_name])
+    strikes = np.linspace(60.0, 160.0, 41)
+    analytic = model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY, method="analytic")
+    butterflies = model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY, precision=0.01, method="finite_difference")
+    np.testing.assert_allclose(analytic, butterflies, rtol=0, atol=1e-6)
+
+
+# The density integrates to one, and its mean is the forward (up to the mass of the far wings, where
+# the smiles are not arbitrage-free)
+@pytest.mark.parametrize("model_name", list(ANALYTIC_MODELS))
+def test_analytic_densities_are_probability_densities(model_name):
+    model = pricing_model(model_name, ANALYTIC_MODELS[model_name])
+    strikes = np.linspace(40.0, 250.0, 21001)
+    density = model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY)
+    assert np.all(density >= 0)
+    assert np.trapezoid(density, strikes) == pytest.approx(1.0, abs=2e-3)
+    assert np.trapezoid(strikes*density, strikes) == pytest.approx(CONDITIONS.spot*exp(CONDITIONS.interest_rate*EXPIRY), rel=2e-3)
+
+
+def test_auto_method_falls_back_to_butterflies():
+    model = pricing_model("Binomial", {'up_tick': 1.01, 'down_tick': 0.99, 'num_intervals': 100})
+    strikes = np.array([90.0, 100.0, 110.0])
+    np.testing.assert_array_equal(
+        model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY, precision=1.0), 
+        model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY, precision=1.0, method="finite_difference"))
+    with pytest.raises(AssertionError):
+        model.risk_neutral_density(strikes=strikes, time_to_expiry=EXPIRY, method="analytic")
+
+
+def test_distribution_plot_returns_the_density():
+    model = pricing_model("Black-Scholes", ANALYTIC_MODELS["Black-Scholes"])
+    distribution = model.probability_distribution_plot(time_to_expiry=EXPIRY, num_samples=20, plot=False)
+    assert len(distribution['strikes']) == 20
+    np.testing.assert_allclose(
+        distribution['probs'], 
+        model.risk_neutral_density(strikes=distribution['strikes'], time_to_expiry=EXPIRY, method="analytic"), 
+        rtol=0, atol=1e-15)
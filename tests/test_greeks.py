@@ -0,0 +1,73 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from pricing_model_menagerie import GREEKS
+from math import exp, sqrt
+import numpy as np
+import pytest
+
+
+SPOT = 100.0
+INTEREST_RATE = 0.03
+STRIKES = np.array([70.0, 90.0, 100.0, 100.0, 115.0, 140.0])
+EXPIRIES = np.array([0.1, 0.5, 1.0, 0.25, 1.5, 0.75])
+OPTION_TYPES = ["call", "put", "call", "put", "call", "put"]
+# Models with analytic Greeks, checked against central differences of their prices
+MODEL_PARAMS = {
+    "Black-Scholes": {'volatility': 0.25},
+    "Quadratic volatility smile": {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02},
+    "Hyperbolic volatility smile": {'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15},
+}
+
+
+def pricing_model(model_name: str, spot=SPOT, interest_rate=INTEREST_RATE, **param_changes) -> PricingModel:
+    return PricingModel(
+        model_name=model_name, 
+        params={**MODEL_PARAMS[model_name], **param_changes}, 
+        conditions=MarketConditions(spot=spot, interest_rate=interest_rate))
+
+
+@pytest.mark.parametrize("model_name", list(MODEL_PARAMS))
+def test_greeks_match_finite_differences(model_name):
+    bump = 1e-4
+    price = lambda expiries=EXPIRIES, **changes: pricing_model(model_name, **changes).price_many(
+        strikes=STRIKES, expiries=expiries, option_types=OPTION_TYPES)
+    greeks = pricing_model(model_name).greeks_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    assert set(greeks) == set(GREEKS)
+    spot_bump = SPOT*bump
+    up, down, mid = price(spot=SPOT + spot_bump), price(spot=SPOT - spot_bump), price()
+    np.testing.assert_allclose(greeks['price'], mid, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(greeks['delta'], (up - down)/(2*spot_bump), rtol=0, atol=1e-6)
+    np.testing.assert_allclose(greeks['gamma'], (up - 2*mid + down)/spot_bump**2, rtol=0, atol=1e-4)
+    np.testing.assert_allclose(
+        greeks['theta'], -(price(expiries=EXPIRIES + bump) - price(expiries=EXPIRIES - bump))/(2*bump), rtol=0, atol=1e-5)
+    np.testing.assert_allclose(
+        greeks['rho'], (price(interest_rate=INTEREST_RATE + bump) - price(interest_rate=INTEREST_RATE - bump))/(2*bump), 
+        rtol=0, atol=1e-5)
+    if model_name == "Black-Scholes":
+        np.testing.assert_allclose(
+            greeks['vega'], (price(volatility=0.25 + bump) - price(volatility=0.25 - bump))/(2*bump), rtol=0, atol=1e-5)
+
+
+# The tree Greeks are read off the first steps of the tree, so they converge to the Black-Scholes Greeks
+# (at the volatility of the ticks) as the tree is refined
+def test_binomial_greeks_converge_to_black_scholes():
+    conditions = MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE)
+    up_tick = exp(0.25*sqrt(1.0/1000))
+    model = PricingModel(
+        model_name="Binomial", params={'up_tick': up_tick, 'down_tick': 1/up_tick, 'num_intervals': 1000}, conditions=conditions)
+    greeks = model.greeks_many(strikes=STRIKES, expiries=1.0, option_types=OPTION_TYPES)
+    assert set(greeks) == set(GREEKS)
+    # The tree is rolled back, while the prices are summed over its terminal nodes
+    np.testing.assert_allclose(
+        greeks['price'], model.price_many(strikes=STRIKES, expiries=1.0, option_types=OPTION_TYPES), rtol=0, atol=1e-9)
+    expected = pricing_model("Black-Scholes").greeks_many(strikes=STRIKES, expiries=1.0, option_types=OPTION_TYPES)
+    for greek in ('delta', 'gamma', 'vega', 'theta', 'rho'):
+        np.testing.assert_allclose(greeks[greek], expected[greek], rtol=0.03, atol=2e-3, err_msg=greek)
+
+
+def test_models_without_greeks_refuse_them():
+    model = PricingModel(
+        model_name="Monte Carlo", params={'volatility': 0.2, 'num_paths': 1000}, 
+        conditions=MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE))
+    with pytest.raises(AssertionError, match="No Greeks"):
+        model.greeks_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
@@ -0,0 +1,56 @@
+from helper_functions import gluing_function, gluing_function_derivatives, relu
+from pricing_model_menagerie import VolSmileHyperbolic
+import warnings
+import numpy as np
+import pytest
+
+
+EDGE_POINTS = np.array([
+    -1.0, 0.0, 1e-300, 1e-200, 1e-160, 1e-10, 1e-4, 2e-3, 0.01, 0.3, 0.5, 0.7, 0.99, 1 - 2e-3, 1 - 1e-4, 1 - 1e-10, 1 - 1e-16, 
+    1.0, 2.0])
+
+
+def test_gluing_function_near_the_end_points():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        glue = gluing_function(EDGE_POINTS)
+        first, second = gluing_function_derivatives(EDGE_POINTS)
+    assert np.all(np.isfinite(glue)) and np.all(np.isfinite(first)) and np.all(np.isfinite(second))
+    np.testing.assert_array_equal(glue[EDGE_POINTS <= 0], 0.0)
+    np.testing.assert_array_equal(glue[EDGE_POINTS >= 1], 1.0)
+    assert np.all(np.diff(glue) >= 0)
+    # Flat at the end points, where exp(-1/x) underflows
+    near_end_points = np.minimum(np.abs(EDGE_POINTS), np.abs(1 - EDGE_POINTS)) < 1e-3
+    np.testing.assert_array_equal(first[near_end_points], 0.0)
+    np.testing.assert_array_equal(second[near_end_points], 0.0)
+
+def test_gluing_function_is_symmetric():
+    x = np.linspace(0.0, 1.0, 1001)
+    np.testing.assert_allclose(gluing_function(x) + gluing_function(1 - x), 1.0, rtol=0, atol=1e-15)
+
+def test_vectorized_gluing_function_matches_scalar_one():
+    np.testing.assert_allclose(gluing_function(EDGE_POINTS), [gluing_function(float(x)) for x in EDGE_POINTS], rtol=0, atol=1e-15)
+
+def test_gluing_function_derivatives_match_finite_differences():
+    x, step = np.linspace(0.05, 0.95, 91), 1e-5
+    first, second = gluing_function_derivatives(x)
+    up, middle, down = gluing_function(x + step), gluing_function(x), gluing_function(x - step)
+    np.testing.assert_allclose(first, (up - down)/(2*step), rtol=0, atol=1e-7)
+    np.testing.assert_allclose(second, (up - 2*middle + down)/step**2, rtol=0, atol=1e-3)
+
+
+def test_hyperbolic_smile_vectorized_matches_pointwise():
+    smile = VolSmileHyperbolic(c0=0.2, c1=0.1, c2_plus=0.05, c2_minus=0.08)
+    x = np.linspace(-8.0, 8.0, 161)
+    np.testing.assert_allclose(
+        smile.hyperbolic_vol_smile_function(x), [smile.hyperbolic_vol_smile_function(float(point)) for point in x], 
+        rtol=0, atol=1e-15)
+    # Outside the glued region, each hyperbola is used on its own
+    np.testing.assert_allclose(
+        smile.hyperbolic_vol_smile_function(np.array([-5.0, 5.0])), 
+        np.sqrt(0.2**2 + 0.1**2*np.array([-5.0, 5.0]) + np.array([0.08, 0.05])**2*25.0), rtol=1e-15)
+
+
+def test_relu():
+    assert relu(-1.0) == 0 and relu(2.0) == 2.0
+    np.testing.assert_array_equal(relu(np.array([-1.0, 0.0, 3.0])), [0.0, 0.0, 3.0])
@@ -0,0 +1,62 @@
+from helper_functions import black_scholes_formula_vectorized
+from implied_volatility import implied_volatility
+import numpy as np
+
+
+SPOT = 100.0
+INTEREST_RATE = 0.03
+
+
+def test_implied_volatility_round_trip():
+    strikes = np.array([70.0, 90.0, 100.0, 100.0, 115.0, 140.0])
+    expiries = np.array([0.1, 0.5, 1.0, 0.25, 1.5, 0.75])
+    is_call = np.array([True, False, True, False, True, False])
+    vols = np.array([0.4, 0.15, 0.3, 0.6, 1.2, 0.35])
+    prices = black_scholes_formula_vectorized(
+        spot=SPOT, strike=strikes, volatility=vols, time_to_expiry=expiries, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    implied_vols, converged = implied_volatility(
+        prices=prices, spot=SPOT, strikes=strikes, times_to_expiry=expiries, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    assert converged.all()
+    np.testing.assert_allclose(implied_vols, vols, rtol=1e-8)
+
+
+# A whole chain, with in-the-money options of both types (solved through put-call parity)
+def test_implied_volatility_of_a_chain():
+    generator = np.random.default_rng(0)
+    strikes = generator.uniform(60.0, 160.0, 10000)
+    expiries = generator.uniform(0.05, 3.0, 10000)
+    vols = generator.uniform(0.05, 1.0, 10000)
+    is_call = generator.random(10000) < 0.5
+    prices = black_scholes_formula_vectorized(
+        spot=SPOT, strike=strikes, volatility=vols, time_to_expiry=expiries, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    implied_vols, converged = implied_volatility(
+        prices=prices, spot=SPOT, strikes=strikes, times_to_expiry=expiries, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    # Prices with no time value left cannot be inverted
+    repriced = black_scholes_formula_vectorized(
+        spot=SPOT, strike=strikes, volatility=implied_vols, time_to_expiry=expiries, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    np.testing.assert_allclose(repriced[converged], prices[converged], rtol=0, atol=1e-9)
+    assert converged.mean() > 0.99
+
+
+def test_implied_volatility_broadcasts():
+    prices = black_scholes_formula_vectorized(
+        spot=SPOT, strike=np.array([[90.0], [110.0]]), volatility=0.2, time_to_expiry=np.array([0.5, 1.0, 2.0]), 
+        interest_rate=INTEREST_RATE)
+    implied_vols, converged = implied_volatility(
+        prices=prices, spot=SPOT, strikes=np.array([[90.0], [110.0]]), times_to_expiry=np.array([0.5, 1.0, 2.0]), 
+        interest_rate=INTEREST_RATE)
+    assert implied_vols.shape == converged.shape == (2, 3)
+    np.testing.assert_allclose(implied_vols, 0.2, rtol=1e-8)
+
+
+def test_implied_volatility_of_arbitrage_prices_is_nan():
+    # Below intrinsic value, and above the spot
+    implied_vols, converged = implied_volatility(
+        prices=[5.0, 120.0], spot=SPOT, strikes=[90.0, 100.0], times_to_expiry=1.0, interest_rate=0.0, is_call=True)
+    assert not converged.any()
+    assert np.isnan(implied_vols).all()
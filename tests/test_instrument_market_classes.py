@@ -0,0 +1,65 @@
+from instrument_market_classes import OptionClass, OptionBook, MarketConditions
+import numpy as np
+import pytest
+
+
+def test_standalone_options():
+    option = OptionClass(strike=100.0, time_to_expiry=0.5, option_type="put")
+    assert (option.strike, option.time_to_expiry, option.option_type) == (100.0, 0.5, "put")
+    assert option.is_call is False
+    option.option_type = "call"
+    option.strike = 90.0
+    assert option.is_call is True and option.value_at_expiration(95.0) == 5.0
+    with pytest.raises(AttributeError):
+        option.note = "no __dict__"
+    with pytest.raises(AssertionError):
+        OptionClass(strike=100.0, time_to_expiry=0.5, option_type="straddle")
+
+
+def test_books_use_the_given_arrays_without_copying():
+    strikes = np.array([90.0, 100.0, 110.0])
+    times_to_expiry = np.array([0.25, 0.5, 1.0])
+    book = OptionBook(strikes=strikes, times_to_expiry=times_to_expiry, option_types=["call", "put", "call"])
+    assert np.shares_memory(book.strikes, strikes) and np.shares_memory(book.times_to_expiry, times_to_expiry)
+    assert book.type_codes.dtype == np.int8
+    np.testing.assert_array_equal(book.is_call, [True, False, True])
+    # Slices view the same memory
+    tail = book[1:]
+    assert np.shares_memory(tail.strikes, strikes) and len(tail) == 2
+    wrapped = OptionBook.from_arrays(strikes=strikes, times_to_expiry=times_to_expiry, type_codes=book.type_codes)
+    assert wrapped.strikes is strikes
+
+
+def test_views_write_through_to_the_book():
+    book = OptionBook(strikes=[90.0, 100.0, 110.0], times_to_expiry=0.5, option_types="call")
+    option = book[1]
+    assert (option.strike, option.time_to_expiry, option.option_type) == (100.0, 0.5, "call")
+    assert type(option.strike) is float and option.is_call is True
+    option.strike = 105.0
+    option.option_type = "put"
+    assert book.strikes[1] == 105.0 and not book.is_call[1]
+    # ...and see the changes made to the book
+    book.times_to_expiry[1] = 2.0
+    assert option.time_to_expiry == 2.0
+    book[1:][0].strike = 107.0
+    assert option.strike == 107.0
+
+
+def test_multidimensional_books_are_iterated_in_flat_order():
+    strikes = np.array([[1.0, 2.0], [3.0, 4.0]])
+    book = OptionBook(strikes=strikes, times_to_expiry=1.0, option_types="call")
+    options = list(book)
+    assert [option.strike for option in options] == [1.0, 2.0, 3.0, 4.0]
+    assert book[3].strike == 4.0
+    options[2].strike = 30.0
+    assert strikes[1, 0] == 30.0
+    assert OptionBook.from_options(options).strikes.tolist() == [1.0, 2.0, 30.0, 4.0]
+
+
+def test_market_conditions():
+    conditions = MarketConditions(spot=100.0, interest_rate=0.03)
+    assert (conditions.min_strike_of_interest, conditions.max_strike_of_interest) == (50.0, 200.0)
+    conditions.set_min_max_strikes_of_interest(60.0, 140.0)
+    assert conditions.snapshot() == (100.0, 0.03, 60.0, 140.0)
+    with pytest.raises(AttributeError):
+        conditions.volatility = 0.2
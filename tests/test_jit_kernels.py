@@ -0,0 +1,78 @@
+from instrument_market_classes import OptionClass, MarketConditions
+from pricing_model_class import PricingModel
+from jit_kernels import JIT_AVAILABLE
+import jit_kernels
+import pricing_model_menagerie
+import numpy as np
+import pytest
+
+requires_numba = pytest.mark.skipif(not JIT_AVAILABLE, reason="numba is not installed")
+
+
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = (70.0, 90.0, 100.0, 115.0, 140.0)
+EXPIRIES = (0.1, 0.5, 1.0, 1.5)
+SURFACE_PARAMS = {
+    'expiries': (0.25, 1.0), 'atm_vol': (0.25, 0.2), 'skew': (-0.05, -0.03), 'curvature': (0.02, 0.01)}
+BINOMIAL_PARAMS = {'up_tick': 1.02, 'down_tick': 0.98, 'num_intervals': 200}
+# Every model with a compiled kernel; the surface expiries lie before, between and after its quoted expiries
+JIT_MODELS = [
+    ("Black-Scholes", {'volatility': 0.25}, EXPIRIES),
+    ("Quadratic volatility smile", {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02}, EXPIRIES),
+    ("Hyperbolic volatility smile", {'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15}, EXPIRIES),
+    ("Binomial", BINOMIAL_PARAMS, EXPIRIES),
+    ("Binomial", {**BINOMIAL_PARAMS, 'american': True}, EXPIRIES),
+    ("Volatility surface", SURFACE_PARAMS, (0.1, 0.25, 0.6, 1.0, 1.5)),
+]
+
+
+@requires_numba
+@pytest.mark.parametrize("model_name, params, expiries", JIT_MODELS)
+def test_compiled_kernels_match_python_kernels(model_name, params, expiries):
+    python_model = PricingModel(model_name=model_name, params=params, conditions=CONDITIONS)
+    jit_model = PricingModel(model_name=model_name, params=params, conditions=CONDITIONS, backend="jit")
+    assert python_model.backend == "python" and jit_model.backend == "jit"
+    for strike in STRIKES:
+        for time_to_expiry in expiries:
+            for option_type in ("call", "put"):
+                option = OptionClass(strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+                price = jit_model.model_pricing_function(option=option)
+                assert isinstance(price, float)
+                assert price == pytest.approx(python_model.model_pricing_function(option=option), rel=1e-12, abs=1e-12)
+
+
+# Integer market data and strikes compile their own specialization, which must give the same prices
+@requires_numba
+def test_compiled_kernels_accept_integer_arguments():
+    params = {'volatility': 0.25}
+    python_model = PricingModel(model_name="Black-Scholes", params=params, conditions=MarketConditions(spot=100, interest_rate=0))
+    jit_model = PricingModel(
+        model_name="Black-Scholes", params=params, conditions=MarketConditions(spot=100, interest_rate=0), backend="jit")
+    option = OptionClass(strike=110, time_to_expiry=1, option_type="put")
+    assert jit_model.model_pricing_function(option=option) == pytest.approx(
+        python_model.model_pricing_function(option=option), rel=1e-12, abs=1e-12)
+
+
+@requires_numba
+def test_models_without_kernels_keep_the_python_backend():
+    model = PricingModel(
+        model_name="Binomial", params={**BINOMIAL_PARAMS, 'acceleration': "leisen_reimer"}, conditions=CONDITIONS, backend="jit")
+    assert model.backend == "python"
+
+
+# The kernels' Python bodies (their py_func once compiled), which numba compiles, must match the pure Python
+# kernels too; this runs with or without numba
+@pytest.mark.parametrize("model_name, params, expiries", JIT_MODELS)
+def test_kernel_bodies_match_python_kernels(monkeypatch, model_name, params, expiries):
+    for module in (jit_kernels, pricing_model_menagerie):
+        for name, kernel in vars(module).copy().items():
+            if name.endswith("_kernel") and callable(kernel):
+                monkeypatch.setattr(module, name, getattr(kernel, 'py_func', kernel))
+    model = PricingModel(model_name=model_name, params=params, conditions=CONDITIONS)
+    kernel_pricing_function = model.model.jit_kernels()['pricing_function']
+    for strike in STRIKES:
+        for time_to_expiry in expiries:
+            for option_type in ("call", "put"):
+                option = OptionClass(strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+                price = kernel_pricing_function(option=option, conditions=CONDITIONS)
+                assert price == pytest.approx(model.model_pricing_function(option=option), rel=1e-12, abs=1e-12)
@@ -0,0 +1,67 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from helper_functions import black_scholes_formula_vectorized
+from math import exp
+import numpy as np
+import pytest
+
+
+SPOT = 100.0
+INTEREST_RATE = 0.03
+CONDITIONS = MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE)
+STRIKES = np.array([70.0, 85.0, 100.0, 115.0, 140.0])
+EXPIRIES = np.array([0.5, 1.0, 1.0, 0.25, 2.0])
+OPTION_TYPES = ["put", "put", "call", "call", "call"]
+# A mild smile, arbitrage-free over the strikes and expiries above
+QUADRATIC_SMILE = {'atm_vol': 0.2, 'skew': -0.03, 'curvature': 0.002}
+
+
+def pde_model(model_params: dict, **grid_params) -> PricingModel:
+    return PricingModel(model_name="Local volatility PDE", params={**model_params, **grid_params}, conditions=CONDITIONS)
+
+
+def test_flat_smile_gives_black_scholes_prices():
+    prices = pde_model({'atm_vol': 0.2, 'skew': 0.0, 'curvature': 0.0}).price_many(
+        strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    expected = black_scholes_formula_vectorized(
+        spot=SPOT, strike=STRIKES, volatility=0.2, time_to_expiry=EXPIRIES, 
+        interest_rate=INTEREST_RATE, is_call=np.array(OPTION_TYPES) == "call")
+    np.testing.assert_allclose(prices, expected, rtol=0, atol=2e-3)
+
+
+def test_prices_reproduce_arbitrage_free_smile():
+    prices = pde_model(QUADRATIC_SMILE).price_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    smile = PricingModel(model_name="Quadratic volatility smile", params=QUADRATIC_SMILE, conditions=CONDITIONS)
+    expected = smile.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    np.testing.assert_allclose(prices, expected, rtol=5e-3, atol=1e-3)
+
+
+# A single solve marches through all the expiries, which must give the prices of separate solves
+def test_expiries_solved_together_match_separate_solves():
+    model = pde_model(QUADRATIC_SMILE)
+    prices = model.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    separate_prices = [
+        model.price_many(strikes=[strike], expiries=[time_to_expiry], option_types=[option_type])[0]
+        for strike, time_to_expiry, option_type in zip(STRIKES, EXPIRIES, OPTION_TYPES)
+    ]
+    np.testing.assert_allclose(prices, separate_prices, rtol=0, atol=1e-3)
+
+
+def test_density_integrates_to_one_with_forward_mean():
+    model = pde_model({'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15})
+    strikes = np.linspace(0.0, 5*SPOT, 5001)
+    densities = model.risk_neutral_density(strikes=strikes, time_to_expiry=1.0)
+    # Non-negative up to the round-off of the second differences
+    assert np.all(densities > -1e-8)
+    assert np.trapezoid(densities, strikes) == pytest.approx(1.0, abs=2e-3)
+    assert np.trapezoid(strikes*densities, strikes) == pytest.approx(SPOT*exp(INTEREST_RATE), rel=1e-3)
+
+
+@pytest.mark.parametrize("smile_params", [
+    {'atm_vol': 0.2, 'skew': -0.03},
+    {'atm_vol': 0.2, 'skew': -0.03, 'left_asymp': 0.1},
+    {'atm_vol': 0.2, 'skew': -0.03, 'right_asymp': 0.1},
+])
+def test_incomplete_smiles_are_rejected(smile_params):
+    with pytest.raises(AssertionError, match="Missing parameter.*'curvature'.*'left_asymp' and 'right_asymp'"):
+        pde_model(smile_params)
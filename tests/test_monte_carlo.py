@@ -0,0 +1,52 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from helper_functions import black_scholes_formula_vectorized
+import numpy as np
+import pytest
+
+
+SPOT = 100.0
+INTEREST_RATE = 0.03
+CONDITIONS = MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE)
+STRIKES = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+# Out-of-the-money options, whose prices have the smallest sampling errors
+IS_CALL = STRIKES >= SPOT
+QUADRATIC_SMILE = {'skew': -0.03, 'curvature': 0.002}
+
+
+def monte_carlo_model(**params) -> PricingModel:
+    return PricingModel(
+        model_name="Monte Carlo", params={'volatility': 0.2, 'num_paths': 50000, **params}, conditions=CONDITIONS)
+
+
+def test_monte_carlo_matches_black_scholes():
+    prices, errors = monte_carlo_model().model.monte_carlo_pricing_with_errors(
+        conditions=CONDITIONS, strikes=STRIKES, times_to_expiry=1.0, is_call=IS_CALL)
+    expected = black_scholes_formula_vectorized(
+        spot=SPOT, strike=STRIKES, volatility=0.2, time_to_expiry=1.0, 
+        interest_rate=INTEREST_RATE, is_call=IS_CALL)
+    assert np.all(np.abs(prices - expected) < 4*errors)
+
+
+def test_local_volatility_matches_local_volatility_pde():
+    # Both models are driven by the Dupire local volatility of the same smile; the time discretization
+    # bias of the simulation is well below its sampling error at 200 steps a year
+    model = monte_carlo_model(num_steps=200, **QUADRATIC_SMILE)
+    prices, errors = model.model.monte_carlo_pricing_with_errors(
+        conditions=CONDITIONS, strikes=STRIKES, times_to_expiry=1.0, is_call=IS_CALL)
+    pde = PricingModel(
+        model_name="Local volatility PDE", params={'atm_vol': 0.2, **QUADRATIC_SMILE}, conditions=CONDITIONS)
+    expected = pde.price_many(strikes=STRIKES, expiries=1.0, option_types=np.where(IS_CALL, "call", "put"))
+    assert np.all(np.abs(prices - expected) < 4*errors)
+
+
+def test_prices_do_not_depend_on_number_of_workers():
+    params = {'num_paths': 4000, 'num_steps': 10, **QUADRATIC_SMILE}
+    serial = monte_carlo_model(**params).price_many(strikes=STRIKES, expiries=1.0, option_types="call")
+    parallel = monte_carlo_model(num_workers=2, **params).price_many(strikes=STRIKES, expiries=1.0, option_types="call")
+    np.testing.assert_allclose(parallel, serial, rtol=0, atol=1e-12)
+
+
+def test_antithetic_draws_need_even_number_of_paths():
+    with pytest.raises(AssertionError, match="must be even"):
+        monte_carlo_model(num_paths=1001)
@@ -0,0 +1,102 @@
+from instrument_market_classes import OptionClass, MarketConditions
+from pricing_model_class import PricingModel
+from pricing_cache import PricingCache
+from comparisons import ModelAndParams, run_comparison
+import pricing_cache
+import numpy as np
+import pytest
+
+
+STRIKES = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+PARAMS = {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02}
+
+
+def cached_model(cache: PricingCache, spot=100.0) -> PricingModel:
+    return PricingModel(
+        model_name="Quadratic volatility smile", params=PARAMS, 
+        conditions=MarketConditions(spot=spot, interest_rate=0.03), cache=cache)
+
+
+def test_repeated_batches_are_cache_hits():
+    cache = PricingCache()
+    model = cached_model(cache)
+    first = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    second = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    np.testing.assert_array_equal(first, second)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    # Another model sharing the cache hits the same entry
+    cached_model(cache).price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    assert cache.stats()['hits'] == 2
+
+def test_mutating_a_result_does_not_change_the_next_hit():
+    model = cached_model(PricingCache())
+    expected = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call").copy()
+    for _ in range(2):
+        prices = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+        assert prices.flags.writeable
+        prices[:] = -1.0
+    np.testing.assert_array_equal(model.price_many(strikes=STRIKES, expiries=0.5, option_types="call"), expected)
+
+def test_scalar_prices_are_cached():
+    cache = PricingCache()
+    model = cached_model(cache)
+    option = OptionClass(strike=105.0, time_to_expiry=0.5, option_type="put")
+    price = model.model_pricing_function(option=option)
+    assert model.model_pricing_function(option=option) == price
+    assert model.model_pricing_function(option=option, time_value_only=True) == price - 5.0
+    assert cache.stats()['hits'] == 2
+
+def test_changed_conditions_invalidate_the_entries():
+    cache = PricingCache()
+    model = cached_model(cache)
+    model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    model.price_many(strikes=STRIKES, expiries=1.0, option_types="call")
+    model.conditions.spot = 105.0
+    prices = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    np.testing.assert_array_equal(
+        prices, cached_model(None, spot=105.0).price_many(strikes=STRIKES, expiries=0.5, option_types="call"))
+    assert cache.stats()['invalidations'] == 2 and cache.stats()['entries'] == 1
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pricing_cache.time, "monotonic", lambda: now[0])
+    cache = PricingCache(time_to_live=10.0)
+    model = cached_model(cache)
+    model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    now[0] += 5.0
+    model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    assert cache.stats()['hits'] == 1
+    now[0] += 10.0
+    model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    assert cache.stats()['expirations'] == 1 and cache.stats()['misses'] == 2
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PricingCache(max_bytes=2*(pricing_cache.ENTRY_OVERHEAD_BYTES + STRIKES.nbytes))
+    model = cached_model(cache)
+    for time_to_expiry in (0.25, 0.5, 0.25, 1.0):
+        model.price_many(strikes=STRIKES, expiries=time_to_expiry, option_types="call")
+    assert cache.stats()['evictions'] == 1 and cache.stats()['entries'] == 2
+    # 0.5 was the least recently used
+    model.price_many(strikes=STRIKES, expiries=0.25, option_types="call")
+    assert cache.stats()['hits'] == 2
+
+
+# Worker processes are not given the cache (it holds a lock, and cannot be pickled)
+@pytest.mark.parametrize("quantity", ["prices", "distributions"])
+def test_parallel_comparison_with_a_cache(quantity):
+    models = [
+        ModelAndParams(model_name="Black-Scholes", params={'volatility': 0.2}), 
+        ModelAndParams(model_name="Quadratic volatility smile", params=PARAMS)]
+    conditions = MarketConditions(spot=100.0, interest_rate=0.03)
+    cache = PricingCache()
+    parallel = run_comparison(
+        models_list=models, quantity=quantity, time_to_expiry=0.5, conditions=conditions, num_samples=20, 
+        max_workers=2, cache=cache)
+    assert cache.stats()['entries'] == 0
+    serial = run_comparison(
+        models_list=models, quantity=quantity, time_to_expiry=0.5, conditions=conditions, num_samples=20, cache=cache)
+    assert len(parallel) == len(serial) == 2
+    for parallel_result, serial_result in zip(parallel, serial):
+        assert parallel_result.keys() == serial_result.keys()
+        for key, value in serial_result.items():
+            np.testing.assert_array_equal(parallel_result[key], value)
@@ -0,0 +1,69 @@
+from instrument_market_classes import OptionClass, MarketConditions
+from pricing_model_class import PricingModel
+from helper_functions import black_scholes_formula, black_scholes_formula_vectorized
+import numpy as np
+import pytest
+
+
+# One parametrization of every registered model, with grids small enough for the tests to run quickly
+MODEL_PARAMS = {
+    "Black-Scholes": {'volatility': 0.25},
+    "Quadratic volatility smile": {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02},
+    "Hyperbolic volatility smile": {'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15},
+    "Binomial": {'up_tick': 1.02, 'down_tick': 0.98, 'num_intervals': 200},
+    "Monte Carlo": {'volatility': 0.25, 'num_paths': 2000},
+    "Volatility surface": {
+        'expiries': (0.25, 1.0), 'atm_vol': (0.25, 0.2), 'skew': (-0.05, -0.03), 'curvature': (0.02, 0.01)},
+    "Local volatility PDE": {
+        'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15, 
+        'num_strike_steps': 400, 'time_steps_per_year': 100},
+}
+# Monte Carlo prices are only right up to sampling noise, so exact put-call parity does not hold for them
+EXACT_MODELS = [name for name in MODEL_PARAMS if name != "Monte Carlo"]
+
+SPOT = 100.0
+INTEREST_RATE = 0.03
+STRIKES = np.array([70.0, 90.0, 100.0, 100.0, 115.0, 140.0])
+EXPIRIES = np.array([0.1, 0.5, 1.0, 0.25, 1.5, 0.75])
+OPTION_TYPES = ["call", "put", "call", "put", "call", "put"]
+
+
+def pricing_model(model_name: str, spot=SPOT, interest_rate=INTEREST_RATE, **param_changes) -> PricingModel:
+    return PricingModel(
+        model_name=model_name, 
+        params={**MODEL_PARAMS[model_name], **param_changes}, 
+        conditions=MarketConditions(spot=spot, interest_rate=interest_rate))
+
+
+@pytest.mark.parametrize("model_name", list(MODEL_PARAMS))
+def test_batch_prices_match_scalar_prices(model_name):
+    model = pricing_model(model_name)
+    batch_prices = model.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    scalar_prices = [
+        model.model_pricing_function(option=OptionClass(strike=strike, time_to_expiry=time_to_expiry, option_type=option_type))
+        for strike, time_to_expiry, option_type in zip(STRIKES, EXPIRIES, OPTION_TYPES)
+    ]
+    np.testing.assert_allclose(batch_prices, scalar_prices, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("model_name", EXACT_MODELS)
+def test_put_call_parity(model_name):
+    model = pricing_model(model_name)
+    calls = model.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types="call")
+    puts = model.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types="put")
+    forwards = SPOT - STRIKES*np.exp(-INTEREST_RATE*EXPIRIES)
+    np.testing.assert_allclose(calls - puts, forwards, rtol=0, atol=1e-10)
+
+
+def test_vectorized_black_scholes_matches_scalar_formula():
+    is_call = np.array(OPTION_TYPES) == "call"
+    prices = black_scholes_formula_vectorized(
+        spot=SPOT, strike=STRIKES, volatility=0.3, time_to_expiry=EXPIRIES, 
+        interest_rate=INTEREST_RATE, is_call=is_call)
+    expected = [
+        black_scholes_formula(
+            spot=SPOT, strike=strike, volatility=0.3, time_to_expiry=time_to_expiry, 
+            interest_rate=INTEREST_RATE, option_type=option_type)
+        for strike, time_to_expiry, option_type in zip(STRIKES, EXPIRIES, OPTION_TYPES)
+    ]
+    np.testing.assert_allclose(prices, expected, rtol=0, atol=1e-12)
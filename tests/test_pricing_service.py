@@ -0,0 +1,163 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from pricing_model_menagerie import GREEKS
+from pricing_service import PricingClient, PricingServiceError, serve
+from helper_functions import black_scholes_formula
+import asyncio
+import multiprocessing
+import socket
+import time
+import numpy as np
+import pytest
+
+
+MODEL_NAME = "Hyperbolic volatility smile"
+PARAMS = {'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15}
+SPOT = 100.0
+INTEREST_RATE = 0.03
+STRIKES = np.linspace(70.0, 140.0, 29)
+EXPIRIES = np.resize([0.25, 0.5, 1.0], STRIKES.size)
+OPTION_TYPES = np.resize(["call", "put"], STRIKES.size)
+
+
+# Address of a pricing service running in a child process on a free localhost port
+@pytest.fixture(scope="module")
+def address():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        address = probe.getsockname()
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(address,))
+    server.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(address, timeout=1).close()
+            break
+        except OSError:
+            assert server.is_alive() and time.monotonic() < deadline, "The pricing service did not start"
+            time.sleep(0.05)
+    yield address
+    server.terminate()
+    server.join()
+
+
+def run_with_client(address, session):
+    async def run():
+        client = await PricingClient.connect(address)
+        try:
+            return await session(client)
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+def test_batched_prices_match_price_many(address):
+    async def session(client):
+        return await asyncio.gather(*(
+            client.price(
+                model=MODEL_NAME, params=PARAMS, spot=SPOT, interest_rate=INTEREST_RATE, 
+                strike=strike, time_to_expiry=time_to_expiry, option_type=option_type)
+            for strike, time_to_expiry, option_type in zip(STRIKES.tolist(), EXPIRIES.tolist(), OPTION_TYPES.tolist())
+        ))
+
+    model = PricingModel(
+        model_name=MODEL_NAME, params=PARAMS, conditions=MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE))
+    expected = model.price_many(strikes=STRIKES, expiries=EXPIRIES, option_types=OPTION_TYPES)
+    np.testing.assert_allclose(run_with_client(address, session), expected, rtol=0, atol=1e-12)
+
+
+def test_greeks_and_implied_volatility(address):
+    price = black_scholes_formula(spot=SPOT, strike=110.0, volatility=0.3, time_to_expiry=0.5, interest_rate=INTEREST_RATE)
+
+    async def session(client):
+        greeks = await client.greeks(
+            model="Black-Scholes", params={'volatility': 0.3}, spot=SPOT, interest_rate=INTEREST_RATE, 
+            strike=110.0, time_to_expiry=0.5)
+        vol = await client.implied_volatility(
+            price=price, spot=SPOT, interest_rate=INTEREST_RATE, strike=110.0, time_to_expiry=0.5)
+        return greeks, vol
+
+    greeks, vol = run_with_client(address, session)
+    assert set(greeks) == set(GREEKS)
+    assert greeks['price'] == pytest.approx(price, abs=1e-12)
+    assert vol == pytest.approx(0.3, rel=1e-8)
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({'type': "price", 'model': MODEL_NAME, 'params': PARAMS, 'spot': SPOT, 'interest_rate': INTEREST_RATE, 
+      'strike': 100.0, 'time_to_expiry': 1.0}, "Invalid request"),
+    ({'type': "price", 'model': MODEL_NAME, 'params': PARAMS, 'spot': SPOT, 'interest_rate': INTEREST_RATE, 
+      'strike': 100.0, 'time_to_expiry': 1.0, 'option_type': "straddle"}, "Invalid request"),
+    ({'type': "quote", 'model': MODEL_NAME, 'params': PARAMS, 'spot': SPOT, 'interest_rate': INTEREST_RATE, 
+      'strike': 100.0, 'time_to_expiry': 1.0, 'option_type': "call"}, "Invalid request"),
+    ({'type': "price", 'model': "No such model", 'params': {}, 'spot': SPOT, 'interest_rate': INTEREST_RATE, 
+      'strike': 100.0, 'time_to_expiry': 1.0, 'option_type': "call"}, "Pricing failed"),
+])
+def test_malformed_requests_get_error_responses(address, fields, message):
+    async def session(client):
+        with pytest.raises(PricingServiceError, match=message):
+            await client.request(**fields)
+        # The connection stays usable after an error
+        return await client.price(
+            model="Black-Scholes", params={'volatility': 0.2}, spot=SPOT, interest_rate=0.0, strike=100.0, time_to_expiry=1.0)
+
+    expected = black_scholes_formula(spot=SPOT, strike=100.0, volatility=0.2, time_to_expiry=1.0)
+    assert run_with_client(address, session) == pytest.approx(expected, abs=1e-12)
+
+
+@pytest.mark.parametrize("changes", [
+    {'strike': 0.0}, {'strike': -10.0}, {'time_to_expiry': -0.5}, {'spot': float("nan")}, {'interest_rate': float("inf")}])
+def test_invalid_market_data_is_rejected(address, changes):
+    fields = {
+        'type': "price", 'model': "Black-Scholes", 'params': {'volatility': 0.2}, 'spot': SPOT, 
+        'interest_rate': INTEREST_RATE, 'strike': 100.0, 'time_to_expiry': 1.0, 'option_type': "call", **changes}
+
+    async def session(client):
+        with pytest.raises(PricingServiceError, match="Invalid request"):
+            await client.request(**fields)
+
+    run_with_client(address, session)
+
+
+# The up tick of the tree is below the interest accrued over one interval of the longest expiry, which
+# fails the batch holding it; the other requests of the batch must still be priced
+def test_failing_request_does_not_fail_its_batch(address):
+    params = {'up_tick': 1.02, 'down_tick': 0.98, 'num_intervals': 200}
+    expiries = [0.5, 1.0, 300.0, 2.0]
+
+    async def session(client):
+        return await asyncio.gather(*(
+            client.price(
+                model="Binomial", params=params, spot=SPOT, interest_rate=INTEREST_RATE, 
+                strike=100.0, time_to_expiry=time_to_expiry)
+            for time_to_expiry in expiries
+        ), return_exceptions=True)
+
+    results = run_with_client(address, session)
+    model = PricingModel(model_name="Binomial", params=params, conditions=MarketConditions(spot=SPOT, interest_rate=INTEREST_RATE))
+    for time_to_expiry, result in zip(expiries, results):
+        if time_to_expiry == 300.0:
+            assert isinstance(result, PricingServiceError) and "no probability eliminating arbitrage" in str(result)
+        else:
+            assert result == pytest.approx(model.price_many(strikes=100.0, expiries=time_to_expiry, option_types="call")[0], abs=1e-12)
+
+
+# A smile model cannot price at expiry (its volatility variable divides by the time to expiry)
+def test_non_finite_results_are_null(address):
+    async def session(client):
+        price = await client.price(
+            model=MODEL_NAME, params=PARAMS, spot=SPOT, interest_rate=INTEREST_RATE, strike=110.0, time_to_expiry=0.0)
+        greeks = await client.greeks(
+            model=MODEL_NAME, params=PARAMS, spot=SPOT, interest_rate=INTEREST_RATE, strike=110.0, time_to_expiry=0.0)
+        return price, greeks
+
+    price, greeks = run_with_client(address, session)
+    assert price is None
+    assert greeks == {greek: None for greek in GREEKS}
+
+
+def test_invalid_json_gets_an_error_response(address):
+    with socket.create_connection(address, timeout=5) as connection:
+        connection.sendall(b"not json\n")
+        response = connection.makefile().readline()
+    assert '"id": null' in response and "Invalid request" in response
@@ -0,0 +1,69 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from result_store import ResultStore
+import numpy as np
+import pytest
+
+
+SMILE_PARAMS = {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02}
+
+
+def smile_model(conditions: MarketConditions) -> PricingModel:
+    return PricingModel(model_name="Quadratic volatility smile", params=SMILE_PARAMS, conditions=conditions)
+
+
+def test_put_and_get(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    key = store.key("model", {'a': 1}, (100.0, 0.01, 50.0, 200.0), {'grid': "prices"})
+    assert store.get(key) is None
+    store.put(key, {'x': np.arange(5.0)})
+    stored = store.get(key)
+    np.testing.assert_array_equal(stored['x'], np.arange(5.0))
+    assert not stored['x'].flags.writeable
+    assert store.stats()['entries'] == 1 and store.hits == 1 and store.misses == 1
+
+
+def test_keys_depend_on_every_part():
+    key = ResultStore.key("model", {'a': 1}, (100.0, 0.01), {'grid': "prices"})
+    assert key == ResultStore.key("model", {'a': 1}, (100.0, 0.01), {'grid': "prices"})
+    assert key != ResultStore.key("other", {'a': 1}, (100.0, 0.01), {'grid': "prices"})
+    assert key != ResultStore.key("model", {'a': 2}, (100.0, 0.01), {'grid': "prices"})
+    assert key != ResultStore.key("model", {'a': 1}, (101.0, 0.01), {'grid': "prices"})
+    assert key != ResultStore.key("model", {'a': 1}, (100.0, 0.01), {'grid': "densities"})
+
+
+def test_eviction_keeps_byte_budget(tmp_path):
+    store = ResultStore(directory=str(tmp_path), max_bytes=3000)
+    for i in range(5):
+        store.put(f"entry{i}", {'x': np.zeros(100)})
+    stats = store.stats()
+    assert stats['bytes'] <= 3000 and stats['evictions'] == 5 - stats['entries'] > 0
+
+
+@pytest.mark.parametrize("grid", ["prices", "densities"])
+def test_plot_grids_round_trip(tmp_path, grid):
+    store = ResultStore(directory=str(tmp_path))
+    model = smile_model(MarketConditions(spot=100.0, interest_rate=0.03))
+    plot = model.pricing_plot if grid == "prices" else model.probability_distribution_plot
+    computed = plot(time_to_expiry=0.5, num_samples=50, plot=False)
+    first = plot(time_to_expiry=0.5, num_samples=50, plot=False, store=store)
+    second = plot(time_to_expiry=0.5, num_samples=50, plot=False, store=store)
+    assert store.misses == 1 and store.hits == 1
+    for name, values in computed.items():
+        np.testing.assert_array_equal(first[name], values)
+        np.testing.assert_array_equal(second[name], values)
+
+
+def test_plot_grids_are_keyed_on_strike_range(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    conditions = MarketConditions(spot=100.0, interest_rate=0.03)
+    wide_model = smile_model(conditions)
+    # Same conditions snapshot for both models, but the narrow model's strike range is fixed at its creation
+    conditions.set_min_max_strikes_of_interest(80.0, 120.0)
+    narrow_model = smile_model(conditions)
+    wide_grid = wide_model.pricing_plot(time_to_expiry=0.5, num_samples=40, plot=False, store=store)
+    narrow_grid = narrow_model.pricing_plot(time_to_expiry=0.5, num_samples=40, plot=False, store=store)
+    assert store.misses == 2 and store.hits == 0
+    assert wide_grid['strikes'][0] == 50.0 and narrow_grid['strikes'][0] == 80.0
+    expected = narrow_model.pricing_plot(time_to_expiry=0.5, num_samples=40, plot=False)
+    np.testing.assert_array_equal(narrow_grid['call_prices'], expected['call_prices'])
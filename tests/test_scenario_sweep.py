@@ -0,0 +1,78 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from comparisons import ModelAndParams
+from scenario_sweep import ScenarioSpec, SWEEP_COLUMNS, run_sweep, load_sweep, shocked_params
+import numpy as np
+import pytest
+
+
+BASE_CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+MODELS = [
+    ModelAndParams(model_name="Black-Scholes", params={'volatility': 0.2}),
+    ModelAndParams(model_name="Binomial", params={'up_tick': 1.02, 'down_tick': 0.98, 'num_intervals': 50}),
+]
+
+
+def scenario_spec(**options) -> ScenarioSpec:
+    return ScenarioSpec(
+        models=MODELS, 
+        base_conditions=BASE_CONDITIONS, 
+        strikes=(90.0, 100.0, 110.0), 
+        expiries=(0.25, 1.0), 
+        spot_shocks=(-0.1, 0.0, 0.1), 
+        vol_shocks=(0.0, 0.5), 
+        rate_shifts=(0.0, 0.01), 
+        **options)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_sweep_writes_every_scenario_price(tmp_path, executor):
+    spec = scenario_spec()
+    progress = []
+    num_rows = run_sweep(
+        spec=spec, output_directory=str(tmp_path), executor=executor, max_workers=2, 
+        progress=lambda *args: progress.append(args))
+    # 2 models x 3 spots x 2 vol shocks x 2 rates x (3 strikes x 2 expiries x 2 types)
+    assert num_rows == spec.num_scenario_prices() == 2*3*2*2*12
+    assert [done for done, *_ in progress] == list(range(1, len(spec.chunks()) + 1))
+    assert progress[-1][2] == num_rows
+
+    columns, model_labels = load_sweep(str(tmp_path))
+    assert model_labels == ["Black-Scholes", "Binomial (n=50)"]
+    assert list(columns) == list(SWEEP_COLUMNS)
+    for name, dtype in SWEEP_COLUMNS.items():
+        assert columns[name].dtype == dtype and len(columns[name]) == num_rows
+    # Every combination of scenario and option appears exactly once, whatever the order of the chunks
+    rows = set(zip(*(np.asarray(columns[name]).tolist() for name in SWEEP_COLUMNS if name != 'price')))
+    assert len(rows) == num_rows
+
+
+def test_loaded_prices_match_direct_pricing(tmp_path):
+    spec = scenario_spec()
+    run_sweep(spec=spec, output_directory=str(tmp_path), max_workers=2)
+    columns, _ = load_sweep(str(tmp_path))
+    selected = (columns['model'] == 1) & (columns['vol_shock'] == 0.5) & (columns['spot'] == 110.0) \
+        & np.isclose(columns['interest_rate'], 0.04)
+    conditions = MarketConditions(spot=110.0, interest_rate=0.04)
+    model = PricingModel(model_name="Binomial", params=shocked_params(MODELS[1], 0.5), conditions=conditions)
+    expected = model.price_many(
+        strikes=columns['strike'][selected], 
+        expiries=columns['time_to_expiry'][selected], 
+        option_types=np.where(columns['is_call'][selected], "call", "put"))
+    np.testing.assert_allclose(columns['price'][selected], expected, rtol=0, atol=1e-12)
+
+
+def test_empty_sweep_round_trip(tmp_path):
+    spec = ScenarioSpec(models=MODELS, base_conditions=BASE_CONDITIONS, strikes=(), expiries=(1.0,))
+    assert run_sweep(spec=spec, output_directory=str(tmp_path), max_workers=1) == 0
+    columns, _ = load_sweep(str(tmp_path))
+    assert all(len(column) == 0 for column in columns.values())
+
+
+def test_vol_shock_scales_volatility_level():
+    params = shocked_params(ModelAndParams(model_name="Volatility surface", params={
+        'expiries': (0.5, 1.0), 'atm_vol': (0.2, 0.25), 'skew': (-0.05, -0.03), 'curvature': (0.02, 0.01)}), 0.1)
+    np.testing.assert_allclose(params['atm_vol'], (0.22, 0.275))
+    assert params['skew'] == (-0.05, -0.03)
+    binomial = shocked_params(MODELS[1], 1.0)
+    np.testing.assert_allclose([np.log(binomial['up_tick']), np.log(binomial['down_tick'])], 2*np.log([1.02, 0.98]))
@@ -0,0 +1,73 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from smile_calibration import QuotedSlice, SmileCalibrator, SMILE_MODEL_NAMES
+import numpy as np
+import pytest
+
+
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = np.linspace(70.0, 140.0, 15)
+EXPIRIES = (0.5, 1.0)
+SMILE_PARAMS = {
+    "Quadratic volatility smile": {'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02},
+    "Hyperbolic volatility smile": {'atm_vol': 0.2, 'skew': 0.05, 'right_asymp': 0.1, 'left_asymp': 0.15},
+}
+
+
+# Out-of-the-money quotes priced by the model itself, which the calibration must recover exactly
+def quoted_slices(model_name: str) -> list:
+    model = PricingModel(model_name=model_name, params=SMILE_PARAMS[model_name], conditions=CONDITIONS)
+    option_types = np.where(STRIKES < CONDITIONS.spot, "put", "call")
+    return [
+        QuotedSlice.from_prices(
+            conditions=CONDITIONS, 
+            time_to_expiry=time_to_expiry, 
+            strikes=STRIKES, 
+            prices=model.price_many(strikes=STRIKES, expiries=time_to_expiry, option_types=option_types), 
+            option_types=option_types)
+        for time_to_expiry in EXPIRIES
+    ]
+
+
+@pytest.mark.parametrize("model_name", SMILE_MODEL_NAMES)
+def test_calibration_recovers_the_smile(model_name):
+    calibrator = SmileCalibrator(model_name)
+    params = calibrator.calibrate(conditions=CONDITIONS, quoted_slices=quoted_slices(model_name))
+    assert set(params) == set(EXPIRIES)
+    for time_to_expiry in EXPIRIES:
+        assert calibrator.rms_errors[time_to_expiry] < 1e-10
+        assert params[time_to_expiry].keys() == SMILE_PARAMS[model_name].keys()
+        for name, value in SMILE_PARAMS[model_name].items():
+            assert params[time_to_expiry][name] == pytest.approx(value, abs=1e-9)
+
+def test_parallel_calibration_matches_serial_calibration():
+    model_name = "Hyperbolic volatility smile"
+    quotes = quoted_slices(model_name)
+    serial = SmileCalibrator(model_name).calibrate(conditions=CONDITIONS, quoted_slices=quotes)
+    parallel = SmileCalibrator(model_name).calibrate(conditions=CONDITIONS, quoted_slices=quotes, max_workers=2)
+    assert parallel == serial
+
+
+def test_quotes_without_implied_volatility_are_dropped():
+    quotes = QuotedSlice.from_prices(
+        conditions=CONDITIONS, time_to_expiry=1.0, strikes=[90.0, 100.0, 110.0], prices=[5.0, 10.0, 200.0], 
+        option_types=["call", "call", "call"])
+    # The first price is below intrinsic value, the last above the spot
+    np.testing.assert_array_equal(quotes.strikes, [100.0])
+
+def test_calibration_needs_enough_quotes():
+    quotes = QuotedSlice(time_to_expiry=1.0, strikes=[90.0, 100.0, 110.0], implied_vols=[0.22, 0.2, 0.19])
+    with pytest.raises(AssertionError, match="Not enough quotes"):
+        SmileCalibrator("Hyperbolic volatility smile").calibrate(conditions=CONDITIONS, quoted_slices=[quotes])
+
+# A second calibration starts from the coordinates of the first, and lands on the same fit
+def test_recalibration_is_warm_started():
+    model_name = "Quadratic volatility smile"
+    quotes = quoted_slices(model_name)
+    calibrator = SmileCalibrator(model_name)
+    first = calibrator.calibrate(conditions=CONDITIONS, quoted_slices=quotes)
+    assert set(calibrator.coordinates) == set(EXPIRIES)
+    second = calibrator.calibrate(conditions=CONDITIONS, quoted_slices=quotes)
+    for time_to_expiry in EXPIRIES:
+        for name, value in first[time_to_expiry].items():
+            assert second[time_to_expiry][name] == pytest.approx(value, abs=1e-12)
@@ -0,0 +1,105 @@
+from instrument_market_classes import OptionBook, MarketConditions
+from pricing_model_class import PricingModel
+from comparisons import ModelAndParams
+from streaming import StreamingRepricer, MarketTick
+import asyncio
+import numpy as np
+import pytest
+
+
+MODELS = [
+    ModelAndParams(model_name="Black-Scholes", params={'volatility': 0.2}), 
+    ModelAndParams(model_name="Quadratic volatility smile", params={'atm_vol': 0.2, 'skew': -0.05, 'curvature': 0.02})]
+BOOK = OptionBook(strikes=[90.0, 100.0, 110.0, 100.0], times_to_expiry=[0.25, 0.25, 0.5, 1.0], option_types=["call", "put", "call", "put"])
+OTHER_BOOK = OptionBook(strikes=[40.0, 50.0], times_to_expiry=[0.25, 0.5], option_types="call")
+
+
+def expected_prices(model_index: int, book: OptionBook, spot: float, interest_rate: float) -> np.ndarray:
+    model = PricingModel(
+        model_name=MODELS[model_index].model_name, params=MODELS[model_index].params, 
+        conditions=MarketConditions(spot=spot, interest_rate=interest_rate))
+    return model.model_batch_pricing_function(book=book)
+
+
+def test_ticks_reprice_the_book():
+    repricer = StreamingRepricer(models_list=MODELS, initial_conditions=MarketConditions(spot=100.0, interest_rate=0.03))
+    indices = repricer.register_options(BOOK)
+    np.testing.assert_array_equal(indices, np.arange(4))
+    updates = repricer.on_tick(MarketTick(timestamp=1.0, spot=101.0, interest_rate=0.03))
+    assert [update.model_label for update in updates] == [model.model_name for model in MODELS]
+    for i, update in enumerate(updates):
+        order = np.argsort(update.indices)
+        np.testing.assert_array_equal(update.indices[order], indices)
+        np.testing.assert_allclose(update.values['price'][order], expected_prices(i, BOOK, 101.0, 0.03), rtol=0, atol=1e-12)
+    updates = repricer.on_tick(MarketTick(timestamp=2.0, spot=102.0, interest_rate=0.03))
+    for i, update in enumerate(updates):
+        order = np.argsort(update.indices)
+        np.testing.assert_allclose(
+            update.changes['price'][order], 
+            expected_prices(i, BOOK, 102.0, 0.03) - expected_prices(i, BOOK, 101.0, 0.03), rtol=0, atol=1e-12)
+
+
+def test_small_moves_only_price_new_options():
+    repricer = StreamingRepricer(
+        models_list=MODELS, initial_conditions=MarketConditions(spot=100.0, interest_rate=0.03), spot_tolerance=0.5)
+    repricer.register_options(BOOK)
+    repricer.on_tick(MarketTick(timestamp=1.0, spot=100.0, interest_rate=0.03))
+    assert repricer.on_tick(MarketTick(timestamp=2.0, spot=100.2, interest_rate=0.03)) == []
+    new_indices = repricer.register_options(OptionBook(strikes=[95.0], times_to_expiry=[2.0], option_types="call"))
+    updates = repricer.on_tick(MarketTick(timestamp=3.0, spot=100.3, interest_rate=0.03))
+    assert all(update.indices.tolist() == new_indices.tolist() for update in updates)
+
+
+def test_ticks_leave_other_underlyings_untouched():
+    repricer = StreamingRepricer(
+        models_list=MODELS, initial_conditions=MarketConditions(spot=100.0, interest_rate=0.03), with_greeks=True)
+    repricer.add_underlying(underlying="B", conditions=MarketConditions(spot=50.0, interest_rate=0.03))
+    indices = repricer.register_options(BOOK)
+    other_indices = repricer.register_options(OTHER_BOOK, underlying="B")
+    repricer.on_tick(MarketTick(timestamp=1.0, spot=100.0, interest_rate=0.03))
+    repricer.on_tick(MarketTick(timestamp=1.0, spot=50.0, interest_rate=0.03, underlying="B"))
+    before = {label: {quantity: values.copy() for quantity, values in model_values.items()} 
+              for label, model_values in repricer.last_values.items()}
+
+    updates = repricer.on_tick(MarketTick(timestamp=2.0, spot=105.0, interest_rate=0.03))
+    assert updates and all(update.underlying is None for update in updates)
+    assert all(set(update.indices.tolist()) == set(indices.tolist()) for update in updates)
+    for label, model_values in repricer.last_values.items():
+        for quantity, values in model_values.items():
+            np.testing.assert_array_equal(values[other_indices], before[label][quantity][other_indices])
+            assert np.all(values[indices] != before[label][quantity][indices])
+    assert repricer.underlyings["B"].conditions.spot == 50.0
+    np.testing.assert_allclose(
+        repricer.last_values["Black-Scholes"]['price'][other_indices], expected_prices(0, OTHER_BOOK, 50.0, 0.03), 
+        rtol=0, atol=1e-12)
+    with pytest.raises(AssertionError, match="Unknown underlying"):
+        repricer.on_tick(MarketTick(timestamp=3.0, spot=10.0, interest_rate=0.03, underlying="C"))
+
+
+# Queued ticks are conflated into the latest one of each underlying
+def test_run_conflates_ticks_per_underlying():
+    repricer = StreamingRepricer(models_list=MODELS[:1], initial_conditions=MarketConditions(spot=100.0, interest_rate=0.03))
+    repricer.add_underlying(underlying="B", conditions=MarketConditions(spot=50.0, interest_rate=0.03))
+    repricer.register_options(BOOK)
+    repricer.register_options(OTHER_BOOK, underlying="B")
+
+    async def run():
+        tick_queue, update_queue = asyncio.Queue(), asyncio.Queue()
+        for tick in [
+                MarketTick(timestamp=1.0, spot=100.0, interest_rate=0.03), 
+                MarketTick(timestamp=2.0, spot=50.0, interest_rate=0.03, underlying="B"), 
+                MarketTick(timestamp=3.0, spot=101.0, interest_rate=0.03), 
+                MarketTick(timestamp=4.0, spot=51.0, interest_rate=0.03, underlying="B"), 
+                MarketTick(timestamp=5.0, spot=102.0, interest_rate=0.03), 
+                None]:
+            tick_queue.put_nowait(tick)
+        await repricer.run(tick_queue, update_queue)
+        updates = []
+        while (update := update_queue.get_nowait()) is not None:
+            updates.append(update)
+        return updates
+
+    updates = asyncio.run(run())
+    assert [(update.underlying, update.timestamp) for update in updates] == [(None, 5.0), ("B", 4.0)]
+    np.testing.assert_allclose(
+        np.sort(updates[1].values['price']), np.sort(expected_prices(0, OTHER_BOOK, 51.0, 0.03)), rtol=0, atol=1e-12)
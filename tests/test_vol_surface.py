@@ -0,0 +1,79 @@
+from instrument_market_classes import MarketConditions
+from pricing_model_class import PricingModel
+from pricing_model_menagerie import VolSurface, VolSmileQuadratic, vol_surface_params
+import numpy as np
+import pytest
+
+
+CONDITIONS = MarketConditions(spot=100.0, interest_rate=0.03)
+STRIKES = np.array([70.0, 85.0, 100.0, 115.0, 140.0])
+SLICE_PARAMS = {
+    0.25: {'atm_vol': 0.25, 'skew': -0.05, 'curvature': 0.02},
+    1.0: {'atm_vol': 0.2, 'skew': -0.03, 'curvature': 0.01},
+}
+
+
+def surface_model(slice_params=SLICE_PARAMS, **options) -> PricingModel:
+    return PricingModel(
+        model_name="Volatility surface", params=vol_surface_params(slice_params, **options), conditions=CONDITIONS)
+
+
+def smile_prices(smile_params: dict, time_to_expiry: float) -> np.ndarray:
+    smile = PricingModel(model_name="Quadratic volatility smile", params=smile_params, conditions=CONDITIONS)
+    return smile.price_many(strikes=STRIKES, expiries=time_to_expiry, option_types="call")
+
+
+@pytest.mark.parametrize("time_to_expiry", list(SLICE_PARAMS))
+def test_slices_reproduce_their_smiles(time_to_expiry):
+    prices = surface_model().price_many(strikes=STRIKES, expiries=time_to_expiry, option_types="call")
+    np.testing.assert_allclose(prices, smile_prices(SLICE_PARAMS[time_to_expiry], time_to_expiry), rtol=0, atol=1e-5)
+
+
+def test_total_variance_is_interpolated_linearly_between_expiries():
+    surface = surface_model().model
+    log_moneyness = np.linspace(-0.3, 0.3, 7)
+    first, last = (surface.volatilities(log_moneyness, time_to_expiry)**2*time_to_expiry for time_to_expiry in (0.25, 1.0))
+    for time_to_expiry in (0.4, 0.625, 0.9):
+        weight = (time_to_expiry - 0.25)/0.75
+        total_variances = surface.volatilities(log_moneyness, time_to_expiry)**2*time_to_expiry
+        np.testing.assert_allclose(total_variances, (1 - weight)*first + weight*last, rtol=1e-12)
+    # At the money, the smile variables are 0 and the slices' volatilities are their atm_vol
+    np.testing.assert_allclose(surface.volatilities(0.0, 0.625)**2*0.625, 0.5*0.25**2*0.25 + 0.5*0.2**2*1.0, rtol=1e-12)
+
+
+def test_volatility_is_flat_outside_the_expiries():
+    surface = surface_model().model
+    log_moneyness = np.linspace(-0.3, 0.3, 7)
+    np.testing.assert_allclose(surface.volatilities(log_moneyness, 0.1), surface.volatilities(log_moneyness, 0.25), rtol=1e-12)
+    np.testing.assert_allclose(surface.volatilities(log_moneyness, 3.0), surface.volatilities(log_moneyness, 1.0), rtol=1e-12)
+
+
+def test_update_slice_replaces_only_that_slice():
+    model = surface_model()
+    first_slice = model.model.total_variances[0].copy()
+    new_params = {'atm_vol': 0.3, 'skew': 0.02, 'curvature': 0.01}
+    model.model.update_slice(1.0, VolSmileQuadratic.from_params(new_params))
+    # The old tabulation of the slice is dropped, and the prices follow the new smile
+    prices = model.price_many(strikes=STRIKES, expiries=1.0, option_types="call")
+    np.testing.assert_allclose(prices, smile_prices(new_params, 1.0), rtol=0, atol=1e-5)
+    np.testing.assert_array_equal(model.model.total_variances[0], first_slice)
+    np.testing.assert_array_equal(model.model.expiries, [0.25, 1.0])
+
+
+def test_update_slice_adds_new_expiry():
+    model = surface_model()
+    new_params = {'atm_vol': 0.22, 'skew': -0.04, 'curvature': 0.015}
+    model.model.update_slice(0.5, VolSmileQuadratic.from_params(new_params))
+    np.testing.assert_array_equal(model.model.expiries, [0.25, 0.5, 1.0])
+    prices = model.price_many(strikes=STRIKES, expiries=0.5, option_types="call")
+    np.testing.assert_allclose(prices, smile_prices(new_params, 0.5), rtol=0, atol=1e-5)
+    expected = surface_model({**SLICE_PARAMS, 0.5: new_params}).price_many(strikes=STRIKES, expiries=0.75, option_types="put")
+    np.testing.assert_allclose(model.price_many(strikes=STRIKES, expiries=0.75, option_types="put"), expected, rtol=0, atol=1e-12)
+
+
+def test_surface_needs_complete_smiles():
+    params = vol_surface_params({time_to_expiry: {'atm_vol': 0.2, 'skew': -0.03} for time_to_expiry in (0.25, 1.0)})
+    with pytest.raises(AssertionError, match="Missing parameter"):
+        PricingModel(model_name="Volatility surface", params=params, conditions=CONDITIONS)
+    with pytest.raises(AssertionError, match="Missing parameter"):
+        PricingModel(model_name="Volatility surface", params={**params, 'left_asymp': (0.1, 0.1)}, conditions=CONDITIONS)